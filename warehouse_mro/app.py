@@ -4,6 +4,8 @@ from config import Config
 from models import db
 from models.user import User
 from routes import register_blueprints
+from utils.migraciones import aplicar_migraciones
+from utils.rollups import reconstruir_rollups_command
 import os
 # ==============================
 # LOGIN MANAGER
@@ -31,6 +33,9 @@ def create_app():
     # Registrar blueprints
     register_blueprints(app)
 
+    # Comandos CLI (flask --app app:create_app <comando>)
+    app.cli.add_command(reconstruir_rollups_command)
+
     # Registrar filtros
     @app.template_filter("format_fecha")
     def format_fecha(value):
@@ -59,6 +64,7 @@ def create_app():
         print("\n>>> Creando tablas si no existen...")
         db.create_all()
         db.session.commit()
+        aplicar_migraciones()
         print(">>> Tablas creadas.\n")
 
         # ============================
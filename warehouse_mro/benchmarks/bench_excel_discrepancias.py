@@ -0,0 +1,62 @@
+"""
+Benchmark del generador de Excel de discrepancias.
+
+Uso (desde la carpeta warehouse_mro):
+    python benchmarks/bench_excel_discrepancias.py
+    python benchmarks/bench_excel_discrepancias.py 10000 100000 500000
+"""
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from utils.excel import generate_discrepancies_excel  # noqa: E402
+
+TAMANOS = [10_000, 100_000, 500_000]
+
+
+def discrepancias_sinteticas(filas: int) -> pd.DataFrame:
+    """DataFrame con las columnas del reporte real y estados mezclados."""
+    rng = np.random.default_rng(42)
+    sistema = rng.integers(0, 200, filas).astype(float)
+    contado = np.clip(sistema + rng.integers(-20, 20, filas), 0, None)
+    diferencia = contado - sistema
+
+    estado = np.select(
+        [diferencia == 0, diferencia <= -10, diferencia < 0],
+        ["OK", "CRÍTICO", "FALTA"],
+        default="SOBRA",
+    )
+
+    return pd.DataFrame({
+        "Código Material": [f"MAT{i:07d}" for i in range(filas)],
+        "Descripción": [f"MATERIAL DE PRUEBA {i % 997}" for i in range(filas)],
+        "Unidad": "UN",
+        "Ubicación": [f"E{i % 4000:04d}A{i % 9}" for i in range(filas)],
+        "Stock sistema": sistema,
+        "Stock contado": contado,
+        "Diferencia": diferencia,
+        "Estado": estado,
+    })
+
+
+def main(tamanos):
+    print(f"{'Filas':>10} {'Segundos':>10} {'Filas/s':>12} {'MB':>8}")
+
+    for filas in tamanos:
+        df = discrepancias_sinteticas(filas)
+
+        inicio = time.perf_counter()
+        output = generate_discrepancies_excel(df)
+        segundos = time.perf_counter() - inicio
+
+        mb = len(output.getbuffer()) / 1024 / 1024
+        print(f"{filas:>10,} {segundos:>10.2f} {int(filas / segundos):>12,} {mb:>8.1f}")
+
+
+if __name__ == "__main__":
+    main([int(x) for x in sys.argv[1:]] or TAMANOS)
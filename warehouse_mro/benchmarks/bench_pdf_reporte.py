@@ -0,0 +1,81 @@
+"""
+Benchmark de create_pdf_reporte en lote (reportes de perfil por usuario).
+
+Compara cada reporte con los assets en frío (logo, foto, QR, gráficos y
+encabezado se cargan y arman de nuevo, como antes de la precarga) contra
+la caché de assets del proceso.
+
+Uso (desde la carpeta warehouse_mro):
+    python benchmarks/bench_pdf_reporte.py
+    python benchmarks/bench_pdf_reporte.py 500
+"""
+import os
+import sys
+import tempfile
+import time
+
+from flask import Flask
+
+RAIZ = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, RAIZ)
+
+from models import db  # noqa: E402
+from models.actividad import ActividadUsuario  # noqa: E402
+from models.user import User  # noqa: E402
+from utils import pdf_report  # noqa: E402
+
+USUARIOS = 500
+
+
+def preparar_usuarios(cantidad):
+    """Usuarios con foto (el logo sirve de foto) y algo de actividad."""
+    for i in range(cantidad):
+        user = User(
+            username=f"bench{i}",
+            email=f"bench{i}@sider.com.pe",
+            password_hash="x",
+            area="Almacén",
+            photo="images/gerdau_logo.jpg",
+        )
+        db.session.add(user)
+    db.session.flush()
+
+    for user in User.query.all():
+        for j in range(5):
+            db.session.add(ActividadUsuario(user_id=user.id, descripcion=f"Actividad {j}"))
+    db.session.commit()
+
+    return [u.id for u in User.query.order_by(User.id)]
+
+
+def medir(ids, frio):
+    inicio = time.perf_counter()
+    for user_id in ids:
+        if frio:
+            pdf_report.limpiar_assets()
+        pdf_report.create_pdf_reporte(user_id)
+    return time.perf_counter() - inicio
+
+
+def main(cantidad):
+    with tempfile.TemporaryDirectory() as carpeta:
+        app = Flask(__name__, root_path=RAIZ)
+        app.config.update(
+            SQLALCHEMY_DATABASE_URI=f"sqlite:///{os.path.join(carpeta, 'bench.db')}",
+            REPORT_FOLDER=os.path.join(carpeta, "reports"),
+        )
+        db.init_app(app)
+
+        with app.app_context():
+            db.create_all()
+            ids = preparar_usuarios(cantidad)
+            print(f"{len(ids)} reportes de perfil\n")
+
+            print(f"{'Assets':>10} {'Segundos':>10} {'ms/reporte':>12}")
+            for nombre, frio in (("en frío", True), ("en caché", False)):
+                segundos = medir(ids, frio)
+                print(f"{nombre:>10} {segundos:>10.2f} {segundos * 1000 / len(ids):>12.1f}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else USUARIOS)
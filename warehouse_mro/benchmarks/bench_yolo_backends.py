@@ -0,0 +1,155 @@
+"""
+Comparación de backends de inferencia (utils.yolo_backends) en CPU:
+latencia por imagen, imágenes/s por lotes y concordancia de detecciones.
+
+Uso (desde la carpeta warehouse_mro):
+    python benchmarks/bench_yolo_backends.py carpeta_imagenes/ --pt bultos.pt --onnx bultos.onnx
+    python benchmarks/bench_yolo_backends.py carpeta_imagenes/ --onnx bultos.onnx --hilos 4
+
+El primer backend es la referencia: para los demás se informa qué parte
+de sus cajas coincide con la referencia (misma clase, IoU >= 0.5).
+Si junto a una imagen hay un .txt con etiquetas YOLO (una caja por línea),
+se informa además el error medio del conteo contra esas etiquetas.
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from utils.yolo_backends import cv2, crear_backend  # noqa: E402
+
+EXTENSIONES = (".jpg", ".jpeg", ".png")
+
+
+def cargar_imagenes(carpeta):
+    """[(nombre, imagen BGR, bultos etiquetados o None)]"""
+    imagenes = []
+    for nombre in sorted(os.listdir(carpeta)):
+        base, ext = os.path.splitext(nombre)
+        if ext.lower() not in EXTENSIONES or base.endswith("_yolo"):
+            continue
+
+        img = cv2.imread(os.path.join(carpeta, nombre))
+        if img is None:
+            continue
+
+        etiquetas = os.path.join(carpeta, base + ".txt")
+        esperado = None
+        if os.path.exists(etiquetas):
+            with open(etiquetas) as f:
+                esperado = sum(1 for linea in f if linea.strip())
+
+        imagenes.append((nombre, img, esperado))
+    return imagenes
+
+
+def _iou(a, b):
+    ix = max(0.0, min(a["x2"], b["x2"]) - max(a["x1"], b["x1"]))
+    iy = max(0.0, min(a["y2"], b["y2"]) - max(a["y1"], b["y1"]))
+    inter = ix * iy
+    union = (
+        (a["x2"] - a["x1"]) * (a["y2"] - a["y1"])
+        + (b["x2"] - b["x1"]) * (b["y2"] - b["y1"])
+        - inter
+    )
+    if union <= 0:
+        # Cajas degeneradas (recortadas al borde): solo coinciden si son iguales
+        return float(all(a[k] == b[k] for k in ("x1", "y1", "x2", "y2")))
+    return inter / union
+
+
+def coincidencias(referencia, otras, umbral=0.5):
+    """Cajas de `otras` emparejadas (1 a 1) con una de `referencia`."""
+    libres = list(referencia)
+    pares = 0
+    for d in sorted(otras, key=lambda d: -d["conf"]):
+        mejor = max(
+            (r for r in libres if r["cls"] == d["cls"]),
+            key=lambda r: _iou(r, d),
+            default=None,
+        )
+        if mejor is not None and _iou(mejor, d) >= umbral:
+            libres.remove(mejor)
+            pares += 1
+    return pares
+
+
+def medir(nombre, ruta, imagenes, args):
+    inicio = time.perf_counter()
+    backend = crear_backend(nombre, ruta, imgsz=args.imgsz, hilos=args.hilos)
+    backend.calentar()
+    carga = time.perf_counter() - inicio
+
+    latencias = []
+    resultados = []
+    for _, img, _ in imagenes:
+        inicio = time.perf_counter()
+        resultados.append(backend.detectar([img])[0])
+        latencias.append((time.perf_counter() - inicio) * 1000)
+
+    inicio = time.perf_counter()
+    todas = [img for _, img, _ in imagenes]
+    for i in range(0, len(todas), args.lote):
+        backend.detectar(todas[i:i + args.lote])
+    por_segundo = len(todas) / (time.perf_counter() - inicio)
+
+    latencias.sort()
+    return {
+        "backend": nombre,
+        "carga_s": carga,
+        "p50_ms": statistics.median(latencias),
+        "p95_ms": latencias[min(len(latencias) - 1, int(len(latencias) * 0.95))],
+        "img_s": por_segundo,
+        "resultados": resultados,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("carpeta")
+    parser.add_argument("--pt", help="modelo .pt (backend ultralytics)")
+    parser.add_argument("--onnx", help="modelo .onnx (backend onnx)")
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--hilos", type=int, default=None)
+    parser.add_argument("--lote", type=int, default=8)
+    args = parser.parse_args()
+
+    if cv2 is None:
+        sys.exit("opencv no está instalado.")
+
+    modelos = [(n, r) for n, r in (("ultralytics", args.pt), ("onnx", args.onnx)) if r]
+    if not modelos:
+        sys.exit("Indique al menos --pt o --onnx.")
+
+    imagenes = cargar_imagenes(args.carpeta)
+    if not imagenes:
+        sys.exit("No hay imágenes para procesar.")
+    print(f"{len(imagenes)} imágenes, imgsz={args.imgsz}, hilos={args.hilos or 'auto'}\n")
+
+    medidas = [medir(nombre, ruta, imagenes, args) for nombre, ruta in modelos]
+    referencia = medidas[0]["resultados"]
+    esperados = [e for _, _, e in imagenes]
+
+    print(f"{'Backend':<12} {'Carga s':>8} {'p50 ms':>8} {'p95 ms':>8} {'Img/s':>8} "
+          f"{'Coinc. %':>9} {'MAE conteo':>11}")
+
+    for m in medidas:
+        detectadas = sum(len(r) for r in m["resultados"])
+        pares = sum(coincidencias(ref, r) for ref, r in zip(referencia, m["resultados"]))
+        total = max(detectadas, sum(len(r) for r in referencia))
+        coinc = 100.0 * pares / total if total else 100.0
+
+        errores = [abs(len(r) - e) for r, e in zip(m["resultados"], esperados) if e is not None]
+        mae = f"{np.mean(errores):.2f}" if errores else "-"
+
+        print(f"{m['backend']:<12} {m['carga_s']:>8.2f} {m['p50_ms']:>8.1f} {m['p95_ms']:>8.1f} "
+              f"{m['img_s']:>8.1f} {coinc:>9.1f} {mae:>11}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Benchmark de inferencia por lotes (utils.yolo.inferir_lote) en CPU.
+
+Requiere opencv y el backend configurado (YOLO_BACKEND: ultralytics con
+un modelo .pt, u onnx con un modelo .onnx).
+
+Uso (desde la carpeta warehouse_mro):
+    python benchmarks/bench_yolo_batch.py modelo.pt
+    python benchmarks/bench_yolo_batch.py modelo.pt carpeta_imagenes/ 1 4 16
+
+Sin carpeta se generan imágenes sintéticas de 1280x720. Las imágenes se
+decodifican una vez antes de medir y no pasan por la caché de resultados,
+así cada tamaño de lote mide solo la inferencia.
+"""
+import os
+import sys
+import time
+
+import numpy as np
+from flask import Flask
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from utils import yolo  # noqa: E402
+
+LOTES = [1, 4, 16]
+IMAGENES = 32
+EXTENSIONES = (".jpg", ".jpeg", ".png")
+
+
+def preparar_imagenes(origen=None):
+    """Imágenes BGR decodificadas de `origen`, o sintéticas si no hay carpeta."""
+    if origen:
+        imagenes = []
+        for nombre in sorted(os.listdir(origen)):
+            if nombre.lower().endswith(EXTENSIONES) and "_yolo" not in nombre:
+                img = yolo.cv2.imread(os.path.join(origen, nombre))
+                if img is not None:
+                    imagenes.append(img)
+        return imagenes
+
+    rng = np.random.default_rng(42)
+    return [rng.integers(0, 255, (720, 1280, 3), dtype=np.uint8) for _ in range(IMAGENES)]
+
+
+def main(modelo, origen, lotes):
+    if yolo.cv2 is None:
+        sys.exit("opencv no está instalado.")
+
+    app = Flask(__name__)
+    app.config.update(
+        YOLO_MODEL_PATH=modelo,
+        YOLO_DEVICE="cpu",
+        YOLO_BACKEND=os.environ.get("YOLO_BACKEND", "ultralytics"),
+    )
+
+    with app.app_context():
+        imagenes = preparar_imagenes(origen)
+        if not imagenes:
+            sys.exit("No hay imágenes para procesar.")
+
+        inicio = time.perf_counter()
+        if not yolo.precargar_modelo():
+            sys.exit(f"No se pudo cargar el modelo: {modelo}")
+        print(f"Modelo cargado y calentado en {time.perf_counter() - inicio:.2f} s")
+        print(f"{len(imagenes)} imágenes\n")
+
+        print(f"{'Lote':>6} {'Segundos':>10} {'Imágenes/s':>12}")
+
+        for lote in lotes:
+            inicio = time.perf_counter()
+            yolo.inferir_lote(imagenes, batch_size=lote)
+            segundos = time.perf_counter() - inicio
+            print(f"{lote:>6} {segundos:>10.2f} {len(imagenes) / segundos:>12.1f}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        sys.exit(__doc__)
+
+    args = sys.argv[2:]
+    carpeta = args.pop(0) if args and not args[0].isdigit() else None
+    main(sys.argv[1], carpeta, [int(x) for x in args] or LOTES)
@@ -15,9 +15,68 @@ class Config:
     # Carpetas
     UPLOAD_FOLDER = os.path.join(BASE_DIR, "uploads")
     REPORT_FOLDER = os.path.join(BASE_DIR, "static", "reports")
+    CACHE_FOLDER = os.path.join(BASE_DIR, "cache")
+
+    # Ingesta masiva (filas por bloque de INSERT executemany)
+    INGEST_CHUNK_SIZE = 5000
+
+    # Segundos tras los que una tabla staging se considera huérfana (carga
+    # que falló) y la siguiente carga de la misma tabla la borra
+    INGEST_STAGING_TTL = 3600
+
+    # Lectura de Excel en streaming (filas por bloque)
+    EXCEL_CHUNK_ROWS = 20000
+
+    # Modo por defecto de carga de inventario:
+    #   "diff"     → solo INSERT/UPDATE/DELETE de las filas que cambiaron
+    #   "completo" → reemplazo total vía tabla staging + swap
+    INVENTORY_UPLOAD_MODE = "diff"
+
+    # Filas por página en la lista y el conteo de inventario (paginación por cursor)
+    INVENTORY_PAGE_SIZE = 200
+
+    # Filas por página en la tabla de bultos
+    BULTOS_PAGE_SIZE = 50
+
+    # Filas que trae cada vuelta del cursor al exportar bultos (Excel / CSV)
+    EXPORT_CHUNK_ROWS = 2000
+
+    # Segundos que se reutilizan los KPIs del dashboard (además de invalidarse
+    # en cada carga, bulto, error o alerta nueva)
+    DASHBOARD_CACHE_TTL = 300
+
+    # Detección de bultos con YOLO (opcional: requiere opencv y el runtime del backend)
+    #   "ultralytics" → modelo .pt con ultralytics
+    #   "onnx"        → modelo exportado .onnx con onnxruntime (CPU)
+    YOLO_BACKEND = os.environ.get("YOLO_BACKEND", "ultralytics")
+    YOLO_MODEL_PATH = os.environ.get("YOLO_MODEL_PATH")
+    YOLO_DEVICE = os.environ.get("YOLO_DEVICE", "cpu")
+    YOLO_IMGSZ = 640
+    YOLO_CONF = 0.25
+    YOLO_IOU = 0.7
+    # Hilos de inferencia en CPU (None = los que elija el runtime)
+    YOLO_THREADS = int(os.environ["YOLO_THREADS"]) if os.environ.get("YOLO_THREADS") else None
+    YOLO_BATCH_SIZE = 8
+    # Resultados guardados en CACHE_FOLDER/deteccion (LRU por número de entradas)
+    YOLO_CACHE_MAX_ENTRIES = 2000
+
+    # Pipeline de detección en segundo plano (python -m tasks.deteccion)
+    DETECCION_FOLDER = os.path.join(BASE_DIR, "static", "deteccion")
+    DETECCION_INBOX = os.environ.get("DETECCION_INBOX", os.path.join(BASE_DIR, "inbox_camaras"))
+    DETECCION_CHOFER = "Cámara"      # chofer de los bultos que llegan por el inbox
+    DETECCION_HILOS = 4              # hilos para decodificar / guardar imágenes
+    DETECCION_LOTE = 16              # trabajos tomados por vuelta
+    DETECCION_MAX_LADO = 1280        # lado mayor tras reducir la imagen
+    DETECCION_INTERVALO = 2          # segundos de espera con la cola vacía
+
+    # Reportes PDF nocturnos por usuario (python -m tasks.reportes)
+    REPORTES_HORA = os.environ.get("REPORTES_HORA", "07:00")
+    # Procesos que generan PDFs en paralelo
+    REPORTES_PROCESOS = int(os.environ.get("REPORTES_PROCESOS", min(4, os.cpu_count() or 1)))
 
 # Crear carpetas automáticamente si no existen
 os.makedirs(Config.UPLOAD_FOLDER, exist_ok=True)
 os.makedirs(Config.REPORT_FOLDER, exist_ok=True)
+os.makedirs(Config.CACHE_FOLDER, exist_ok=True)
 
 
@@ -12,3 +12,7 @@ from .equipos import Equipo
 from .productividad import Productividad
 from .auditoria import Auditoria
 from .alertas_ai import AlertaIA
+from .rollups import RollupHora, RollupDia
+from .deteccion import DeteccionJob
+from .actividad import ActividadUsuario
+from .reportes import ReporteJob
@@ -32,10 +32,10 @@ class Alert(db.Model):
     usuario = db.Column(db.String(120), nullable=True)
 
     # Estado interno
-    estado = db.Column(db.String(20), default="activo")  # activo / cerrado
+    estado = db.Column(db.String(20), default="activo", index=True)  # activo / cerrado
 
     # Fecha de creación
-    fecha = db.Column(db.DateTime, default=datetime.utcnow)
+    fecha = db.Column(db.DateTime, default=datetime.utcnow, index=True)
 
     # Datos extras en JSON
     detalles = db.Column(db.Text, nullable=True)
@@ -8,5 +8,5 @@ class Auditoria(db.Model):
     user_id = db.Column(db.Integer)
     accion = db.Column(db.String(255))
     modulo = db.Column(db.String(100))
-    fecha = db.Column(db.DateTime, default=datetime.utcnow)
+    fecha = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     ip = db.Column(db.String(100))
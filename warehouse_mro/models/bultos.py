@@ -8,9 +8,16 @@ class Bulto(db.Model):
     cantidad = db.Column(db.Integer, nullable=False)
     chofer = db.Column(db.String(120), nullable=False)
     placa = db.Column(db.String(20), nullable=False)
-    fecha_hora = db.Column(db.DateTime, default=datetime.now)
+    fecha_hora = db.Column(db.DateTime, default=datetime.now, index=True)
     observacion = db.Column(db.String(255))
 
+    # Registro manual o por detección de cámara (tasks.deteccion)
+    origen = db.Column(db.String(20), default="manual")
+    imagen = db.Column(db.String(255))
+    imagen_anotada = db.Column(db.String(255))
+    confianza = db.Column(db.Float)      # confianza media de las cajas
+    cajas = db.Column(db.Text)           # JSON con las cajas detectadas
+
     creado_en = db.Column(db.DateTime, default=datetime.now)
 
     def __repr__(self):
@@ -0,0 +1,51 @@
+from datetime import datetime
+from . import db
+
+# Estados de un trabajo de detección
+ESTADOS_JOB = ("pendiente", "procesando", "terminado", "error")
+
+
+class DeteccionJob(db.Model):
+    """
+    Imagen de cámara en cola para detectar bultos.
+    La web solo crea el trabajo y consulta su estado; el proceso
+    tasks.deteccion lo procesa y registra el Bulto resultante.
+    """
+    __tablename__ = "deteccion_jobs"
+
+    id = db.Column(db.Integer, primary_key=True)
+
+    imagen = db.Column(db.String(255), nullable=False)
+    origen = db.Column(db.String(20), nullable=False, default="upload")  # upload / inbox
+
+    # Datos del Bulto a registrar
+    chofer = db.Column(db.String(120), nullable=False, default="")
+    placa = db.Column(db.String(20), nullable=False, default="")
+    observacion = db.Column(db.String(255))
+
+    estado = db.Column(db.String(20), nullable=False, default="pendiente", index=True)
+    error = db.Column(db.String(255))
+
+    # Resultado
+    cantidad = db.Column(db.Integer)
+    imagen_anotada = db.Column(db.String(255))
+    bulto_id = db.Column(db.Integer, db.ForeignKey("bultos.id"), nullable=True)
+
+    creado_en = db.Column(db.DateTime, default=datetime.now, index=True)
+    iniciado_en = db.Column(db.DateTime)
+    terminado_en = db.Column(db.DateTime)
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "estado": self.estado,
+            "error": self.error,
+            "cantidad": self.cantidad,
+            "bulto_id": self.bulto_id,
+            "imagen_anotada": self.imagen_anotada,
+            "creado_en": self.creado_en.isoformat() if self.creado_en else None,
+            "terminado_en": self.terminado_en.isoformat() if self.terminado_en else None,
+        }
+
+    def __repr__(self):
+        return f"<DeteccionJob {self.id} - {self.estado}>"
@@ -1,6 +1,12 @@
 from models import db
 from datetime import datetime
 
+# Umbrales de status según libre utilización
+UMBRAL_CRITICO = 5
+UMBRAL_BAJO = 15
+
+STATUS_VALIDOS = ("vacío", "crítico", "bajo", "normal")
+
 class InventoryItem(db.Model):
     __tablename__ = "inventory"
 
@@ -11,21 +17,69 @@ class InventoryItem(db.Model):
     base_unit = db.Column(db.String(20), nullable=False)
     location = db.Column(db.String(50), nullable=False)
 
+    # Clave de orden de la ubicación (sort_location_advanced), calculada al cargar
+    loc_main = db.Column(db.Integer, nullable=True)
+    loc_letters = db.Column(db.String(50), nullable=True)
+    loc_last = db.Column(db.Integer, nullable=True)
+
     libre_utilizacion = db.Column(db.Float, default=0)
 
+    # Status guardado (se recalcula al cambiar libre_utilizacion)
+    status = db.Column(db.String(20), nullable=True, index=True)
+
+    # Huella de la fila (texto, unidad, stock) para cargas incrementales
+    row_hash = db.Column(db.String(40), nullable=True)
+
     creado_en = db.Column(db.DateTime, default=datetime.now)
 
+    __table_args__ = (
+        db.Index("ix_inventory_orden_ubicacion", "loc_main", "loc_letters", "loc_last", "id"),
+    )
+
+    @classmethod
+    def orden_ubicacion(cls):
+        """ORDER BY equivalente a sort_location_advanced(location)."""
+        return (cls.loc_main, cls.loc_letters, cls.loc_last, cls.id)
+
     # STATUS calculado
-    @property
-    def status(self):
+    def calcular_status(self):
         """Clasificación del material según libre utilización."""
-        if self.libre_utilizacion <= 0:
+        libre = self.libre_utilizacion or 0
+
+        if libre <= 0:
             return "vacío"
 
         # Cuando no existe stock máximo -> solo basamos en cantidades
-        if self.libre_utilizacion <= 5:
+        if libre <= UMBRAL_CRITICO:
             return "crítico"
-        elif self.libre_utilizacion <= 15:
+        elif libre <= UMBRAL_BAJO:
             return "bajo"
         else:
             return "normal"
+
+    @classmethod
+    def status_sql(cls, columnas=None):
+        """CASE equivalente a calcular_status(), para recalcular en SQL."""
+        t = cls if columnas is None else columnas
+        libre = db.func.coalesce(t.libre_utilizacion, 0)
+        return db.case(
+            (libre <= 0, "vacío"),
+            (libre <= UMBRAL_CRITICO, "crítico"),
+            (libre <= UMBRAL_BAJO, "bajo"),
+            else_="normal",
+        )
+
+    @classmethod
+    def filtro_status(cls, status):
+        """Condición SQL para filtrar por status (None si el status no existe)."""
+        if status not in STATUS_VALIDOS:
+            return None
+        return cls.status == status
+
+
+def _actualizar_status(mapper, connection, target):
+    target.status = target.calcular_status()
+
+
+db.event.listen(InventoryItem, "before_insert", _actualizar_status)
+db.event.listen(InventoryItem, "before_update", _actualizar_status)
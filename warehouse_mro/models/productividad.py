@@ -8,7 +8,7 @@ class Productividad(db.Model):
     usuario = db.Column(db.String(120), nullable=False)
     actividad = db.Column(db.String(255), nullable=False)
     duracion = db.Column(db.Float, default=0.0)
-    fecha = db.Column(db.DateTime, default=datetime.utcnow)
+    fecha = db.Column(db.DateTime, default=datetime.utcnow, index=True)
 
     def __repr__(self):
         return f"<Productividad {self.usuario} - {self.actividad}>"
@@ -0,0 +1,31 @@
+from datetime import datetime
+from . import db
+
+# Estados de un reporte programado
+ESTADOS_REPORTE = ("terminado", "omitido", "error")
+
+
+class ReporteJob(db.Model):
+    """
+    Un reporte PDF por usuario dentro de una corrida nocturna (tasks.reportes).
+    `huella` resume los datos con los que se generó: si en la corrida
+    siguiente no cambió, el reporte no se vuelve a generar (estado omitido).
+    """
+    __tablename__ = "reporte_jobs"
+
+    id = db.Column(db.Integer, primary_key=True)
+
+    corrida = db.Column(db.String(32), nullable=False, index=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False, index=True)
+
+    estado = db.Column(db.String(20), nullable=False, index=True)
+    huella = db.Column(db.String(40), nullable=False)
+    ruta = db.Column(db.String(255))
+
+    duracion = db.Column(db.Float)    # segundos dentro del proceso worker
+    error = db.Column(db.Text)
+
+    creado_en = db.Column(db.DateTime, default=datetime.now, index=True)
+
+    def __repr__(self):
+        return f"<ReporteJob {self.id} - usuario {self.user_id} - {self.estado}>"
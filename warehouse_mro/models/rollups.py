@@ -0,0 +1,46 @@
+from models import db
+
+
+# =====================================================================================
+#                     ROLLUPS POR HORA Y POR DÍA (GRÁFICOS)
+# =====================================================================================
+#
+# Una fila por (metrica, bucket_start, dimension):
+#   metrica      → "bultos", "alertas", "errores"
+#   bucket_start → inicio de la hora / del día
+#   dimension    → alert_type para alertas, técnico para errores, "" para bultos
+#   registros    → cantidad de filas originales en el bucket
+#   total        → suma del valor de la métrica (bultos: cantidad,
+#                  errores: dinero perdido, alertas: igual a registros)
+#
+# Se mantienen al insertar (utils.rollups) y se pueden reconstruir con
+# `flask --app app:create_app reconstruir-rollups`.
+
+class RollupHora(db.Model):
+    __tablename__ = "rollup_hora"
+
+    id = db.Column(db.Integer, primary_key=True)
+    metrica = db.Column(db.String(30), nullable=False)
+    bucket_start = db.Column(db.DateTime, nullable=False)
+    dimension = db.Column(db.String(120), nullable=False, default="")
+    registros = db.Column(db.Integer, nullable=False, default=0)
+    total = db.Column(db.Float, nullable=False, default=0.0)
+
+    __table_args__ = (
+        db.Index("ux_rollup_hora_clave", "metrica", "bucket_start", "dimension", unique=True),
+    )
+
+
+class RollupDia(db.Model):
+    __tablename__ = "rollup_dia"
+
+    id = db.Column(db.Integer, primary_key=True)
+    metrica = db.Column(db.String(30), nullable=False)
+    bucket_start = db.Column(db.DateTime, nullable=False)
+    dimension = db.Column(db.String(120), nullable=False, default="")
+    registros = db.Column(db.Integer, nullable=False, default=0)
+    total = db.Column(db.Float, nullable=False, default=0.0)
+
+    __table_args__ = (
+        db.Index("ux_rollup_dia_clave", "metrica", "bucket_start", "dimension", unique=True),
+    )
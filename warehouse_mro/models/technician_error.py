@@ -25,7 +25,7 @@ class TechnicianError(db.Model):
     puntaje = db.Column(db.Integer, nullable=False, default=0)
 
     # Fecha del error
-    fecha_hora = db.Column(db.DateTime, default=datetime.utcnow)
+    fecha_hora = db.Column(db.DateTime, default=datetime.utcnow, index=True)
 
     # Fecha de creación del registro (para el dashboard)
-    creado_en = db.Column(db.DateTime, default=datetime.utcnow)
+    creado_en = db.Column(db.DateTime, default=datetime.utcnow, index=True)
@@ -1,6 +1,14 @@
 from datetime import datetime
 from . import db
 
+# Severidad de cada status (el peor estado domina en una ubicación)
+STATUS_RANK = {
+    "vacío": 0,
+    "normal": 1,
+    "bajo": 2,
+    "crítico": 3,
+}
+
 class WarehouseLocation(db.Model):
     __tablename__ = "warehouse_locations"
 
@@ -16,22 +24,109 @@ class WarehouseLocation(db.Model):
     stock_seguridad = db.Column(db.Float, nullable=False, default=0.0)
     stock_maximo = db.Column(db.Float, nullable=False, default=0.0)
     ubicacion = db.Column(db.String(32), nullable=False, index=True)
+
+    # Clave de orden de la ubicación (sort_location_advanced), calculada al cargar
+    loc_main = db.Column(db.Integer, nullable=True)
+    loc_letters = db.Column(db.String(32), nullable=True)
+    loc_last = db.Column(db.Integer, nullable=True)
     libre_utilizacion = db.Column(db.Float, nullable=False, default=0.0)
 
+    # Status guardado (se recalcula al cambiar stock libre / seguridad / máximo)
+    status = db.Column(db.String(20), nullable=True, index=True)
+
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
-    @property
-    def status(self) -> str:
+    __table_args__ = (
+        db.Index("ix_warehouse_locations_orden", "loc_main", "loc_letters", "loc_last", "id"),
+    )
 
-        if self.libre_utilizacion <= 0:
+    @classmethod
+    def orden_ubicacion(cls):
+        """ORDER BY equivalente a sort_location_advanced(ubicacion)."""
+        return (cls.loc_main, cls.loc_letters, cls.loc_last, cls.id)
+
+    def calcular_status(self) -> str:
+        libre = self.libre_utilizacion or 0
+        maximo = self.stock_maximo or 0
+
+        if libre <= 0:
             return "vacío"
-        if self.stock_maximo <= 0:
+        if maximo <= 0:
             return "normal"
 
-        ratio = self.libre_utilizacion / self.stock_maximo
+        ratio = libre / maximo
 
-        if self.libre_utilizacion < self.stock_seguridad:
+        if libre < (self.stock_seguridad or 0):
             return "crítico"
         if ratio < 0.5:
             return "bajo"
         return "normal"
+
+    @classmethod
+    def status_sql(cls, columnas=None):
+        """
+        CASE equivalente a calcular_status(), para recalcular en SQL.
+        `columnas` permite usarlo sobre otra tabla con las mismas columnas
+        (ej. `table.c` en una migración).
+        """
+        t = cls if columnas is None else columnas
+        libre = db.func.coalesce(t.libre_utilizacion, 0)
+        maximo = db.func.coalesce(t.stock_maximo, 0)
+        return db.case(
+            (libre <= 0, "vacío"),
+            (maximo <= 0, "normal"),
+            (libre < db.func.coalesce(t.stock_seguridad, 0), "crítico"),
+            (libre < maximo * 0.5, "bajo"),
+            else_="normal",
+        )
+
+    @classmethod
+    def status_rank_sql(cls, columnas=None):
+        """CASE status → STATUS_RANK, para agregar el peor status en SQL."""
+        t = cls if columnas is None else columnas
+        return db.case(STATUS_RANK, value=t.status, else_=STATUS_RANK["vacío"])
+
+
+def _actualizar_status(mapper, connection, target):
+    target.status = target.calcular_status()
+
+
+db.event.listen(WarehouseLocation, "before_insert", _actualizar_status)
+db.event.listen(WarehouseLocation, "before_update", _actualizar_status)
+
+
+class WarehouseLocationSummary(db.Model):
+    """
+    Resumen por ubicación del layout 2D (stock libre, materiales y status).
+    Se reconstruye en la misma transacción que reemplaza warehouse_locations,
+    así el mapa y el dashboard leen esta tabla chica en vez del layout.
+    """
+    __tablename__ = "warehouse_location_summary"
+
+    id = db.Column(db.Integer, primary_key=True)
+
+    ubicacion = db.Column(db.String(32), nullable=False, unique=True)
+
+    loc_main = db.Column(db.Integer, nullable=True)
+    loc_letters = db.Column(db.String(32), nullable=True)
+    loc_last = db.Column(db.Integer, nullable=True)
+
+    total_libre = db.Column(db.Float, nullable=False, default=0.0)
+    items = db.Column(db.Integer, nullable=False, default=0)
+
+    # Peor status de la ubicación
+    status = db.Column(db.String(20), nullable=False, default="vacío")
+
+    # Materiales por status (el dashboard cuenta materiales, no ubicaciones)
+    vacios = db.Column(db.Integer, nullable=False, default=0)
+    normales = db.Column(db.Integer, nullable=False, default=0)
+    bajos = db.Column(db.Integer, nullable=False, default=0)
+    criticos = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        db.Index("ix_warehouse_location_summary_orden", "loc_main", "loc_letters", "loc_last", "id"),
+    )
+
+    @classmethod
+    def orden_ubicacion(cls):
+        return (cls.loc_main, cls.loc_letters, cls.loc_last, cls.id)
@@ -1,15 +1,94 @@
-from flask import Blueprint, render_template, request, redirect, url_for, send_file, flash
+from flask import Blueprint, render_template, request, redirect, url_for, send_file, flash, current_app, abort, jsonify
 from flask_login import login_required
+from sqlalchemy import and_, case, func, select
 from models.bultos import Bulto
+from models.deteccion import DeteccionJob
 from models import db
-from datetime import datetime
-import pandas as pd
-import io
+from utils.cache import CACHE_DASHBOARD, invalidar_cache
+from utils.excel import generate_rechazos_excel, iter_bultos_archivo
+from utils.ingest import importar_bultos
+from utils.pdf_tabular import Columna, generar_pdf_tabular
+from utils.fechas import rango_dia, rango_fechas
+from utils.rollups import serie_diaria
+from tasks.deteccion import encolar_imagen
+from datetime import date, datetime
 import calendar
+import csv
+import os
+import tempfile
+import time
+import uuid
+
+import xlsxwriter
 
 bultos_bp = Blueprint("bultos", __name__, url_prefix="/bultos")
 
 
+# =====================================================================
+#   FILTROS COMPARTIDOS (LISTA / EXPORTACIÓN)
+# =====================================================================
+def _leer_fecha(texto):
+    """YYYY-MM-DD → date (None si viene vacío o mal escrito)."""
+    try:
+        return datetime.strptime(texto, "%Y-%m-%d").date() if texto else None
+    except ValueError:
+        return None
+
+
+def _filtros_bultos(args):
+    """
+    Filtros de la URL y condiciones SQL equivalentes.
+    Los usan la lista, los KPIs, los gráficos y la exportación.
+    """
+    filtros = {
+        "chofer": args.get("chofer", "").strip(),
+        "placa": args.get("placa", "").strip(),
+        "desde": args.get("desde", "").strip(),
+        "hasta": args.get("hasta", "").strip(),
+    }
+
+    condiciones = []
+
+    if filtros["chofer"]:
+        condiciones.append(Bulto.chofer.ilike(f"%{filtros['chofer']}%"))
+
+    if filtros["placa"]:
+        condiciones.append(Bulto.placa.ilike(f"%{filtros['placa']}%"))
+
+    # Rango semiabierto [desde 00:00, día siguiente a hasta 00:00)
+    desde_dt, hasta_dt = rango_fechas(_leer_fecha(filtros["desde"]), _leer_fecha(filtros["hasta"]))
+
+    if desde_dt:
+        condiciones.append(Bulto.fecha_hora >= desde_dt)
+
+    if hasta_dt:
+        condiciones.append(Bulto.fecha_hora < hasta_dt)
+
+    return filtros, condiciones, desde_dt, hasta_dt
+
+
+def _serie_diaria_bultos(filtros, condiciones, desde_dt, hasta_dt):
+    """
+    [(día, cantidad)] en orden. Sin filtro de chofer/placa se lee el rollup
+    diario; con esos filtros, un GROUP BY por día sobre los bultos filtrados.
+    """
+    if not (filtros["chofer"] or filtros["placa"]):
+        return [
+            (dia.date(), int(total))
+            for dia, _, total in serie_diaria("bultos", desde_dt, hasta_dt)
+        ]
+
+    dia = func.date(Bulto.fecha_hora)
+    filas = (
+        db.session.query(dia, func.sum(Bulto.cantidad))
+        .filter(*condiciones)
+        .group_by(dia)
+        .order_by(dia)
+        .all()
+    )
+    return [(date.fromisoformat(d), int(total or 0)) for d, total in filas if d]
+
+
 # =====================================================================
 #   LISTA + KPIs + GRÁFICOS (COMPLETO)
 # =====================================================================
@@ -20,83 +99,78 @@ def list_bultos():
     # ---------------------------
     # FILTROS
     # ---------------------------
-    chofer = request.args.get("chofer", "").strip()
-    placa = request.args.get("placa", "").strip()
-    desde = request.args.get("desde", "").strip()
-    hasta = request.args.get("hasta", "").strip()
-
-    query = Bulto.query
-
-    if chofer:
-        query = query.filter(Bulto.chofer.ilike(f"%{chofer}%"))
-
-    if placa:
-        query = query.filter(Bulto.placa.ilike(f"%{placa}%"))
-
-    if desde:
-        desde_dt = datetime.strptime(desde, "%Y-%m-%d")
-        query = query.filter(Bulto.fecha_hora >= desde_dt)
-
-    if hasta:
-        hasta_dt = datetime.strptime(hasta, "%Y-%m-%d").replace(hour=23, minute=59, second=59)
-        query = query.filter(Bulto.fecha_hora <= hasta_dt)
-
-    bultos = query.order_by(Bulto.fecha_hora.asc()).all()
+    filtros, condiciones, desde_dt, hasta_dt = _filtros_bultos(request.args)
 
     # ---------------------------
-    # KPIs
+    # TABLA PAGINADA (solo la página pedida)
     # ---------------------------
-    total_bultos = sum(b.cantidad for b in bultos)
-    bultos_hoy = sum(b.cantidad for b in bultos if b.fecha_hora.date() == datetime.today().date())
-
-    total_trailers = len(set(b.placa for b in bultos if b.placa))
+    pagina = (
+        Bulto.query.filter(*condiciones)
+        .order_by(Bulto.fecha_hora.desc(), Bulto.id.desc())
+        .paginate(
+            page=request.args.get("page", 1, type=int),
+            per_page=current_app.config.get("BULTOS_PAGE_SIZE", 50),
+            error_out=False,
+        )
+    )
 
     # ---------------------------
-    # GRÁFICO: BULTOS POR DÍA
+    # KPIs (una consulta agregada sobre el conjunto filtrado)
     # ---------------------------
-    dias = []
-    bultos_dias = []
-
-    graf_dia = {}
-    for b in bultos:
-        d = b.fecha_hora.strftime("%d-%m")
-        graf_dia[d] = graf_dia.get(d, 0) + b.cantidad
-
-    for d, v in graf_dia.items():
-        dias.append(d)
-        bultos_dias.append(v)
+    hoy_inicio, hoy_fin = rango_dia()
+
+    total_bultos, bultos_hoy, total_trailers = (
+        db.session.query(
+            func.coalesce(func.sum(Bulto.cantidad), 0),
+            func.coalesce(
+                func.sum(
+                    case(
+                        (and_(Bulto.fecha_hora >= hoy_inicio, Bulto.fecha_hora < hoy_fin), Bulto.cantidad),
+                        else_=0,
+                    )
+                ),
+                0,
+            ),
+            func.count(func.distinct(case((Bulto.placa != "", Bulto.placa)))),
+        )
+        .filter(*condiciones)
+        .one()
+    )
 
     # ---------------------------
-    # GRÁFICO: BULTOS POR SEMANA
+    # SERIE DIARIA → DÍA / SEMANA ISO / MES
     # ---------------------------
-    semanas = []
-    bultos_sem = []
-    graf_sem = {}
+    serie = _serie_diaria_bultos(filtros, condiciones, desde_dt, hasta_dt)
+    varios_anios = len({d.year for d, _ in serie}) > 1
 
-    for b in bultos:
-        week_num = b.fecha_hora.isocalendar().week
-        graf_sem[week_num] = graf_sem.get(week_num, 0) + b.cantidad
+    # GRÁFICO: BULTOS POR DÍA
+    dias = [d.strftime("%d-%m-%Y" if varios_anios else "%d-%m") for d, _ in serie]
+    bultos_dias = [cantidad for _, cantidad in serie]
 
-    for s, v in graf_sem.items():
-        semanas.append(f"Semana {s}")
-        bultos_sem.append(v)
+    # GRÁFICO: BULTOS POR SEMANA (clave: año ISO + semana ISO)
+    graf_sem = {}
+    for d, cantidad in serie:
+        anio, semana, _ = d.isocalendar()
+        graf_sem[(anio, semana)] = graf_sem.get((anio, semana), 0) + cantidad
+
+    semanas = [
+        f"Semana {s} ({a})" if varios_anios else f"Semana {s}"
+        for a, s in graf_sem
+    ]
+    bultos_sem = list(graf_sem.values())
 
     semanas_totales = len(semanas)
 
-    # ---------------------------
-    # GRÁFICO: BULTOS POR MES
-    # ---------------------------
-    meses = []
-    bultos_mes = []
+    # GRÁFICO: BULTOS POR MES (clave: año + mes)
     graf_mes = {}
+    for d, cantidad in serie:
+        graf_mes[(d.year, d.month)] = graf_mes.get((d.year, d.month), 0) + cantidad
 
-    for b in bultos:
-        m = b.fecha_hora.month
-        graf_mes[m] = graf_mes.get(m, 0) + b.cantidad
-
-    for m, v in graf_mes.items():
-        meses.append(calendar.month_name[m])
-        bultos_mes.append(v)
+    meses = [
+        f"{calendar.month_name[m]} {a}" if varios_anios else calendar.month_name[m]
+        for a, m in graf_mes
+    ]
+    bultos_mes = list(graf_mes.values())
 
     # ---------------------------
     # INCONSISTENCIAS (simulado)
@@ -111,7 +185,9 @@ def list_bultos():
 
     return render_template(
         "bultos/list.html",
-        bultos=bultos,
+        bultos=pagina.items,
+        pagina=pagina,
+        filtros=filtros,
         total_bultos=total_bultos,
         bultos_hoy=bultos_hoy,
         total_trailers=total_trailers,
@@ -154,6 +230,7 @@ def new_bulto():
 
         db.session.add(nuevo_bulto)
         db.session.commit()
+        invalidar_cache(CACHE_DASHBOARD)
 
         flash("Bulto registrado correctamente", "success")
         return redirect(url_for("bultos.new_bulto"))
@@ -162,34 +239,287 @@ def new_bulto():
 
 
 # =====================================================================
-# EXPORTAR EXCEL
+# IMPORTACIÓN MASIVA (CSV / EXCEL)
 # =====================================================================
-@bultos_bp.route("/export")
+# Los reportes de filas rechazadas se guardan un día en CACHE_FOLDER
+REPORTE_RECHAZOS_HORAS = 24
+
+
+def _carpeta_rechazos():
+    carpeta = os.path.join(current_app.config["CACHE_FOLDER"], "rechazos_bultos")
+    os.makedirs(carpeta, exist_ok=True)
+    return carpeta
+
+
+def _guardar_rechazos(df):
+    """Guarda el Excel de rechazados y retorna su token de descarga."""
+    carpeta = _carpeta_rechazos()
+
+    # Limpieza de reportes viejos
+    limite = time.time() - REPORTE_RECHAZOS_HORAS * 3600
+    for nombre in os.listdir(carpeta):
+        ruta = os.path.join(carpeta, nombre)
+        try:
+            if os.path.getmtime(ruta) < limite:
+                os.remove(ruta)
+        except OSError:
+            pass
+
+    token = uuid.uuid4().hex
+    with open(os.path.join(carpeta, f"{token}.xlsx"), "wb") as f:
+        f.write(generate_rechazos_excel(df).getvalue())
+    return token
+
+
+@bultos_bp.route("/import", methods=["GET", "POST"])
 @login_required
-def export_excel():
+def import_bultos():
+    """
+    Carga masiva de bultos desde CSV o Excel.
+    Las filas válidas se insertan; las rechazadas quedan en un reporte descargable.
+    """
+    if request.method == "POST":
+        file = request.files.get("file")
+        if not file:
+            flash("Debe seleccionar un archivo CSV o Excel.", "warning")
+            return redirect(url_for("bultos.import_bultos"))
+
+        try:
+            bloques = iter_bultos_archivo(file)
+        except ValueError as e:
+            flash(str(e), "danger")
+            return redirect(url_for("bultos.import_bultos"))
+        except Exception:
+            flash("Error al leer el archivo de bultos. Verifique el formato.", "danger")
+            return redirect(url_for("bultos.import_bultos"))
+
+        try:
+            resumen = importar_bultos(bloques)
+        except Exception:
+            db.session.rollback()
+            flash("Error al leer el archivo de bultos. Verifique el formato.", "danger")
+            return redirect(url_for("bultos.import_bultos"))
+
+        if resumen["insertados"]:
+            invalidar_cache(CACHE_DASHBOARD)
+
+        rechazados = resumen["rechazados"]
+        token = _guardar_rechazos(rechazados) if not rechazados.empty else None
+
+        flash(
+            f"Importación terminada: {resumen['insertados']} bultos registrados, "
+            f"{len(rechazados)} filas rechazadas.",
+            "success" if rechazados.empty else "warning",
+        )
+
+        return render_template(
+            "bultos/import.html",
+            resumen=resumen,
+            rechazados=rechazados.head(20).to_dict("records"),
+            total_rechazados=len(rechazados),
+            token=token,
+        )
+
+    return render_template("bultos/import.html")
+
+
+@bultos_bp.route("/import/rechazos/<token>")
+@login_required
+def rechazos_import(token):
+    """Descarga el reporte de filas rechazadas de una importación."""
+    try:
+        token = uuid.UUID(token).hex
+    except ValueError:
+        abort(404)
+
+    ruta = os.path.join(_carpeta_rechazos(), f"{token}.xlsx")
+    if not os.path.exists(ruta):
+        flash("El reporte de rechazados ya no está disponible.", "warning")
+        return redirect(url_for("bultos.import_bultos"))
+
+    return send_file(ruta, download_name="bultos_rechazados.xlsx", as_attachment=True)
+
+
+# =====================================================================
+# DETECCIÓN POR CÁMARA (COLA EN SEGUNDO PLANO)
+# =====================================================================
+# La web solo encola imágenes y consulta el estado; la inferencia la hace
+# el proceso tasks.deteccion.
+def _job_json(job):
+    datos = job.to_dict()
+    datos["imagen_anotada"] = (
+        url_for("static", filename="deteccion/" + os.path.basename(job.imagen_anotada))
+        if job.imagen_anotada else None
+    )
+    return datos
 
-    bultos = Bulto.query.order_by(Bulto.fecha_hora.desc()).all()
 
-    data = [{
-        "ID": b.id,
-        "Cantidad": b.cantidad,
-        "Chofer": b.chofer,
-        "Placa": b.placa,
-        "Fecha y Hora": b.fecha_hora,
-        "Observación": b.observacion
-    } for b in bultos]
+@bultos_bp.route("/deteccion", methods=["GET", "POST"])
+@login_required
+def deteccion():
+    if request.method == "POST":
+        archivos = [f for f in request.files.getlist("imagenes") if f and f.filename]
+        if not archivos:
+            flash("Debe seleccionar al menos una imagen.", "warning")
+            return redirect(url_for("bultos.deteccion"))
+
+        try:
+            jobs = [
+                encolar_imagen(
+                    f,
+                    chofer=request.form.get("chofer", ""),
+                    placa=request.form.get("placa", ""),
+                    observacion=request.form.get("observacion") or None,
+                )
+                for f in archivos
+            ]
+        except ValueError as e:
+            db.session.rollback()
+            flash(str(e), "danger")
+            return redirect(url_for("bultos.deteccion"))
+
+        db.session.commit()
+
+        if request.accept_mimetypes.best == "application/json":
+            return jsonify([_job_json(j) for j in jobs]), 202
 
-    df = pd.DataFrame(data)
+        flash(f"{len(jobs)} imágenes en cola de detección.", "success")
+        return redirect(url_for("bultos.deteccion"))
 
-    output = io.BytesIO()
-    with pd.ExcelWriter(output, engine="xlsxwriter") as writer:
-        df.to_excel(writer, index=False, sheet_name="Bultos")
+    jobs = DeteccionJob.query.order_by(DeteccionJob.id.desc()).limit(30).all()
+    return render_template("bultos/deteccion.html", jobs=[_job_json(j) for j in jobs])
 
-    output.seek(0)
 
-    return send_file(
-        output,
-        download_name="bultos.xlsx",
+@bultos_bp.route("/deteccion/estado")
+@login_required
+def deteccion_estado():
+    """Estado de los trabajos ?ids=1,2,3 (para consultar desde la página)."""
+    ids = [int(x) for x in request.args.get("ids", "").split(",") if x.strip().isdigit()][:100]
+    jobs = DeteccionJob.query.filter(DeteccionJob.id.in_(ids)).all() if ids else []
+    return jsonify([_job_json(j) for j in jobs])
+
+
+# =====================================================================
+# EXPORTAR EXCEL / CSV / PDF (STREAMING)
+# =====================================================================
+COLUMNAS_EXPORT = ["ID", "Cantidad", "Chofer", "Placa", "Fecha y Hora", "Observación"]
+
+
+def _filas_export(condiciones):
+    """
+    Recorre los bultos filtrados por bloques con un cursor en streaming
+    (yield_per): nunca se cargan todos en memoria ni como objetos ORM.
+    """
+    consulta = (
+        select(
+            Bulto.id,
+            Bulto.cantidad,
+            Bulto.chofer,
+            Bulto.placa,
+            Bulto.fecha_hora,
+            Bulto.observacion,
+        )
+        .where(*condiciones)
+        .order_by(Bulto.fecha_hora.desc(), Bulto.id.desc())
+        .execution_options(yield_per=current_app.config.get("EXPORT_CHUNK_ROWS", 2000))
+    )
+    for fila in db.session.execute(consulta):
+        yield tuple(fila)
+
+
+def _escribir_xlsx(ruta, filas):
+    book = xlsxwriter.Workbook(ruta, {"constant_memory": True})
+    ws = book.add_worksheet("Bultos")
+
+    header = book.add_format({"bold": True})
+    fmt_fecha = book.add_format({"num_format": "dd/mm/yyyy hh:mm"})
+
+    ws.set_column(0, 1, 10)
+    ws.set_column(2, 2, 30)
+    ws.set_column(3, 3, 12)
+    ws.set_column(4, 4, 18)
+    ws.set_column(5, 5, 40)
+
+    ws.write_row(0, 0, COLUMNAS_EXPORT, header)
+
+    for row, (id_, cantidad, chofer, placa, fecha_hora, observacion) in enumerate(filas, start=1):
+        ws.write_row(row, 0, (id_, cantidad, chofer, placa))
+        if fecha_hora is not None:
+            ws.write_datetime(row, 4, fecha_hora, fmt_fecha)
+        if observacion:
+            ws.write_string(row, 5, observacion)
+
+    book.close()
+
+
+def _escribir_csv(ruta, filas):
+    # utf-8-sig: Excel abre bien las tildes del CSV
+    with open(ruta, "w", newline="", encoding="utf-8-sig") as f:
+        writer = csv.writer(f)
+        writer.writerow(COLUMNAS_EXPORT)
+        for id_, cantidad, chofer, placa, fecha_hora, observacion in filas:
+            writer.writerow([
+                id_,
+                cantidad,
+                chofer,
+                placa,
+                fecha_hora.strftime("%Y-%m-%d %H:%M:%S") if fecha_hora else "",
+                observacion or "",
+            ])
+
+
+def _escribir_pdf(ruta, filas):
+    columnas = [
+        Columna("ID", 0.6, "RIGHT"),
+        Columna("Cantidad", 0.8, "RIGHT"),
+        Columna("Chofer", 2),
+        Columna("Placa", 1),
+        Columna("Fecha y Hora", 1.4),
+        Columna("Observación", 3),
+    ]
+    pdf = generar_pdf_tabular("Reporte de Bultos", columnas, filas, horizontal=True)
+    with open(ruta, "wb") as f:
+        f.write(pdf)
+
+
+@bultos_bp.route("/export")
+@login_required
+def export_excel():
+    """
+    Exporta los bultos con los mismos filtros de /bultos/list.
+    ?formato=csv para CSV, ?formato=pdf para PDF; por defecto Excel.
+    El archivo se escribe en un temporal y se envía desde disco.
+    """
+    _, condiciones, _, _ = _filtros_bultos(request.args)
+    formato = request.args.get("formato", "xlsx").lower()
+
+    if formato == "csv":
+        sufijo, escribir = ".csv", _escribir_csv
+        mimetype = "text/csv"
+    elif formato == "pdf":
+        sufijo, escribir = ".pdf", _escribir_pdf
+        mimetype = "application/pdf"
+    else:
+        sufijo, escribir = ".xlsx", _escribir_xlsx
+        mimetype = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+    fd, ruta = tempfile.mkstemp(prefix="bultos_", suffix=sufijo)
+    os.close(fd)
+
+    try:
+        escribir(ruta, _filas_export(condiciones))
+    except Exception:
+        os.remove(ruta)
+        raise
+
+    response = send_file(
+        ruta,
+        download_name=f"bultos{sufijo}",
         as_attachment=True,
-        mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+        mimetype=mimetype
     )
+    # Borrar el temporal cuando termine de enviarse. Sin direct_passthrough
+    # el servidor WSGI cierra la respuesta (y corre call_on_close) al final.
+    response.direct_passthrough = False
+    response.call_on_close(lambda: os.remove(ruta))
+    return response
@@ -1,27 +1,32 @@
-from flask import Blueprint, render_template
+from flask import Blueprint, render_template, jsonify, current_app
 from flask_login import login_required
 from sqlalchemy import func
-from datetime import date
 
 from models.inventory import InventoryItem
 from models.bultos import Bulto
 from models.alerts import Alert        # ← CORREGIDO
-from models.warehouse2d import WarehouseLocation
+from models.warehouse2d import WarehouseLocationSummary
 from models.technician_error import TechnicianError
 from models.equipos import Equipo
+from utils.cache import CACHE_DASHBOARD, obtener_cache, estadisticas_cache
+from utils.fechas import rango_dia
+from utils.rollups import registros_por_dia_semana, registros_por_hora_del_dia
 
 dashboard_bp = Blueprint("dashboard", __name__, url_prefix="/dashboard")
 
 
-@dashboard_bp.route("/", endpoint="dashboard")
-@login_required
-def dashboard():
+def _calcular_kpis():
+    """Todas las consultas del dashboard; el resultado se cachea en CACHE_DASHBOARD."""
 
     # KPI PRINCIPALES
     total_stock = InventoryItem.query.count()
 
+    # Rango semiabierto [hoy 00:00, mañana 00:00) → usa el índice de la fecha
+    hoy_inicio, hoy_fin = rango_dia()
+
     bultos_hoy = Bulto.query.filter(
-        func.date(Bulto.fecha_hora) == date.today()
+        Bulto.fecha_hora >= hoy_inicio,
+        Bulto.fecha_hora < hoy_fin,
     ).count()
 
     alertas_activas = Alert.query.filter(
@@ -29,43 +34,28 @@ def dashboard():
     ).count()
 
     errores_hoy = TechnicianError.query.filter(
-        func.date(TechnicianError.creado_en) == date.today()
+        TechnicianError.creado_en >= hoy_inicio,
+        TechnicianError.creado_en < hoy_fin,
     ).count()
 
-    # ESTADOS DEL INVENTARIO
-    ubicaciones = WarehouseLocation.query.all()
-
-    criticos = sum(1 for i in ubicaciones if i.status == "crítico")
-    bajos = sum(1 for i in ubicaciones if i.status == "bajo")
-    normales = sum(1 for i in ubicaciones if i.status == "normal")
-    vacios = sum(1 for i in ubicaciones if i.status == "vacío")
-
-    # ALERTAS POR DÍA
-    alertas_por_dia = (
-        Alert.query.with_entities(
-            func.strftime("%w", Alert.fecha),
-            func.count(Alert.id)
-        )
-        .group_by(func.strftime("%w", Alert.fecha))
-        .all()
-    )
+    # ESTADOS DEL INVENTARIO (materiales por status, desde el resumen del layout)
+    resumen = WarehouseLocationSummary.query.with_entities(
+        func.coalesce(func.sum(WarehouseLocationSummary.criticos), 0),
+        func.coalesce(func.sum(WarehouseLocationSummary.bajos), 0),
+        func.coalesce(func.sum(WarehouseLocationSummary.normales), 0),
+        func.coalesce(func.sum(WarehouseLocationSummary.vacios), 0),
+    ).one()
 
+    criticos, bajos, normales, vacios = resumen
+
+    # ALERTAS POR DÍA (rollup diario)
     alertas_dias = [0] * 7
-    for dia, cant in alertas_por_dia:
-        alertas_dias[int(dia)] = cant
-
-    # BULTOS POR HORA
-    bultos_por_hora = (
-        Bulto.query.with_entities(
-            func.strftime("%H", Bulto.fecha_hora),
-            func.count(Bulto.id)
-        )
-        .group_by(func.strftime("%H", Bulto.fecha_hora))
-        .all()
-    )
+    for dia, cant in registros_por_dia_semana("alertas").items():
+        alertas_dias[dia] = cant
 
+    # BULTOS POR HORA (rollup por hora)
     horas = {str(h).zfill(2): 0 for h in range(6, 18)}
-    for h, cant in bultos_por_hora:
+    for h, cant in registros_por_hora_del_dia("bultos").items():
         if h in horas:
             horas[h] = cant
 
@@ -89,9 +79,7 @@ def dashboard():
         estado_labels = list(estados.keys())
         estado_values = list(estados.values())
 
-    # RENDER TEMPLATE COMPLETO
-    return render_template(
-        "dashboard.html",
+    return dict(
         total_stock=total_stock,
         bultos_hoy=bultos_hoy,
         alertas_activas=alertas_activas,
@@ -107,3 +95,24 @@ def dashboard():
         estado_labels=estado_labels,
         estado_values=estado_values
     )
+
+
+@dashboard_bp.route("/", endpoint="dashboard")
+@login_required
+def dashboard():
+
+    _, kpis = obtener_cache(
+        CACHE_DASHBOARD,
+        _calcular_kpis,
+        ttl=current_app.config.get("DASHBOARD_CACHE_TTL", 300),
+    )
+
+    # RENDER TEMPLATE COMPLETO
+    return render_template("dashboard.html", **kpis)
+
+
+@dashboard_bp.route("/cache-stats")
+@login_required
+def cache_stats():
+    """Hits / misses de los cachés de este worker (para revisar el hit ratio)."""
+    return jsonify(estadisticas_cache())
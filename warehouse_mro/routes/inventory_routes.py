@@ -1,3 +1,6 @@
+import base64
+import io
+import json
 from datetime import datetime
 
 import pandas as pd
@@ -9,20 +12,25 @@ from flask import (
     url_for,
     flash,
     send_file,
+    current_app,
+    jsonify,
 )
 from flask_login import login_required
-from sqlalchemy import func
+from sqlalchemy import func, select, tuple_
 
 from models import db
 from models.inventory import InventoryItem
-from models.alerts import Alert
 from utils.validators import roles_required
 from utils.excel import (
     load_inventory_excel,
+    iter_inventory_excel,
     load_warehouse2d_excel,  # por si luego lo quieres usar aquí
     generate_discrepancies_excel,
-    sort_location_advanced,
 )
+from utils.ingest import ingest_inventory, upsert_inventory
+from utils.discrepancias import clasificar_discrepancias, registrar_alertas_discrepancia
+from utils.cache import CACHE_DASHBOARD, invalidar_cache
+from utils.pdf_tabular import Columna, generar_pdf_tabular
 
 inventory_bp = Blueprint("inventory", __name__, url_prefix="/inventory")
 
@@ -36,7 +44,7 @@ inventory_bp = Blueprint("inventory", __name__, url_prefix="/inventory")
 def upload_inventory():
     """
     Carga el inventario base desde Excel (sistema).
-    Usa el validador flexible load_inventory_excel.
+    Usa el lector en streaming iter_inventory_excel (validación flexible).
     """
     if request.method == "POST":
         file = request.files.get("file")
@@ -45,7 +53,8 @@ def upload_inventory():
             return redirect(url_for("inventory.upload_inventory"))
 
         try:
-            df = load_inventory_excel(file)
+            # Lectura en streaming: valida encabezados y entrega bloques
+            bloques = iter_inventory_excel(file)
         except ValueError as e:
             flash(str(e), "danger")
             return redirect(url_for("inventory.upload_inventory"))
@@ -53,29 +62,150 @@ def upload_inventory():
             flash("Error al leer el archivo de inventario. Verifique el formato.", "danger")
             return redirect(url_for("inventory.upload_inventory"))
 
-        # Limpiamos inventario anterior
-        InventoryItem.query.delete()
-        db.session.commit()
+        modo = request.form.get("modo") or current_app.config.get("INVENTORY_UPLOAD_MODE", "diff")
 
-        # Insertamos nuevo inventario
-        for _, row in df.iterrows():
-            item = InventoryItem(
-                material_code=str(row["Código del Material"]).strip(),
-                material_text=str(row["Texto breve de material"]).strip(),
-                base_unit=str(row["Unidad de medida base"]).strip(),
-                location=str(row["Ubicación"]).strip(),
-                libre_utilizacion=float(row["Libre utilización"] or 0),
-            )
+        try:
+            if modo == "completo":
+                # Carga masiva en staging + swap atómico (la lista sigue mostrando
+                # el inventario anterior hasta que la carga termina)
+                stats = ingest_inventory(bloques)
+            else:
+                # Carga incremental: solo se escriben las filas que cambiaron
+                resumen = upsert_inventory(bloques)
+        except Exception:
+            # Los bloques se leen durante la carga: un Excel dañado falla aquí
+            db.session.rollback()
+            flash("Error al leer el archivo de inventario. Verifique el formato.", "danger")
+            return redirect(url_for("inventory.upload_inventory"))
 
-            db.session.add(item)
+        invalidar_cache(CACHE_DASHBOARD)
 
-        db.session.commit()
-        flash("Inventario cargado correctamente.", "success")
+        if modo == "completo":
+            flash(
+                f"Inventario cargado correctamente: {stats['filas']} filas "
+                f"({stats['filas_por_segundo']} filas/s).",
+                "success",
+            )
+        else:
+            flash(
+                "Inventario actualizado correctamente: "
+                f"{resumen['insertados']} nuevos, "
+                f"{resumen['actualizados']} modificados, "
+                f"{resumen['eliminados']} eliminados, "
+                f"{resumen['sin_cambios']} sin cambios.",
+                "success",
+            )
         return redirect(url_for("inventory.list_inventory"))
 
     return render_template("inventory/upload.html")
 
 
+# =====================================================================================
+#                         PAGINACIÓN POR CURSOR (KEYSET)
+# =====================================================================================
+#
+# La lista y el conteo se sirven por páginas en el orden de ubicación.
+# El cursor es la clave (loc_main, loc_letters, loc_last, id) de la última
+# fila entregada: la siguiente página es "todo lo que va después", resuelto
+# con el índice ix_inventory_orden_ubicacion sin OFFSET.
+
+def _filtros_inventario(args):
+    """Filtros de la URL: prefijo de ubicación, código de material y status."""
+    return {
+        "ubicacion": (args.get("ubicacion") or "").strip(),
+        "material": (args.get("material") or "").strip(),
+        "status": (args.get("status") or "").strip(),
+    }
+
+
+def _codificar_cursor(item):
+    clave = [item.loc_main, item.loc_letters, item.loc_last, item.id]
+    return base64.urlsafe_b64encode(json.dumps(clave).encode("utf-8")).decode("ascii")
+
+
+def _decodificar_cursor(cursor):
+    """Devuelve la clave del cursor o None si viene vacío o mal formado."""
+    if not cursor:
+        return None
+    try:
+        clave = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    except (ValueError, TypeError):
+        return None
+    if not isinstance(clave, list) or len(clave) != 4:
+        return None
+    return clave
+
+
+def _filtrar_inventario(query, filtros):
+    """Aplica los filtros de _filtros_inventario a una consulta de InventoryItem."""
+    if filtros["ubicacion"]:
+        query = query.filter(
+            InventoryItem.location.istartswith(filtros["ubicacion"], autoescape=True)
+        )
+    if filtros["material"]:
+        query = query.filter(
+            InventoryItem.material_code.istartswith(filtros["material"], autoescape=True)
+        )
+    if filtros["status"]:
+        condicion = InventoryItem.filtro_status(filtros["status"])
+        if condicion is not None:
+            query = query.filter(condicion)
+    return query
+
+
+def _pagina_inventario(filtros, cursor=None, limite=None):
+    """
+    Devuelve (items, siguiente_cursor) de una página del inventario.
+    siguiente_cursor es None cuando no quedan más filas.
+    """
+    limite = limite or current_app.config.get("INVENTORY_PAGE_SIZE", 200)
+    orden = InventoryItem.orden_ubicacion()
+
+    query = _filtrar_inventario(InventoryItem.query, filtros)
+
+    clave = _decodificar_cursor(cursor)
+    if clave is not None:
+        query = query.filter(tuple_(*orden) > tuple_(*clave))
+
+    # Se pide una fila extra para saber si hay página siguiente
+    items = query.order_by(*orden).limit(limite + 1).all()
+
+    siguiente = None
+    if len(items) > limite:
+        items = items[:limite]
+        siguiente = _codificar_cursor(items[-1])
+
+    return items, siguiente
+
+
+@inventory_bp.route("/api/items")
+@login_required
+def api_items():
+    """Página de inventario en JSON (carga progresiva desde inventory.js)."""
+    filtros = _filtros_inventario(request.args)
+    limite = request.args.get("limit", type=int)
+    if limite is not None:
+        limite = max(1, min(limite, 1000))
+
+    items, siguiente = _pagina_inventario(filtros, request.args.get("cursor"), limite)
+
+    return jsonify({
+        "items": [
+            {
+                "id": item.id,
+                "material_code": item.material_code,
+                "material_text": item.material_text,
+                "base_unit": item.base_unit,
+                "location": item.location,
+                "libre_utilizacion": item.libre_utilizacion,
+                "status": item.status,
+            }
+            for item in items
+        ],
+        "next_cursor": siguiente,
+    })
+
+
 # =====================================================================================
 #                                   LISTA INVENTARIO
 # =====================================================================================
@@ -84,17 +214,114 @@ def upload_inventory():
 @login_required
 def list_inventory():
     """
-    Muestra el inventario actual, ordenado por ubicación usando sort_location_advanced.
+    Muestra la primera página del inventario, ordenado por ubicación (clave de
+    sort_location_advanced guardada al cargar → ORDER BY en SQL).
+    El resto se carga al hacer scroll vía /inventory/api/items.
     """
-    items = InventoryItem.query.all()
-    items_sorted = sorted(items, key=lambda x: sort_location_advanced(x.location))
-    return render_template("inventory/list.html", items=items_sorted)
+    filtros = _filtros_inventario(request.args)
+    items, siguiente = _pagina_inventario(filtros)
+    return render_template(
+        "inventory/list.html",
+        items=items,
+        next_cursor=siguiente,
+        filtros=filtros,
+    )
+
+
+@inventory_bp.route("/export_pdf")
+@login_required
+def export_pdf():
+    """
+    Inventario completo en PDF, con los mismos filtros y orden de ubicación
+    que la lista. Las filas se leen en streaming (yield_per).
+    """
+    filtros = _filtros_inventario(request.args)
+
+    query = _filtrar_inventario(
+        db.session.query(
+            InventoryItem.material_code,
+            InventoryItem.material_text,
+            InventoryItem.base_unit,
+            InventoryItem.location,
+            InventoryItem.libre_utilizacion,
+            InventoryItem.status,
+        ),
+        filtros,
+    ).order_by(*InventoryItem.orden_ubicacion())
+
+    filas = query.yield_per(current_app.config.get("EXPORT_CHUNK_ROWS", 2000))
+
+    columnas = [
+        Columna("Código Material", 1.2),
+        Columna("Descripción", 3.5),
+        Columna("Unidad", 0.6),
+        Columna("Ubicación", 1),
+        Columna("Libre utilización", 1.2, "RIGHT"),
+        Columna("Status", 0.8, "CENTER"),
+    ]
+    filtros_usados = ", ".join(f"{k}: {v}" for k, v in filtros.items() if v)
+
+    pdf = generar_pdf_tabular(
+        "Inventario actual",
+        columnas,
+        filas,
+        subtitulo=f"Filtros — {filtros_usados}" if filtros_usados else None,
+        horizontal=True,
+    )
+
+    filename = f"inventario_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
+    return send_file(
+        io.BytesIO(pdf),
+        as_attachment=True,
+        download_name=filename,
+        mimetype="application/pdf",
+    )
 
 
 # =====================================================================================
 #                        DISCREPANCIAS USANDO EXCEL DE CONTEO
 # =====================================================================================
 
+def _enviar_discrepancias(df_final, formato=None):
+    """Envía el reporte de discrepancias como Excel (por defecto) o PDF."""
+    fecha = datetime.now().strftime('%Y%m%d_%H%M%S')
+
+    if formato == "pdf":
+        columnas = [
+            Columna("Código Material", 1.2),
+            Columna("Descripción", 3),
+            Columna("Unidad", 0.6),
+            Columna("Ubicación", 1),
+            Columna("Stock sistema", 1, "RIGHT"),
+            Columna("Stock contado", 1, "RIGHT"),
+            Columna("Diferencia", 1, "RIGHT"),
+            Columna("Estado", 0.8, "CENTER"),
+        ]
+        pdf = generar_pdf_tabular(
+            "Discrepancias de Inventario",
+            columnas,
+            df_final.itertuples(index=False, name=None),
+            horizontal=True,
+        )
+        return send_file(
+            io.BytesIO(pdf),
+            as_attachment=True,
+            download_name=f"discrepancias_inventario_{fecha}.pdf",
+            mimetype="application/pdf",
+        )
+
+    output = generate_discrepancies_excel(df_final)
+    return send_file(
+        output,
+        as_attachment=True,
+        download_name=f"discrepancias_inventario_{fecha}.xlsx",
+        mimetype=(
+            "application/vnd.openxmlformats-"
+            "officedocument.spreadsheetml.sheet"
+        ),
+    )
+
+
 @inventory_bp.route("/discrepancies", methods=["GET", "POST"])
 @login_required
 def discrepancies():
@@ -155,7 +382,8 @@ def discrepancies():
             )
         )
 
-        system_df = pd.read_sql(system_q.statement, db.session.bind)
+        resultado = db.session.execute(system_q.statement)
+        system_df = pd.DataFrame(resultado.all(), columns=list(resultado.keys()))
 
         # Merge sistema vs conteo
         merged = system_df.merge(
@@ -164,75 +392,19 @@ def discrepancies():
             how="outer",
         )
 
-        merged["Stock sistema"] = merged["Stock sistema"].fillna(0.0)
-        merged["Stock contado"] = merged["Stock contado"].fillna(0.0)
         merged["Descripción"] = merged["Descripción"].fillna("SIN DESCRIPCIÓN")
         merged["Unidad"] = merged["Unidad"].fillna("")
 
-        # Diferencia = contado - sistema
-        merged["Diferencia"] = merged["Stock contado"] - merged["Stock sistema"]
-
-        # Estado
-        estados = []
-        for _, r in merged.iterrows():
-            diff = r["Diferencia"]
-            if diff == 0:
-                estado = "OK"
-            elif diff < 0:
-                if diff <= -10:
-                    estado = "CRÍTICO"
-                else:
-                    estado = "FALTA"
-            else:
-                if diff >= 10:
-                    estado = "SOBRA"
-                else:
-                    estado = "SOBRA"
-            estados.append(estado)
-        merged["Estado"] = estados
-
-        # Orden final de columnas
-        df_final = merged[
-            [
-                "Código Material",
-                "Descripción",
-                "Unidad",
-                "Ubicación",
-                "Stock sistema",
-                "Stock contado",
-                "Diferencia",
-                "Estado",
-            ]
-        ].copy()
-
-        # Generar alertas por discrepancias negativas grandes
-        for _, r in df_final.iterrows():
-            if r["Diferencia"] <= -10:
-                msg = (
-                    f"Discrepancia crítica en {r['Código Material']} - {r['Ubicación']}: "
-                    f"Sistema={r['Stock sistema']}, Conteo={r['Stock contado']}."
-                )
-                alert = Alerta(
-                    alert_type="discrepancia",
-                    message=msg,
-                    severity="Alta",
-                )
-                db.session.add(alert)
-        db.session.commit()
+        # Diferencia = contado - sistema y Estado (vectorizado)
+        df_final = clasificar_discrepancias(merged)
 
-        # Generar Excel profesional
-        output = generate_discrepancies_excel(df_final)
-        filename = f"discrepancias_inventario_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
+        # Alertas por discrepancias negativas grandes, en un solo INSERT
+        if registrar_alertas_discrepancia(df_final):
+            db.session.commit()
+            invalidar_cache(CACHE_DASHBOARD)
 
-        return send_file(
-            output,
-            as_attachment=True,
-            download_name=filename,
-            mimetype=(
-                "application/vnd.openxmlformats-"
-                "officedocument.spreadsheetml.sheet"
-            ),
-        )
+        # Excel profesional o PDF según lo elegido en el formulario
+        return _enviar_discrepancias(df_final, request.form.get("formato"))
 
     return render_template("inventory/discrepancies.html")
 
@@ -246,83 +418,69 @@ def discrepancies():
 def count_inventory():
     """
     Permite hacer el conteo directamente en el HTML:
-    - GET: muestra inventario con campo 'Stock contado'
-    - POST: genera Excel de discrepancias usando lo que se digitó
+    - GET: muestra inventario con campo 'Stock contado' (paginado por cursor)
+    - POST: genera Excel (o PDF) de discrepancias usando lo que se digitó.
+      Solo se consideran las filas que llegaron en el formulario: las páginas
+      que no se cargaron en pantalla no se cuentan como cero.
     """
     if request.method == "GET":
-        items = InventoryItem.query.all()
-        items_sorted = sorted(items, key=lambda x: sort_location_advanced(x.location))
-        return render_template("inventory/count.html", items=items_sorted)
+        filtros = _filtros_inventario(request.args)
+        items, siguiente = _pagina_inventario(filtros)
+        return render_template(
+            "inventory/count.html",
+            items=items,
+            next_cursor=siguiente,
+            filtros=filtros,
+        )
 
-    # POST: recibir conteo desde formulario
-    items = InventoryItem.query.all()
+    # POST: recibir conteo desde formulario (solo las filas que se enviaron)
+    conteo = pd.DataFrame(
+        [
+            (campo[len("count_"):], valor.strip())
+            for campo, valor in request.form.items()
+            if campo.startswith("count_")
+        ],
+        columns=["id", "Stock contado"],
+    )
+    conteo["id"] = pd.to_numeric(conteo["id"], errors="coerce")
+    conteo = conteo.dropna(subset=["id"]).astype({"id": "int64"})
+
+    if conteo.empty:
+        flash("No se recibió ningún conteo.", "warning")
+        return redirect(url_for("inventory.count_inventory"))
+
+    # Stock del sistema de esas filas (IN por bloques)
+    columnas = [
+        InventoryItem.id.label("id"),
+        InventoryItem.material_code.label("Código Material"),
+        InventoryItem.material_text.label("Descripción"),
+        InventoryItem.base_unit.label("Unidad"),
+        InventoryItem.location.label("Ubicación"),
+        InventoryItem.libre_utilizacion.label("Stock sistema"),
+        *InventoryItem.orden_ubicacion()[:3],
+    ]
+    ids = conteo["id"].tolist()
     filas = []
-
-    for item in items:
-        field_name = f"count_{item.id}"
-        raw_val = request.form.get(field_name, "").strip()
-
-        try:
-            contado = float(raw_val) if raw_val != "" else 0.0
-        except ValueError:
-            contado = 0.0
-
-        sistema = float(item.libre_utilizacion or 0.0)
-        diferencia = contado - sistema
-
-        # Estado
-        if diferencia == 0:
-            estado = "OK"
-        elif diferencia < 0:
-            if diferencia <= -10:
-                estado = "CRÍTICO"
-            else:
-                estado = "FALTA"
-        else:
-            if diferencia >= 10:
-                estado = "SOBRA"
-            else:
-                estado = "SOBRA"
-
-        filas.append(
-            {
-                "Código Material": item.material_code,
-                "Descripción": item.material_text,
-                "Unidad": item.base_unit,
-                "Ubicación": item.location,
-                "Stock sistema": sistema,
-                "Stock contado": contado,
-                "Diferencia": diferencia,
-                "Estado": estado,
-            }
+    for i in range(0, len(ids), 500):
+        filas.extend(
+            db.session.execute(
+                select(*columnas).where(InventoryItem.id.in_(ids[i:i + 500]))
+            ).all()
         )
 
-        # Alerta por discrepancia crítica
-        if diferencia <= -10:
-            msg = (
-                f"Discrepancia crítica en {item.material_code} - {item.location}: "
-                f"Sistema={sistema}, Conteo={contado}."
-            )
-            alert = Alert(
-                alert_type="discrepancia",
-                message=msg,
-                severity="Alta",
-            )
-            db.session.add(alert)
+    sistema_df = pd.DataFrame(filas, columns=[c.key for c in columnas])
 
-    db.session.commit()
+    # Mismo orden de ubicación que la pantalla
+    merged = sistema_df.merge(conteo, on="id", how="inner").sort_values(
+        ["loc_main", "loc_letters", "loc_last", "id"]
+    )
 
-    df_final = pd.DataFrame(filas)
+    # Diferencia + Estado vectorizados; "" o texto inválido cuenta como 0
+    df_final = clasificar_discrepancias(merged)
 
-    output = generate_discrepancies_excel(df_final)
-    filename = f"discrepancias_inventario_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
+    # Alertas por discrepancia crítica en un solo INSERT
+    if registrar_alertas_discrepancia(df_final):
+        db.session.commit()
+        invalidar_cache(CACHE_DASHBOARD)
 
-    return send_file(
-        output,
-        as_attachment=True,
-        download_name=filename,
-        mimetype=(
-            "application/vnd.openxmlformats-"
-            "officedocument.spreadsheetml.sheet"
-        ),
-    )
+    return _enviar_discrepancias(df_final, request.form.get("formato"))
@@ -2,11 +2,12 @@ from flask import Blueprint, render_template, request, redirect, url_for, flash,
 from flask_login import login_required, current_user
 from models import db
 from models.technician_error import TechnicianError
+from utils.cache import CACHE_DASHBOARD, invalidar_cache, obtener_artefacto
+from utils.rollups import serie_diaria
 from datetime import datetime
 from sqlalchemy import func
-from reportlab.lib.pagesizes import letter
-from reportlab.pdfgen import canvas
-import os
+from utils.pdf_tabular import Columna, generar_pdf_tabular
+import io
 
 
 technician_errors_bp = Blueprint(
@@ -60,6 +61,7 @@ def new_error():
 
         db.session.add(nuevo)
         db.session.commit()
+        invalidar_cache(CACHE_DASHBOARD)
 
         flash("Error registrado exitosamente.", "success")
         return redirect(url_for("technician_errors.list_errors"))
@@ -88,17 +90,11 @@ def list_errors():
     )
     ranking_dict = {r[0]: float(r[1]) for r in ranking}
 
-    # Gráfico por día
-    graf_raw = (
-        db.session.query(
-            func.date(TechnicianError.fecha_hora),
-            func.sum(TechnicianError.dinero_perdido)
-        )
-        .group_by(func.date(TechnicianError.fecha_hora))
-        .order_by(func.date(TechnicianError.fecha_hora))
-        .all()
-    )
-    graf_por_dia = {str(r[0]): float(r[1]) for r in graf_raw}
+    # Gráfico por día (rollup diario: dinero perdido)
+    graf_por_dia = {
+        dia.date().isoformat(): float(total)
+        for dia, _, total in serie_diaria("errores")
+    }
 
     return render_template(
         "technician_errors/form_list.html",
@@ -111,53 +107,75 @@ def list_errors():
 # ---------------------------------------------------------
 # REPORTE PDF (NUEVO - SIN ERRORES)
 # ---------------------------------------------------------
-@technician_errors_bp.route("/reporte_pdf")
-@login_required
-def reporte_pdf():
-
-    errores = TechnicianError.query.order_by(TechnicianError.fecha_hora.desc()).all()
-
-    # Nombre del archivo PDF temporal
-    pdf_path = "reporte_errores.pdf"
-
-    c = canvas.Canvas(pdf_path, pagesize=letter)
-    width, height = letter
-
-    # --------------------------
-    # TÍTULO DEL REPORTE
-    # --------------------------
-    c.setFont("Helvetica-Bold", 18)
-    c.drawString(50, height - 50, "Reporte de Errores Técnicos - SIDERPERU")
-
-    c.setFont("Helvetica", 12)
-    c.drawString(50, height - 80, f"Generado por: {current_user.username}")
-    c.drawString(50, height - 100, f"Fecha: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+def _version_errores():
+    """
+    (max id, cantidad, último fecha_hora) de TechnicianError: cambia con
+    cada error nuevo o borrado.
+    """
+    return tuple(
+        db.session.query(
+            func.max(TechnicianError.id),
+            func.count(TechnicianError.id),
+            func.max(TechnicianError.fecha_hora)
+        ).one()
+    )
 
-    # --------------------------
-    # TABLA
-    # --------------------------
-    y = height - 140
-    c.setFont("Helvetica-Bold", 11)
-    c.drawString(50, y, "Técnico")
-    c.drawString(200, y, "Tipo")
-    c.drawString(350, y, "S/ Perdido")
-    c.drawString(450, y, "Puntaje")
-    y -= 20
 
-    c.setFont("Helvetica", 10)
+def _render_reporte_pdf(usuario, datos_al):
+    """
+    Genera el PDF en memoria (motor tabular, filas en streaming) y retorna sus bytes.
 
-    for e in errores:
-        if y < 50:
-            c.showPage()
-            y = height - 50
+    El PDF queda cacheado: se fecha con el último error registrado
+    (`datos_al`), no con la hora de generación.
+    """
+    errores = (
+        db.session.query(
+            TechnicianError.tecnico,
+            TechnicianError.tipo_error,
+            TechnicianError.dinero_perdido,
+            TechnicianError.puntaje
+        )
+        .order_by(TechnicianError.fecha_hora.desc())
+        .yield_per(500)
+    )
 
-        c.drawString(50, y, str(e.tecnico))
-        c.drawString(200, y, str(e.tipo_error))
-        c.drawString(350, y, f"S/ {e.dinero_perdido:.2f}")
-        c.drawString(450, y, str(e.puntaje))
+    columnas = [
+        Columna("Técnico", 2),
+        Columna("Tipo", 3),
+        Columna("S/ Perdido", 1.2, "RIGHT", lambda v: f"S/ {v or 0:.2f}"),
+        Columna("Puntaje", 1, "RIGHT"),
+    ]
+
+    fecha = datos_al.strftime('%Y-%m-%d %H:%M:%S') if datos_al else "sin registros"
+
+    return generar_pdf_tabular(
+        "Reporte de Errores Técnicos - SIDERPERU",
+        columnas,
+        errores,
+        subtitulo=f"Generado por: {usuario} — Datos al: {fecha}",
+        pie=f"Sistema Warehouse MRO — Datos al: {fecha}"
+    )
 
-        y -= 18
 
-    c.save()
+@technician_errors_bp.route("/reporte_pdf")
+@login_required
+def reporte_pdf():
+    """
+    El PDF se guarda por versión de los datos (y usuario del encabezado):
+    mientras no haya errores nuevos, las descargas repetidas no lo regeneran.
+    """
+    usuario = current_user.username
+    version = _version_errores()
+
+    pdf = obtener_artefacto(
+        "reporte_errores",
+        version + (usuario,),
+        lambda: _render_reporte_pdf(usuario, version[2])
+    )
 
-    return send_file(pdf_path, as_attachment=True)
+    return send_file(
+        io.BytesIO(pdf),
+        download_name="reporte_errores.pdf",
+        as_attachment=True,
+        mimetype="application/pdf"
+    )
@@ -9,24 +9,21 @@ from flask import (
     url_for,
     flash,
     jsonify,
+    Response,
 )
 from flask_login import login_required, current_user
-
 from models import db
-from models.warehouse2d import WarehouseLocation
+from models.warehouse2d import WarehouseLocation, WarehouseLocationSummary
 from models.alerts import Alert
-from utils.excel import load_warehouse2d_excel, sort_location_advanced
+from utils.excel import iter_warehouse2d_excel
+from utils.ingest import ingest_warehouse2d
+from utils.cache import CACHE_DASHBOARD, version_cache, invalidar_cache, obtener_cache
 
 warehouse2d_bp = Blueprint("warehouse2d", __name__, url_prefix="/warehouse2d")
 
+# Nombre del caché del mapa (cambia de versión con cada carga del layout)
+CACHE_LAYOUT = "layout2d"
 
-# Ranking de severidad
-STATUS_RANK = {
-    "vacío": 0,
-    "normal": 1,
-    "bajo": 2,
-    "crítico": 3,
-}
 
 
 # =====================================================================================
@@ -50,7 +47,8 @@ def upload_warehouse2d():
             return redirect(url_for("warehouse2d.upload_warehouse2d"))
 
         try:
-            df = load_warehouse2d_excel(file)
+            # Lectura en streaming: valida encabezados y entrega bloques
+            bloques = iter_warehouse2d_excel(file)
         except ValueError as e:
             flash(str(e), "danger")
             return redirect(url_for("warehouse2d.upload_warehouse2d"))
@@ -58,53 +56,44 @@ def upload_warehouse2d():
             flash("Error al procesar el archivo 2D. Revise formato y columnas.", "danger")
             return redirect(url_for("warehouse2d.upload_warehouse2d"))
 
-        # 🔥 Limpiamos la tabla antes de cargar nuevo layout
-        WarehouseLocation.query.delete()
-        db.session.commit()
+        # ---------------------------------------------
+        # Cargar en staging y reemplazar el layout de golpe
+        # (el mapa sigue mostrando el layout anterior mientras tanto)
+        # ---------------------------------------------
+        try:
+            ingest_warehouse2d(bloques)
+        except Exception:
+            db.session.rollback()
+            flash("Error al procesar el archivo 2D. Revise formato y columnas.", "danger")
+            return redirect(url_for("warehouse2d.upload_warehouse2d"))
 
         # ---------------------------------------------
-        # Insertar datos del Excel
+        # Alertas de stock crítico del layout recién cargado
+        # (status guardado al cargar → búsqueda por índice)
         # ---------------------------------------------
-        for _, row in df.iterrows():
-
-            cod = str(row.get("Código del Material", "")).strip()
-            desc = str(row.get("Texto breve de material", "")).strip()
-            umb = str(row.get("Unidad de medida base", "")).strip()
-            ubi = str(row.get("Ubicación", "")).strip()
-
-            seg = float(row.get("Stock de seguridad", 0) or 0)
-            maxi = float(row.get("Stock máximo", 0) or 0)
-            libre = float(row.get("Libre utilización", 0) or 0)
-
-            item = WarehouseLocation(
-                material_code=cod,
-                material_text=desc,
-                base_unit=umb,
-                ubicacion=ubi,
-                stock_seguridad=seg,
-                stock_maximo=maxi,
-                libre_utilizacion=libre,
+        criticos = WarehouseLocation.query.filter(
+            WarehouseLocation.status == "crítico"
+        ).all()
+
+        for item in criticos:
+            mensaje = (
+                f"Stock crítico en {item.ubicacion}: {item.material_code} "
+                f"({item.material_text}) "
+                f"Libre={item.libre_utilizacion}, Seguridad={item.stock_seguridad}"
             )
-
-            db.session.add(item)
-
-            # VERIFICAR ESTADO
-            estado = item.status  # Según modelo
-
-            if estado == "crítico":
-                mensaje = (
-                    f"Stock crítico en {ubi}: {cod} ({desc}) "
-                    f"Libre={libre}, Seguridad={seg}"
-                )
-                alerta = Alert(
-                    alert_type="stock_critico_2d",
-                    message=mensaje,
-                    severity="Alta",
-                )
-                db.session.add(alerta)
+            alerta = Alert(
+                alert_type="stock_critico_2d",
+                message=mensaje,
+                severity="Alta",
+            )
+            db.session.add(alerta)
 
         db.session.commit()
 
+        # El mapa y los KPIs cacheados ya no corresponden al layout nuevo
+        invalidar_cache(CACHE_LAYOUT)
+        invalidar_cache(CACHE_DASHBOARD)
+
         flash("El layout 2D fue cargado correctamente.", "success")
         return redirect(url_for("warehouse2d.map_view"))
 
@@ -125,46 +114,47 @@ def map_view():
 #                           DATA PARA EL MAPA (JSON)
 # =====================================================================================
 
+def _resumen_por_ubicacion():
+    """
+    Stock libre total, cantidad de materiales y peor status por ubicación,
+    leídos de warehouse_location_summary (calculada al cargar el layout).
+    """
+    filas = WarehouseLocationSummary.query.order_by(
+        *WarehouseLocationSummary.orden_ubicacion()
+    ).all()
+
+    return [
+        {
+            "location": r.ubicacion or "SIN UBICACIÓN",
+            "total_libre": float(r.total_libre or 0),
+            "items": r.items,
+            "status": r.status,
+        }
+        for r in filas
+    ]
+
+
 @warehouse2d_bp.route("/map-data")
 @login_required
 def map_data():
-
-    items = WarehouseLocation.query.all()
-    por_ubicacion = {}
-
-    for item in items:
-        loc = item.ubicacion or "SIN UBICACIÓN"
-        estado_item = item.status
-
-        if loc not in por_ubicacion:
-            por_ubicacion[loc] = {
-                "location": loc,
-                "total_libre": 0.0,
-                "items": 0,
-                "status": estado_item,
-                "rank": STATUS_RANK.get(estado_item, 0),
-            }
-
-        por_ubicacion[loc]["total_libre"] += float(item.libre_utilizacion or 0)
-        por_ubicacion[loc]["items"] += 1
-
-        # El peor estado domina
-        rank = STATUS_RANK.get(estado_item, 0)
-        if rank > por_ubicacion[loc]["rank"]:
-            por_ubicacion[loc]["rank"] = rank
-            por_ubicacion[loc]["status"] = estado_item
-
-    # Ordenar ubicaciones
-    data_sorted = sorted(
-        por_ubicacion.values(),
-        key=lambda x: sort_location_advanced(x["location"])
-    )
-
-    # Quitar rank interno
-    for d in data_sorted:
-        d.pop("rank", None)
-
-    return jsonify(data_sorted)
+    """
+    Resumen del mapa cacheado por versión del layout.
+    El ETag es la versión: si el navegador ya la tiene responde 304
+    sin consultar la BD.
+    """
+    actual = version_cache(CACHE_LAYOUT)
+    if request.if_none_match.contains(actual):
+        respuesta = Response(status=304)
+        respuesta.set_etag(actual)
+        return respuesta
+
+    version, datos = obtener_cache(CACHE_LAYOUT, _resumen_por_ubicacion)
+
+    respuesta = jsonify(datos)
+    respuesta.set_etag(version)
+    # Siempre revalidar con el servidor (el 304 es casi gratis)
+    respuesta.headers["Cache-Control"] = "no-cache"
+    return respuesta
 
 
 # =====================================================================================
@@ -1,2 +1,101 @@
-// Espacio para lógica futura de inventario
-console.log("inventory.js cargado");
+// =====================================================================================
+//          CARGA PROGRESIVA DEL INVENTARIO (lista y conteo en línea)
+// =====================================================================================
+//
+// La página trae solo la primera página de materiales. Cuando el usuario llega
+// al final de la tabla se pide la siguiente a /inventory/api/items usando el
+// cursor que devolvió la página anterior.
+
+function escapeHtml(texto) {
+    return String(texto ?? "")
+        .replace(/&/g, "&amp;")
+        .replace(/</g, "&lt;")
+        .replace(/>/g, "&gt;")
+        .replace(/"/g, "&quot;")
+        .replace(/'/g, "&#39;");
+}
+
+function formatoStock(valor) {
+    return Number(valor || 0).toFixed(2);
+}
+
+function filaInventario(item, modo) {
+    const tr = document.createElement("tr");
+
+    let html = `
+        <td>${escapeHtml(item.material_code)}</td>
+        <td>${escapeHtml(item.material_text)}</td>
+        <td>${escapeHtml(item.base_unit)}</td>
+        <td>${escapeHtml(item.location)}</td>
+        <td class="text-end">${formatoStock(item.libre_utilizacion)}</td>
+    `;
+
+    if (modo === "conteo") {
+        html += `
+            <td class="text-end" style="max-width: 110px;">
+                <input type="number"
+                       step="0.01"
+                       min="0"
+                       name="count_${Number(item.id)}"
+                       class="form-control form-control-sm text-end"
+                       placeholder="0.00">
+            </td>
+        `;
+    }
+
+    tr.innerHTML = html;
+    return tr;
+}
+
+function initInventoryScroll() {
+    const sentinel = document.getElementById("inventory-sentinel");
+    const tbody = document.getElementById("inventory-body");
+    if (!sentinel || !tbody) return;
+
+    const modo = sentinel.dataset.modo || "lista";
+    let cursor = sentinel.dataset.cursor;
+    let cargando = false;
+
+    if (!cursor) return;
+
+    async function cargarSiguiente() {
+        if (cargando || !cursor) return;
+        cargando = true;
+
+        try {
+            const url = new URL(sentinel.dataset.url, window.location.origin);
+            url.searchParams.set("cursor", cursor);
+
+            const response = await fetch(url);
+            if (!response.ok) throw new Error(`HTTP ${response.status}`);
+            const data = await response.json();
+
+            data.items.forEach(item => tbody.appendChild(filaInventario(item, modo)));
+            cursor = data.next_cursor;
+        } catch (error) {
+            console.error("Error cargando inventario:", error);
+            sentinel.textContent = "No se pudo cargar más inventario. Recargue la página.";
+            cursor = null;
+            return;
+        } finally {
+            cargando = false;
+        }
+
+        if (!cursor) {
+            observer.disconnect();
+            sentinel.classList.add("d-none");
+        } else {
+            // Si el sentinel sigue visible (pantalla alta) se vuelve a disparar
+            observer.unobserve(sentinel);
+            observer.observe(sentinel);
+        }
+    }
+
+    const observer = new IntersectionObserver(entries => {
+        if (entries.some(e => e.isIntersecting)) cargarSiguiente();
+    }, { rootMargin: "400px" });
+
+    observer.observe(sentinel);
+}
+
+document.addEventListener("DOMContentLoaded", initInventoryScroll);
@@ -0,0 +1,243 @@
+"""
+Pipeline de detección de bultos en segundo plano.
+
+Corre en un proceso aparte del servidor web, que es el único que carga el
+modelo y hace inferencia:
+
+    python -m tasks.deteccion
+
+La web solo encola (encolar_imagen) y consulta el estado del trabajo.
+Cada vuelta del proceso:
+  1. Toma las imágenes nuevas de la carpeta DETECCION_INBOX (cámaras).
+  2. Detecta los bultos de las imágenes pendientes con
+     utils.yolo.detectar_con_cache: lectura y anotación en un pool de
+     hilos, inferencia por lotes solo para las que no están en la caché
+     de detección (misma foto por contenido).
+  3. Registra un Bulto por imagen con la metadata de detección.
+"""
+import json
+import os
+import re
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from flask import current_app
+
+from models import db
+from models.bultos import Bulto
+from models.deteccion import DeteccionJob
+from utils import yolo
+from utils.cache import CACHE_DASHBOARD, invalidar_cache
+
+EXTENSIONES = (".jpg", ".jpeg", ".png")
+
+# Placa al inicio del nombre del archivo de cámara: ABC-123_20260101_0800.jpg
+PLACA_ARCHIVO = re.compile(r"^([A-Z0-9]+(?:-[A-Z0-9]+)*)_")
+
+
+# =====================================================================================
+#                                 ENCOLAR (WEB)
+# =====================================================================================
+
+def _carpeta_imagenes():
+    carpeta = current_app.config["DETECCION_FOLDER"]
+    os.makedirs(carpeta, exist_ok=True)
+    return carpeta
+
+
+def encolar_imagen(file_storage, chofer="", placa="", observacion=None):
+    """Guarda la imagen subida y crea su trabajo pendiente (sin commit)."""
+    extension = os.path.splitext(file_storage.filename or "")[1].lower()
+    if extension not in EXTENSIONES:
+        raise ValueError(f"Formato de imagen no soportado: {file_storage.filename}")
+
+    ruta = os.path.join(_carpeta_imagenes(), f"{uuid.uuid4().hex}{extension}")
+    file_storage.save(ruta)
+
+    job = DeteccionJob(
+        imagen=ruta,
+        origen="upload",
+        chofer=chofer.strip(),
+        placa=placa.strip().upper(),
+        observacion=observacion,
+    )
+    db.session.add(job)
+    return job
+
+
+# =====================================================================================
+#                                 INBOX DE CÁMARAS
+# =====================================================================================
+
+def tomar_inbox():
+    """Mueve las imágenes del inbox a DETECCION_FOLDER y crea sus trabajos."""
+    inbox = current_app.config["DETECCION_INBOX"]
+    os.makedirs(inbox, exist_ok=True)
+    carpeta = _carpeta_imagenes()
+
+    nuevos = 0
+    for nombre in sorted(os.listdir(inbox)):
+        extension = os.path.splitext(nombre)[1].lower()
+        if extension not in EXTENSIONES:
+            continue
+
+        destino = os.path.join(carpeta, f"{uuid.uuid4().hex}{extension}")
+        try:
+            # os.replace es atómico: la imagen no se toma dos veces
+            os.replace(os.path.join(inbox, nombre), destino)
+        except OSError:
+            continue
+
+        placa = PLACA_ARCHIVO.match(nombre.upper())
+        db.session.add(DeteccionJob(
+            imagen=destino,
+            origen="inbox",
+            chofer=current_app.config.get("DETECCION_CHOFER", "Cámara"),
+            placa=placa.group(1) if placa else "",
+            observacion=f"Cámara: {nombre}"[:255],
+        ))
+        nuevos += 1
+
+    if nuevos:
+        db.session.commit()
+    return nuevos
+
+
+# =====================================================================================
+#                                 PROCESAMIENTO
+# =====================================================================================
+
+def _terminar(job, estado, error=None):
+    job.estado = estado
+    job.error = error
+    job.terminado_en = datetime.now()
+
+
+def _procesar_lote(pool, jobs, ahora):
+    """Detecta y registra los Bultos de `jobs` (commit). Retorna cuántos Bultos creó."""
+    # Los hilos solo reciben rutas, nunca objetos de la sesión
+    rutas = [job.imagen for job in jobs]
+    resultados = yolo.detectar_con_cache(
+        rutas,
+        max_lado=current_app.config.get("DETECCION_MAX_LADO", 1280),
+        pool=pool,
+    )
+    if resultados is None:
+        for job in jobs:
+            _terminar(job, "error", "Modelo YOLO no disponible")
+        db.session.commit()
+        return 0
+
+    nuevos_bultos = 0
+    for job, ruta, resultado in zip(jobs, rutas, resultados):
+        if resultado is None:
+            _terminar(job, "error", "No se pudo leer la imagen")
+            continue
+        _, detections, anotada = resultado
+        job.cantidad = len(detections)
+        job.imagen_anotada = anotada
+
+        # Sin bultos detectados no se registra nada
+        if detections:
+            bulto = Bulto(
+                cantidad=len(detections),
+                chofer=job.chofer,
+                placa=job.placa,
+                fecha_hora=job.creado_en or ahora,
+                observacion=job.observacion,
+                origen="camara",
+                imagen=ruta,
+                imagen_anotada=anotada,
+                confianza=sum(d["conf"] for d in detections) / len(detections),
+                cajas=json.dumps(detections),
+                creado_en=datetime.now(),
+            )
+            db.session.add(bulto)
+            db.session.flush()
+            job.bulto_id = bulto.id
+            nuevos_bultos += 1
+
+        _terminar(job, "terminado")
+
+    db.session.commit()
+    return nuevos_bultos
+
+
+def procesar_pendientes(pool, limite):
+    """Procesa hasta `limite` trabajos pendientes. Retorna cuántos tomó."""
+    jobs = (
+        DeteccionJob.query.filter_by(estado="pendiente")
+        .order_by(DeteccionJob.id)
+        .limit(limite)
+        .all()
+    )
+    if not jobs:
+        return 0
+
+    ahora = datetime.now()
+    for job in jobs:
+        job.estado = "procesando"
+        job.iniciado_en = ahora
+    db.session.commit()
+
+    try:
+        nuevos_bultos = _procesar_lote(pool, jobs, ahora)
+    except Exception as e:
+        # Un lote que falla (inferencia, disco, base de datos) se marca con
+        # error: si quedara "procesando" volvería a la cola en cada reinicio
+        db.session.rollback()
+        current_app.logger.exception("Detección: falló un lote de %s trabajos", len(jobs))
+        for job in jobs:
+            _terminar(job, "error", f"{type(e).__name__}: {e}"[:255])
+        db.session.commit()
+        return len(jobs)
+
+    if nuevos_bultos:
+        invalidar_cache(CACHE_DASHBOARD)
+
+    current_app.logger.info(
+        "Detección: %s trabajos, %s bultos registrados", len(jobs), nuevos_bultos
+    )
+    return len(jobs)
+
+
+def _recuperar_interrumpidos():
+    """Trabajos que quedaron "procesando" por una caída vuelven a la cola."""
+    n = (
+        DeteccionJob.query.filter_by(estado="procesando")
+        .update({"estado": "pendiente", "iniciado_en": None})
+    )
+    db.session.commit()
+    return n
+
+
+def run_pipeline():
+    """Bucle del proceso de detección (requiere contexto de aplicación)."""
+    if not yolo.opencv_disponible():
+        raise RuntimeError("opencv no está instalado.")
+
+    config = current_app.config
+    yolo.precargar_modelo()
+
+    recuperados = _recuperar_interrumpidos()
+    if recuperados:
+        print(f">>> Detección: {recuperados} trabajos interrumpidos vuelven a la cola.")
+
+    lote = config.get("DETECCION_LOTE", 16)
+    intervalo = config.get("DETECCION_INTERVALO", 2)
+
+    with ThreadPoolExecutor(max_workers=config.get("DETECCION_HILOS", 4)) as pool:
+        while True:
+            tomar_inbox()
+            if not procesar_pendientes(pool, lote):
+                time.sleep(intervalo)
+
+
+if __name__ == "__main__":
+    from app import create_app
+
+    app = create_app()
+    with app.app_context():
+        run_pipeline()
@@ -1,14 +1,225 @@
-import schedule
+"""
+Reportes PDF nocturnos por usuario.
+
+Corre en un proceso aparte del servidor web:
+
+    python -m tasks.reportes            # programador (todos los días a REPORTES_HORA)
+    python -m tasks.reportes --ahora    # una corrida inmediata
+    python -m tasks.reportes --ahora --forzar
+
+Cada corrida:
+  1. Calcula la huella de los datos del reporte de cada usuario activo.
+  2. Omite a los usuarios cuya huella no cambió desde su último reporte.
+  3. Genera el resto en un pool de procesos; cada proceso arma su propia
+     app (y su propia conexión a la BD) y genera dentro de su contexto.
+  4. Registra un ReporteJob por usuario con duración, estado y error.
+"""
+import hashlib
+import multiprocessing
+import os
+import sys
 import time
+import traceback
+import uuid
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import schedule
+from flask import Flask, current_app
+from sqlalchemy import func
+
+from config import Config
+from models import db
+from models.actividad import ActividadUsuario
+from models.alerts import Alert
+from models.bultos import Bulto
+from models.inventory import InventoryItem
+from models.reportes import ReporteJob
+from models.user import User
 from utils.pdf_report import create_pdf_reporte
 
+
+# =====================================================================================
+#                          HUELLA DE LOS DATOS DEL REPORTE
+# =====================================================================================
+
+def _huellas(usuarios):
+    """
+    {user_id: sha1} de todo lo que muestra create_pdf_reporte: KPIs
+    globales, actividad del usuario y datos de su perfil.
+    """
+    kpis = (
+        InventoryItem.query.count(),
+        Bulto.query.count(),
+        Alert.query.count(),
+    )
+    actividad = {
+        user_id: (ultimo, cantidad)
+        for user_id, ultimo, cantidad in db.session.query(
+            ActividadUsuario.user_id,
+            func.max(ActividadUsuario.id),
+            func.count(ActividadUsuario.id),
+        ).group_by(ActividadUsuario.user_id)
+    }
+
+    huellas = {}
+    for user in usuarios:
+        datos = (
+            kpis,
+            actividad.get(user.id),
+            user.username, user.role, user.email, user.phone,
+            user.location, user.area, user.photo,
+            user.created_at, user.perfil_completado,
+        )
+        huellas[user.id] = hashlib.sha1(repr(datos).encode("utf-8")).hexdigest()
+    return huellas
+
+
+def _ultimos_generados(user_ids):
+    """{user_id: ReporteJob} con el último reporte generado de cada usuario."""
+    ultimo = (
+        db.session.query(func.max(ReporteJob.id))
+        .filter(ReporteJob.estado == "terminado", ReporteJob.user_id.in_(user_ids))
+        .group_by(ReporteJob.user_id)
+    )
+    return {
+        job.user_id: job
+        for job in ReporteJob.query.filter(ReporteJob.id.in_(ultimo.scalar_subquery()))
+    }
+
+
+# =====================================================================================
+#                                 PROCESO WORKER
+# =====================================================================================
+
+_app_worker = None
+
+
+def _iniciar_worker(root_path, database_uri):
+    """Cada proceso arma una app mínima con su propio engine de SQLite."""
+    global _app_worker
+    _app_worker = Flask("app", root_path=root_path)
+    _app_worker.config.from_object(Config)
+    _app_worker.config["SQLALCHEMY_DATABASE_URI"] = database_uri
+    db.init_app(_app_worker)
+
+
+def _generar_en_worker(user_id):
+    """Genera el PDF de un usuario. Retorna (ruta, segundos, error)."""
+    inicio = time.perf_counter()
+    with _app_worker.app_context():
+        try:
+            ruta = create_pdf_reporte(user_id)
+            error = None if ruta else "Usuario no encontrado."
+        except Exception:
+            ruta, error = None, traceback.format_exc(limit=5)
+        finally:
+            db.session.remove()
+    return ruta, time.perf_counter() - inicio, error
+
+
+# =====================================================================================
+#                                     CORRIDA
+# =====================================================================================
+
+def generar_reportes(forzar=False, procesos=None):
+    """
+    Genera los reportes de todos los usuarios activos (requiere contexto de
+    aplicación). Retorna el resumen de la corrida.
+    """
+    inicio = time.perf_counter()
+    corrida = uuid.uuid4().hex
+    procesos = procesos or current_app.config.get("REPORTES_PROCESOS", 1)
+
+    usuarios = User.query.filter_by(status="active").order_by(User.id).all()
+    huellas = _huellas(usuarios)
+    ultimos = _ultimos_generados([u.id for u in usuarios]) if usuarios else {}
+
+    resumen = {"terminado": 0, "omitido": 0, "error": 0}
+    pendientes = []
+
+    for user in usuarios:
+        ultimo = ultimos.get(user.id)
+        if (
+            not forzar
+            and ultimo is not None
+            and ultimo.huella == huellas[user.id]
+            and ultimo.ruta
+            and os.path.exists(ultimo.ruta)
+        ):
+            db.session.add(ReporteJob(
+                corrida=corrida, user_id=user.id, estado="omitido",
+                huella=huellas[user.id], ruta=ultimo.ruta, duracion=0.0,
+            ))
+            resumen["omitido"] += 1
+        else:
+            pendientes.append(user.id)
+
+    if pendientes:
+        # spawn: los procesos no heredan las conexiones abiertas del padre
+        with ProcessPoolExecutor(
+            max_workers=min(procesos, len(pendientes)),
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_iniciar_worker,
+            initargs=(current_app.root_path, current_app.config["SQLALCHEMY_DATABASE_URI"]),
+        ) as pool:
+            futuros = {pool.submit(_generar_en_worker, user_id): user_id for user_id in pendientes}
+
+            for futuro in as_completed(futuros):
+                user_id = futuros[futuro]
+                try:
+                    ruta, duracion, error = futuro.result()
+                except Exception as e:
+                    # El proceso murió (BrokenProcessPool): se registra y se sigue
+                    ruta, duracion, error = None, None, f"{type(e).__name__}: {e}"
+
+                estado = "error" if error else "terminado"
+                db.session.add(ReporteJob(
+                    corrida=corrida, user_id=user_id, estado=estado,
+                    huella=huellas[user_id], ruta=ruta, duracion=duracion, error=error,
+                ))
+                resumen[estado] += 1
+
+                if error:
+                    print(f">>> Reporte del usuario {user_id} falló: {error.strip().splitlines()[-1]}")
+
+    db.session.commit()
+
+    resumen["segundos"] = round(time.perf_counter() - inicio, 2)
+    print(
+        f">>> Reportes: {resumen['terminado']} generados, {resumen['omitido']} sin cambios, "
+        f"{resumen['error']} con error en {resumen['segundos']} s."
+    )
+    return resumen
+
+
+# =====================================================================================
+#                                   PROGRAMADOR
+# =====================================================================================
+
 def tarea_diaria():
-    print("Enviando reporte diario…")
-    create_pdf_reporte()
+    print("Generando reportes diarios…")
+    try:
+        generar_reportes()
+    finally:
+        db.session.remove()
+
 
 def run_scheduler():
-    schedule.every().day.at("07:00").do(tarea_diaria)
+    """Bucle del programador (requiere contexto de aplicación)."""
+    schedule.every().day.at(current_app.config.get("REPORTES_HORA", "07:00")).do(tarea_diaria)
 
     while True:
+        # Duerme hasta la próxima tarea en vez de revisar cada segundo
+        time.sleep(max(schedule.idle_seconds(), 0))
         schedule.run_pending()
-        time.sleep(1)
+
+
+if __name__ == "__main__":
+    from app import create_app
+
+    app = create_app()
+    with app.app_context():
+        if "--ahora" in sys.argv:
+            generar_reportes(forzar="--forzar" in sys.argv)
+        else:
+            run_scheduler()
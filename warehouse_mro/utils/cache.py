@@ -0,0 +1,223 @@
+import io
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from flask import current_app
+from reportlab.lib.utils import ImageReader
+
+
+# =====================================================================================
+#                    CACHÉ EN MEMORIA CON VERSIÓN COMPARTIDA
+# =====================================================================================
+#
+# Cada dato cacheado tiene un nombre (ej. "layout2d") y una versión guardada
+# en un archivo de marca dentro de CACHE_FOLDER. Todos los workers de
+# gunicorn leen el mismo archivo: cuando una carga llama a invalidar_cache(),
+# la versión cambia y cada worker recalcula en su próxima consulta.
+#
+# Leer la versión no toca la BD, por eso sirve también como ETag.
+#
+# Opcionalmente cada dato puede tener un TTL (segundos) para lo que cambia
+# sin pasar por una carga (ej. contadores "de hoy" del dashboard).
+
+# Nombres de caché compartidos entre blueprints
+CACHE_DASHBOARD = "dashboard"   # KPIs del dashboard: lo invalidan cargas, bultos, errores y alertas
+
+_memoria = {}
+_estadisticas = {}
+_lock = threading.Lock()
+
+
+def _ruta_marca(nombre):
+    carpeta = current_app.config["CACHE_FOLDER"]
+    return os.path.join(carpeta, f"{nombre}.version")
+
+
+def _escribir_marca(ruta):
+    """Escribe una versión nueva de forma atómica (archivo temporal + replace)."""
+    nueva = uuid.uuid4().hex
+    temporal = f"{ruta}.{nueva}.tmp"
+    with open(temporal, "w") as f:
+        f.write(nueva)
+    os.replace(temporal, ruta)
+    return nueva
+
+
+def version_cache(nombre):
+    """Versión actual del dato `nombre` (se crea la primera vez)."""
+    ruta = _ruta_marca(nombre)
+    try:
+        with open(ruta) as f:
+            actual = f.read().strip()
+        if actual:
+            return actual
+    except FileNotFoundError:
+        pass
+    return _escribir_marca(ruta)
+
+
+def invalidar_cache(nombre):
+    """Marca el dato `nombre` como cambiado en todos los workers."""
+    nueva = _escribir_marca(_ruta_marca(nombre))
+    with _lock:
+        _memoria.pop(nombre, None)
+    return nueva
+
+
+def _contar(nombre, campo):
+    with _lock:
+        contadores = _estadisticas.setdefault(nombre, {"hits": 0, "misses": 0})
+        contadores[campo] += 1
+
+
+def obtener_cache(nombre, calcular, ttl=None):
+    """
+    Retorna (version, datos). `calcular()` solo se ejecuta si este worker
+    no tiene en memoria el resultado de la versión actual, o si ya pasaron
+    más de `ttl` segundos desde que se calculó.
+    """
+    actual = version_cache(nombre)
+    ahora = time.monotonic()
+
+    with _lock:
+        guardado = _memoria.get(nombre)
+    if (
+        guardado is not None
+        and guardado[0] == actual
+        and (ttl is None or ahora - guardado[2] < ttl)
+    ):
+        _contar(nombre, "hits")
+        return actual, guardado[1]
+
+    _contar(nombre, "misses")
+    datos = calcular()
+
+    with _lock:
+        _memoria[nombre] = (actual, datos, ahora)
+    return actual, datos
+
+
+# =====================================================================================
+#                   ARCHIVOS GENERADOS (REPORTES) POR VERSIÓN DE DATOS
+# =====================================================================================
+#
+# Reportes ya generados (bytes de un PDF, Excel, ...) guardados en memoria
+# por `clave`: la versión de los datos que usa el reporte (ej. max id y
+# cantidad de filas). Si los datos cambian, la clave cambia y se genera de
+# nuevo; las claves viejas salen por LRU.
+
+MAX_ARTEFACTOS = 16
+
+_artefactos = OrderedDict()
+_generando = {}
+
+
+def obtener_artefacto(nombre, clave, generar, max_entradas=MAX_ARTEFACTOS):
+    """
+    Bytes del reporte `nombre` para `clave`. `generar()` solo se ejecuta si
+    no está guardado; peticiones simultáneas con la misma clave esperan a
+    la primera en vez de generarlo otra vez.
+    """
+    llave = (nombre, clave)
+
+    with _lock:
+        if llave in _artefactos:
+            _artefactos.move_to_end(llave)
+            datos = _artefactos[llave]
+        else:
+            datos = None
+            lock_clave = _generando.setdefault(llave, threading.Lock())
+
+    if datos is not None:
+        _contar(nombre, "hits")
+        return datos
+
+    with lock_clave:
+        # Otra petición pudo generarlo mientras se esperaba
+        with _lock:
+            datos = _artefactos.get(llave)
+        if datos is not None:
+            _contar(nombre, "hits")
+            return datos
+
+        _contar(nombre, "misses")
+        datos = generar()
+
+        with _lock:
+            _artefactos[llave] = datos
+            _artefactos.move_to_end(llave)
+            while len(_artefactos) > max_entradas:
+                _artefactos.popitem(last=False)
+            _generando.pop(llave, None)
+
+    return datos
+
+
+# =====================================================================================
+#                   IMÁGENES DECODIFICADAS (LOGOS / FOTOS DE REPORTES)
+# =====================================================================================
+#
+# ImageReader por ruta, guardado en memoria del proceso junto con el mtime y
+# el tamaño del archivo: mientras el archivo no cambie, los reportes no
+# vuelven a leerlo ni a decodificarlo. Si se reemplaza (ej. foto nueva del
+# usuario) se relee en el siguiente uso.
+
+MAX_IMAGENES = 256
+
+_imagenes = OrderedDict()
+
+
+def obtener_imagen(ruta, max_entradas=MAX_IMAGENES):
+    """ImageReader de `ruta` (None si no existe o no es una imagen válida)."""
+    try:
+        estado = os.stat(ruta)
+    except (OSError, TypeError):
+        return None
+    firma = (estado.st_mtime_ns, estado.st_size)
+
+    with _lock:
+        guardado = _imagenes.get(ruta)
+        if guardado is not None and guardado[0] == firma:
+            _imagenes.move_to_end(ruta)
+
+    if guardado is not None and guardado[0] == firma:
+        _contar("imagenes", "hits")
+        return guardado[1]
+
+    _contar("imagenes", "misses")
+    try:
+        with open(ruta, "rb") as f:
+            lector = ImageReader(io.BytesIO(f.read()))
+        # Decodificar una sola vez (drawImage usa los píxeles como firma)
+        lector.getRGBData()
+    except Exception as e:
+        print(f"No se pudo cargar imagen {ruta}:", e)
+        return None
+
+    with _lock:
+        _imagenes[ruta] = (firma, lector)
+        _imagenes.move_to_end(ruta)
+        while len(_imagenes) > max_entradas:
+            _imagenes.popitem(last=False)
+
+    return lector
+
+
+def limpiar_imagenes():
+    with _lock:
+        _imagenes.clear()
+
+
+def estadisticas_cache():
+    """Hits / misses / hit_ratio por caché (de este worker, desde que arrancó)."""
+    with _lock:
+        copia = {nombre: dict(c) for nombre, c in _estadisticas.items()}
+
+    for contadores in copia.values():
+        total = contadores["hits"] + contadores["misses"]
+        contadores["hit_ratio"] = round(contadores["hits"] / total, 3) if total else 0.0
+
+    return copia
@@ -1,7 +1,12 @@
 import io
 import pandas as pd
+import xlsxwriter
 import unicodedata
 import re
+from itertools import islice
+
+from flask import current_app, has_app_context
+from openpyxl import load_workbook
 
 
 # =====================================================================================
@@ -50,6 +55,18 @@ EQUIVALENCIAS = {
     "libre utilizacion": "Libre utilización",
     "libre utilización": "Libre utilización",
 
+    # Bultos (importación masiva)
+    "cantidad": "Cantidad",
+    "cantidad de bultos": "Cantidad",
+    "bultos": "Cantidad",
+    "chofer": "Chofer",
+    "conductor": "Chofer",
+    "placa": "Placa",
+    "fecha y hora": "Fecha y Hora",
+    "fecha hora": "Fecha y Hora",
+    "fecha": "Fecha y Hora",
+    "observacion": "Observación",
+
 }
 
 
@@ -75,8 +92,11 @@ def limpiar(texto: str) -> str:
 
 
 def mapear_columnas(df, requeridas):
-    """Asocia columnas del Excel con los nombres oficiales."""
-    columnas_originales = list(df.columns)
+    """
+    Asocia columnas del Excel con los nombres oficiales.
+    `df` puede ser un DataFrame o directamente la fila de encabezados.
+    """
+    columnas_originales = list(getattr(df, "columns", df))
     columnas_mapeadas = {}
 
     for col in columnas_originales:
@@ -90,6 +110,185 @@ def mapear_columnas(df, requeridas):
     return columnas_mapeadas, faltantes
 
 
+# =====================================================================================
+#                           LECTURA EN STREAMING (POR BLOQUES)
+# =====================================================================================
+
+# Columna opcional con el número de fila del archivo (numerar_filas=True)
+COLUMNA_FILA = "_fila"
+
+
+def _es_xlsx(file_storage):
+    """Los .xlsx son ZIP (firma PK); los .xls antiguos no."""
+    inicio = file_storage.read(4)
+    file_storage.seek(0)
+    return inicio[:2] == b"PK"
+
+
+def _validar_encabezado(encabezado, requeridas, opcionales, descripcion):
+    """
+    Valida el encabezado con mapear_columnas.
+    Retorna {nombre oficial: índice de columna} y las opcionales ausentes.
+    """
+    columnas_mapeadas, faltantes = mapear_columnas(encabezado, requeridas)
+
+    ausentes = [f for f in faltantes if f in opcionales]
+    faltantes = [f for f in faltantes if f not in opcionales]
+
+    if faltantes:
+        raise ValueError(
+            f"El archivo {descripcion} no tiene todas las columnas requeridas.\n"
+            "Faltan: " + ", ".join(faltantes)
+        )
+
+    # Si dos encabezados apuntan al mismo oficial, gana el último (como antes)
+    indices = {}
+    for i, col in enumerate(encabezado):
+        if col in columnas_mapeadas:
+            indices[columnas_mapeadas[col]] = i
+
+    return indices, ausentes
+
+
+def _bloques_xlsx(wb, filas, indices, ausentes, chunk_size, numerar_filas=False):
+    oficiales = list(indices)
+    posiciones = list(indices.values())
+    columnas = oficiales + [COLUMNA_FILA] if numerar_filas else oficiales
+
+    # Número de fila en la hoja (la 1 es el encabezado; openpyxl entrega
+    # también las filas vacías, así que el conteo coincide con Excel)
+    filas = enumerate(filas, start=2)
+
+    try:
+        while True:
+            bloque = []
+            leidas = 0
+            for numero, fila in islice(filas, chunk_size):
+                leidas += 1
+                valores = [fila[p] if p < len(fila) else None for p in posiciones]
+                # Filas totalmente vacías (típicas al final de exportes SAP)
+                if any(v is not None for v in valores):
+                    if numerar_filas:
+                        valores.append(numero)
+                    bloque.append(valores)
+
+            if bloque:
+                df = pd.DataFrame(bloque, columns=columnas)
+                for col in ausentes:
+                    df[col] = 0
+                yield df
+
+            if leidas < chunk_size:
+                return
+    finally:
+        wb.close()
+
+
+def _bloques_xls(df, ausentes, chunk_size, numerar_filas=False):
+    for col in ausentes:
+        df[col] = 0
+    if numerar_filas:
+        # read_excel conserva las filas vacías intermedias: índice + 2 = fila de la hoja
+        df[COLUMNA_FILA] = df.index + 2
+    for inicio in range(0, len(df), chunk_size):
+        yield df.iloc[inicio:inicio + chunk_size]
+
+
+def _es_csv(file_storage):
+    return (file_storage.filename or "").lower().endswith((".csv", ".txt"))
+
+
+def _bloques_csv(lector, renombres, numerar_filas=False):
+    for df in lector:
+        df = df.rename(columns=renombres)
+
+        # Las líneas en blanco se leen (para no perder la cuenta) y se
+        # descartan acá; el índice del lector sigue la línea del archivo
+        vacia = df.fillna("").eq("").all(axis=1)
+        if numerar_filas:
+            df[COLUMNA_FILA] = df.index + 2
+        df = df[~vacia].fillna("")
+
+        if not df.empty:
+            yield df.reset_index(drop=True)
+
+
+def leer_csv_por_bloques(file_storage, requeridas, chunk_size, descripcion="CSV",
+                         numerar_filas=False):
+    """
+    Igual que leer_excel_por_bloques para CSV: valida el encabezado y
+    devuelve un iterador de DataFrames (texto, sin NaN) de `chunk_size` filas.
+    El separador (, o ;) se detecta solo.
+    """
+    opciones = {"sep": None, "engine": "python", "encoding": "utf-8-sig"}
+
+    encabezado = list(pd.read_csv(file_storage, nrows=0, **opciones).columns)
+    indices, _ = _validar_encabezado(encabezado, requeridas, (), descripcion)
+    file_storage.seek(0)
+
+    lector = pd.read_csv(
+        file_storage,
+        usecols=list(indices.values()),
+        dtype=str,
+        keep_default_na=False,
+        skip_blank_lines=False,
+        chunksize=chunk_size,
+        **opciones,
+    )
+    renombres = {encabezado[i]: oficial for oficial, i in indices.items()}
+    return _bloques_csv(lector, renombres, numerar_filas)
+
+
+def _concatenar(bloques, columnas):
+    """Junta los bloques en un solo DataFrame (vacío si no hay filas)."""
+    bloques = list(bloques)
+    if not bloques:
+        return pd.DataFrame(columns=list(columnas))
+    return pd.concat(bloques, ignore_index=True)
+
+
+def leer_excel_por_bloques(file_storage, requeridas, opcionales=(), chunk_size=None,
+                           descripcion="Excel", numerar_filas=False):
+    """
+    Lector de Excel en modo streaming:
+      1. Lee solo la fila de encabezados y la valida con mapear_columnas
+         (falla de inmediato con ValueError si faltan columnas).
+      2. Devuelve un iterador de DataFrames de `chunk_size` filas que solo
+         contienen las columnas mapeadas, con sus nombres oficiales.
+
+    Los .xlsx se leen con openpyxl en modo read_only (memoria constante);
+    los .xls antiguos caen a pd.read_excel leyendo solo las columnas mapeadas.
+
+    Con `numerar_filas` cada bloque trae además la columna COLUMNA_FILA con
+    el número de fila en la hoja, para reportar errores por fila aunque se
+    salten filas vacías.
+    """
+    if chunk_size is None:
+        chunk_size = current_app.config.get("EXCEL_CHUNK_ROWS", 20000) if has_app_context() else 20000
+
+    if not _es_xlsx(file_storage):
+        encabezado = list(pd.read_excel(file_storage, nrows=0).columns)
+        indices, ausentes = _validar_encabezado(encabezado, requeridas, opcionales, descripcion)
+        file_storage.seek(0)
+
+        df = pd.read_excel(file_storage, usecols=list(indices.values()))
+        df = df.rename(columns={encabezado[i]: oficial for oficial, i in indices.items()})
+        return _bloques_xls(df[list(indices)], ausentes, chunk_size, numerar_filas)
+
+    wb = load_workbook(file_storage, read_only=True, data_only=True)
+    ws = wb.active
+    filas = ws.iter_rows(values_only=True)
+
+    try:
+        encabezado = list(next(filas, None) or [])
+        indices, ausentes = _validar_encabezado(encabezado, requeridas, opcionales, descripcion)
+    except Exception:
+        wb.close()
+        raise
+
+    return _bloques_xlsx(wb, filas, indices, ausentes, chunk_size, numerar_filas)
+
+
 # =====================================================================================
 #                           COLUMNAS REQUERIDAS INVENTARIO
 # =====================================================================================
@@ -103,22 +302,19 @@ INV_REQUIRED = {
 }
 
 
-def load_inventory_excel(file_storage):
-    """Carga Excel de inventario con validación flexible."""
-    df = pd.read_excel(file_storage)
-    columnas_mapeadas, faltantes = mapear_columnas(df, INV_REQUIRED)
-
-    if faltantes:
-        raise ValueError(
-            "El archivo de inventario no tiene todas las columnas requeridas.\n"
-            "Faltan: " + ", ".join(faltantes)
-        )
+def iter_inventory_excel(file_storage, chunk_size=None):
+    """
+    Lectura en streaming del Excel de inventario: valida el encabezado
+    antes de leer datos y devuelve un iterador de DataFrames por bloques.
+    """
+    return leer_excel_por_bloques(
+        file_storage, INV_REQUIRED, chunk_size=chunk_size, descripcion="de inventario"
+    )
 
-    clean = {}
-    for original, official in columnas_mapeadas.items():
-        clean[official] = df[original]
 
-    return pd.DataFrame(clean)
+def load_inventory_excel(file_storage):
+    """Carga Excel de inventario con validación flexible."""
+    return _concatenar(iter_inventory_excel(file_storage), INV_REQUIRED.values())
 
 
 # =====================================================================================
@@ -142,36 +338,48 @@ W2D_REQUIRED = {
     "libre": "Libre utilización",
 }
 
+# Columnas que pueden no venir en el Excel 2D → se crean en cero
+W2D_OPCIONALES = ("Stock de seguridad", "Stock máximo")
+
+
+def iter_warehouse2d_excel(file_storage, chunk_size=None):
+    """Lectura en streaming del Excel del layout 2D (ver iter_inventory_excel)."""
+    return leer_excel_por_bloques(
+        file_storage, W2D_REQUIRED, opcionales=W2D_OPCIONALES,
+        chunk_size=chunk_size, descripcion="del layout 2D",
+    )
+
+
 def load_warehouse2d_excel(file_storage):
-    # Cargar Excel
-    df = pd.read_excel(file_storage)
-
-    # Mapeo flexible de columnas
-    columnas_mapeadas, faltantes = mapear_columnas(df, W2D_REQUIRED)
-
-    # MANEJO DE COLUMNAS FALTANTES
-    for falt in faltantes:
-
-        # Stock de seguridad no viene → crear columna en cero
-        if falt == "Stock de seguridad":
-            df["Stock de seguridad"] = 0
-            columnas_mapeadas["Stock de seguridad"] = "Stock de seguridad"
-
-        # Stock máximo no viene → crear en cero
-        elif falt == "Stock máximo":
-            df["Stock máximo"] = 0
-            columnas_mapeadas["Stock máximo"] = "Stock máximo"
-
-    # Generar dataframe limpio con solo columnas oficiales
-    clean = {}
-    for original, oficial in columnas_mapeadas.items():
-        # Si original NO es una columna original (caso creado), úsalo igual
-        if original in df.columns:
-            clean[oficial] = df[original]
-        else:
-            clean[oficial] = df[oficial]  # columna recién creada
+    return _concatenar(iter_warehouse2d_excel(file_storage), W2D_REQUIRED.values())
 
-    return pd.DataFrame(clean)
+# =====================================================================================
+#                           COLUMNAS REQUERIDAS BULTOS
+# =====================================================================================
+
+# "Observación" es opcional: se toma si viene en el archivo
+BULTOS_REQUIRED = {
+    "cant": "Cantidad",
+    "chofer": "Chofer",
+    "placa": "Placa",
+    "fecha": "Fecha y Hora",
+}
+
+
+def iter_bultos_archivo(file_storage, chunk_size=None):
+    """Lectura por bloques del archivo de bultos (CSV o Excel)."""
+    if chunk_size is None:
+        chunk_size = current_app.config.get("EXCEL_CHUNK_ROWS", 20000) if has_app_context() else 20000
+
+    if _es_csv(file_storage):
+        return leer_csv_por_bloques(
+            file_storage, BULTOS_REQUIRED, chunk_size, descripcion="de bultos", numerar_filas=True
+        )
+
+    return leer_excel_por_bloques(
+        file_storage, BULTOS_REQUIRED, chunk_size=chunk_size, descripcion="de bultos",
+        numerar_filas=True,
+    )
 
 # =====================================================================================
 #                           ORDENAMIENTO AVANZADO DE UBICACIONES
@@ -202,6 +410,32 @@ def sort_location_advanced(loc):
     return (main, letters, last)
 
 
+# Columnas persistidas del orden de ubicación (ver InventoryItem.loc_*)
+LOC_SORT_COLUMNS = ("loc_main", "loc_letters", "loc_last")
+
+# Tope para números de ubicación absurdamente largos (entero de 64 bits)
+_LOC_NUM_MAX = 2 ** 62
+
+
+def location_sort_key(loc):
+    """Clave de sort_location_advanced lista para guardar en la BD."""
+    main, letters, last = sort_location_advanced(loc)
+    return (min(main, _LOC_NUM_MAX), letters, min(last, _LOC_NUM_MAX))
+
+
+def location_sort_columns(ubicaciones: pd.Series) -> pd.DataFrame:
+    """
+    Calcula loc_main / loc_letters / loc_last para una columna de ubicaciones.
+    El regex se ejecuta una sola vez por ubicación distinta.
+    """
+    claves = {loc: location_sort_key(loc) for loc in ubicaciones.unique()}
+    return pd.DataFrame(
+        ubicaciones.map(claves).tolist(),
+        columns=list(LOC_SORT_COLUMNS),
+        index=ubicaciones.index,
+    )
+
+
 # =====================================================================================
 #                       GENERADOR DE EXCEL PROFESIONAL MEJORADO
 # =====================================================================================
@@ -215,116 +449,169 @@ def generate_discrepancies_excel(df: pd.DataFrame) -> io.BytesIO:
     - Formato condicional
     - Estado coloreado
     - Números alineados y con formato
+
+    Se escribe en una sola pasada (write_row por bloques de columnas) en modo
+    constant_memory: la memoria no crece con el número de filas. Los colores
+    de Diferencia y Estado son formatos condicionales, no un formato por celda.
     """
     output = io.BytesIO()
 
-    with pd.ExcelWriter(output, engine="xlsxwriter") as writer:
-        df.to_excel(writer, sheet_name="Discrepancias", index=False)
-        book = writer.book
-        ws = writer.sheets["Discrepancias"]
-
-        # ---------------- ESTILOS ----------------
-        header = book.add_format({
-            "bold": True,
-            "bg_color": "#1F4E78",
-            "font_color": "white",
-            "border": 1,
-            "align": "center",
-            "valign": "vcenter"
-        })
-
-        normal_left = book.add_format({
-            "align": "left",
-            "border": 1,
-            "valign": "vcenter"
-        })
-
-        normal_right = book.add_format({
-            "align": "right",
-            "border": 1,
-            "valign": "vcenter",
-            "num_format": "#,##0.00"
-        })
-
-        red_text = book.add_format({
-            "font_color": "red",
-            "border": 1,
-            "align": "right",
-            "num_format": "#,##0.00"
-        })
-
-        estado_ok = book.add_format({
-            "bg_color": "#D9EAF7",
-            "border": 1,
-            "align": "center"
-        })
-
-        estado_falta = book.add_format({
-            "bg_color": "#FCE4D6",
-            "border": 1,
-            "align": "center"
-        })
-
-        estado_critico = book.add_format({
-            "bg_color": "#F4CCCC",
-            "border": 1,
-            "align": "center"
-        })
-
-        estado_sobra = book.add_format({
-            "bg_color": "#D9EAD3",
-            "border": 1,
-            "align": "center"
-        })
-
-        # --------- ENCABEZADOS
-        for col, name in enumerate(df.columns):
-            ws.write(0, col, name, header)
-
-        # --------- AUTO-AJUSTE COLUMNAS
-        for i, colname in enumerate(df.columns):
-            max_len = max(df[colname].astype(str).map(len).max(), len(colname)) + 2
-            ws.set_column(i, i, max_len)
-
-        # Congelar encabezado
-        ws.freeze_panes(1, 0)
-
-        # Índices de columnas
-        diff_col = df.columns.get_loc("Diferencia")
-        est_col = df.columns.get_loc("Estado")
-
-        # -------- FORMATO DE FILAS
-        for row in range(1, len(df) + 1):
-            diferencia = df.iloc[row - 1]["Diferencia"]
-            estado = str(df.iloc[row - 1]["Estado"]).upper()
-
-            # DIFERENCIA NEGATIVA → ROJO
-            if diferencia < 0:
-                ws.write(row, diff_col, diferencia, red_text)
-            else:
-                ws.write(row, diff_col, diferencia, normal_right)
-
-            # ESTADO
-            if estado == "CRÍTICO":
-                ws.write(row, est_col, estado, estado_critico)
-            elif estado == "FALTA":
-                ws.write(row, est_col, estado, estado_falta)
-            elif estado == "SOBRA":
-                ws.write(row, est_col, estado, estado_sobra)
-            else:
-                ws.write(row, est_col, estado, estado_ok)
-
-            # RESTO DE COLUMNAS
-            for col in range(len(df.columns)):
-                if col in (diff_col, est_col):
-                    continue
-
-                value = df.iloc[row - 1, col]
-
-                if isinstance(value, (int, float)):
-                    ws.write(row, col, value, normal_right)
-                else:
-                    ws.write(row, col, value, normal_left)
+    book = xlsxwriter.Workbook(output, {"constant_memory": True})
+    ws = book.add_worksheet("Discrepancias")
+
+    # ---------------- ESTILOS ----------------
+    header = book.add_format({
+        "bold": True,
+        "bg_color": "#1F4E78",
+        "font_color": "white",
+        "border": 1,
+        "align": "center",
+        "valign": "vcenter"
+    })
+
+    normal_left = book.add_format({
+        "align": "left",
+        "border": 1,
+        "valign": "vcenter"
+    })
+
+    normal_right = book.add_format({
+        "align": "right",
+        "border": 1,
+        "valign": "vcenter",
+        "num_format": "#,##0.00"
+    })
+
+    normal_center = book.add_format({
+        "align": "center",
+        "border": 1,
+        "valign": "vcenter"
+    })
+
+    # Formatos condicionales (se combinan con el borde/alineación de la celda)
+    red_text = book.add_format({"font_color": "red"})
+    estado_ok = book.add_format({"bg_color": "#D9EAF7"})
+    estado_falta = book.add_format({"bg_color": "#FCE4D6"})
+    estado_critico = book.add_format({"bg_color": "#F4CCCC"})
+    estado_sobra = book.add_format({"bg_color": "#D9EAD3"})
+
+    columnas = list(df.columns)
+    numericas = {c for c in columnas if pd.api.types.is_numeric_dtype(df[c])}
+    est_col = columnas.index("Estado") if "Estado" in columnas else None
+
+    # Valores listos para escribir: texto sin NaN, números como float
+    datos = df.copy()
+    for c in columnas:
+        if c in numericas:
+            datos[c] = pd.to_numeric(datos[c], errors="coerce").fillna(0.0).astype(float)
+        else:
+            datos[c] = datos[c].fillna("").astype(str)
+
+    # Columnas contiguas con el mismo formato → un write_row por tramo
+    def formato_de(i, c):
+        if i == est_col:
+            return normal_center
+        return normal_right if c in numericas else normal_left
+
+    tramos = []
+    for i, c in enumerate(columnas):
+        fmt = formato_de(i, c)
+        if tramos and tramos[-1][2] is fmt:
+            tramos[-1][1] = i + 1
+        else:
+            tramos.append([i, i + 1, fmt])
+
+    # --------- AUTO-AJUSTE COLUMNAS (antes de escribir filas)
+    for i, c in enumerate(columnas):
+        if datos.empty:
+            largo = 0
+        elif c in numericas:
+            extremos = (datos[c].max(), datos[c].min())
+            largo = max(len(f"{v:,.2f}") for v in extremos)
+        else:
+            largo = int(datos[c].str.len().max())
+        ws.set_column(i, i, min(max(largo, len(str(c))) + 2, 60))
+
+    # --------- ENCABEZADOS
+    ws.write_row(0, 0, [str(c) for c in columnas], header)
+
+    # Congelar encabezado
+    ws.freeze_panes(1, 0)
+
+    # -------- FILAS (una sola pasada, en orden como exige constant_memory)
+    for row, valores in enumerate(datos.itertuples(index=False, name=None), start=1):
+        for inicio, fin, fmt in tramos:
+            ws.write_row(row, inicio, valores[inicio:fin], fmt)
+
+    ultima = len(datos)
+
+    if ultima:
+        # DIFERENCIA NEGATIVA → ROJO
+        if "Diferencia" in columnas:
+            diff_col = columnas.index("Diferencia")
+            ws.conditional_format(1, diff_col, ultima, diff_col, {
+                "type": "cell",
+                "criteria": "<",
+                "value": 0,
+                "format": red_text,
+            })
+
+        # ESTADO
+        if est_col is not None:
+            for estado, fmt in (
+                ("CRÍTICO", estado_critico),
+                ("FALTA", estado_falta),
+                ("SOBRA", estado_sobra),
+                ("OK", estado_ok),
+            ):
+                ws.conditional_format(1, est_col, ultima, est_col, {
+                    "type": "cell",
+                    "criteria": "==",
+                    "value": f'"{estado}"',
+                    "format": fmt,
+                })
+
+    book.close()
+
+    output.seek(0)
+    return output
+
+
+def generate_rechazos_excel(df: pd.DataFrame) -> io.BytesIO:
+    """
+    Reporte de filas rechazadas de una importación: los valores tal como
+    venían en el archivo, la fila de origen y el motivo del rechazo.
+    """
+    output = io.BytesIO()
+
+    book = xlsxwriter.Workbook(output, {"constant_memory": True})
+    ws = book.add_worksheet("Rechazados")
+
+    header = book.add_format({
+        "bold": True,
+        "bg_color": "#1F4E78",
+        "font_color": "white",
+        "border": 1,
+        "align": "center",
+    })
+    motivo = book.add_format({"font_color": "red"})
+
+    columnas = list(df.columns)
+    datos = df.astype(object).where(df.notna(), "").astype(str)
+
+    for i, c in enumerate(columnas):
+        largo = int(datos[c].str.len().max()) if not datos.empty else 0
+        ws.set_column(i, i, min(max(largo, len(str(c))) + 2, 60))
+
+    ws.write_row(0, 0, [str(c) for c in columnas], header)
+    ws.freeze_panes(1, 0)
+
+    ultima = len(columnas) - 1
+    for row, valores in enumerate(datos.itertuples(index=False, name=None), start=1):
+        ws.write_row(row, 0, valores[:ultima])
+        ws.write_string(row, ultima, valores[ultima], motivo)
+
+    book.close()
 
     output.seek(0)
     return output
@@ -0,0 +1,31 @@
+from datetime import date, datetime, time, timedelta
+
+
+# =====================================================================================
+#                       RANGOS DE FECHAS (FILTROS SARGABLES)
+# =====================================================================================
+#
+# Filtrar con func.date(columna) == hoy obliga a la BD a calcular la función
+# en cada fila y no usa el índice de la columna. Con un rango semiabierto
+# [inicio, fin) la misma consulta es una búsqueda por índice.
+
+def inicio_dia(dia: date) -> datetime:
+    """00:00:00 del día."""
+    return datetime.combine(dia, time.min)
+
+
+def rango_dia(dia: date = None):
+    """(inicio, fin) del día: columna >= inicio AND columna < fin."""
+    dia = dia or date.today()
+    inicio = inicio_dia(dia)
+    return inicio, inicio + timedelta(days=1)
+
+
+def rango_fechas(desde: date = None, hasta: date = None):
+    """
+    (inicio, fin) entre dos días inclusive; cualquiera puede ser None.
+    El fin es el inicio del día siguiente a `hasta` (rango semiabierto).
+    """
+    inicio = inicio_dia(desde) if desde else None
+    fin = inicio_dia(hasta) + timedelta(days=1) if hasta else None
+    return inicio, fin
@@ -0,0 +1,649 @@
+import hashlib
+import time
+import uuid
+import warnings
+from datetime import datetime
+from itertools import islice
+
+import numpy as np
+import pandas as pd
+from flask import current_app
+from sqlalchemy import Index, MetaData, bindparam, case, delete, func, inspect, select, update
+
+from models import db
+from models.bultos import Bulto
+from models.inventory import InventoryItem, UMBRAL_CRITICO, UMBRAL_BAJO
+from models.warehouse2d import WarehouseLocation, WarehouseLocationSummary, STATUS_RANK
+from utils.excel import COLUMNA_FILA, LOC_SORT_COLUMNS, location_sort_columns
+from utils.rollups import sumar_a_rollups
+
+
+# =====================================================================================
+#                           CONVERSIÓN COLUMNAR (SIN iterrows)
+# =====================================================================================
+
+def _texto(serie):
+    """Columna de texto limpia: NaN → "" y sin espacios laterales."""
+    return serie.fillna("").astype(str).str.strip()
+
+
+def _numero(serie):
+    """Columna numérica: valores no numéricos o vacíos → 0.0."""
+    return pd.to_numeric(serie, errors="coerce").fillna(0.0).astype(float)
+
+
+def _columna(df, nombre, default):
+    """Columna del DataFrame o una serie constante si no viene en el Excel."""
+    if nombre in df.columns:
+        return df[nombre]
+    return pd.Series(default, index=df.index)
+
+
+def _hash_filas(data: pd.DataFrame, columnas) -> list:
+    """SHA-1 por fila sobre las columnas de contenido (no la clave)."""
+    unidas = data[columnas[0]].astype(str)
+    for col in columnas[1:]:
+        unidas = unidas + "\x1f" + data[col].astype(str)
+    return [hashlib.sha1(v.encode("utf-8")).hexdigest() for v in unidas]
+
+
+INVENTORY_KEY = ["material_code", "location"]
+INVENTORY_PAYLOAD = ["material_text", "base_unit", "libre_utilizacion"]
+INVENTORY_SORT = list(LOC_SORT_COLUMNS)
+
+
+def _status_inventario(libre: pd.Series) -> np.ndarray:
+    """InventoryItem.calcular_status() sobre toda la columna (np.select)."""
+    return np.select(
+        [libre <= 0, libre <= UMBRAL_CRITICO, libre <= UMBRAL_BAJO],
+        ["vacío", "crítico", "bajo"],
+        default="normal",
+    )
+
+
+def _status_layout(data: pd.DataFrame) -> np.ndarray:
+    """WarehouseLocation.calcular_status() sobre todo el DataFrame (np.select)."""
+    libre = data["libre_utilizacion"]
+    maximo = data["stock_maximo"]
+    return np.select(
+        [
+            libre <= 0,
+            maximo <= 0,
+            libre < data["stock_seguridad"],
+            libre < maximo * 0.5,
+        ],
+        ["vacío", "normal", "crítico", "bajo"],
+        default="normal",
+    )
+
+
+def _inventory_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """DataFrame con las columnas de InventoryItem, convertido columna por columna."""
+    data = pd.DataFrame({
+        "material_code": _texto(df["Código del Material"]),
+        "material_text": _texto(df["Texto breve de material"]),
+        "base_unit": _texto(df["Unidad de medida base"]),
+        "location": _texto(df["Ubicación"]),
+        "libre_utilizacion": _numero(df["Libre utilización"]),
+    })
+    return data.join(location_sort_columns(data["location"]))
+
+
+def inventory_records(df: pd.DataFrame) -> list:
+    """
+    Convierte el DataFrame de load_inventory_excel en filas listas para
+    insertar en la tabla de InventoryItem, columna por columna.
+    """
+    data = _inventory_frame(df)
+    data["row_hash"] = _hash_filas(data, INVENTORY_PAYLOAD)
+    data["status"] = _status_inventario(data["libre_utilizacion"])
+    return data.to_dict("records")
+
+
+def warehouse2d_records(df: pd.DataFrame) -> list:
+    """
+    Convierte el DataFrame de load_warehouse2d_excel en filas para
+    WarehouseLocation. Las columnas ausentes se cargan vacías / en cero.
+    """
+    data = pd.DataFrame({
+        "material_code": _texto(_columna(df, "Código del Material", "")),
+        "material_text": _texto(_columna(df, "Texto breve de material", "")),
+        "base_unit": _texto(_columna(df, "Unidad de medida base", "")),
+        "ubicacion": _texto(_columna(df, "Ubicación", "")),
+        "stock_seguridad": _numero(_columna(df, "Stock de seguridad", 0)),
+        "stock_maximo": _numero(_columna(df, "Stock máximo", 0)),
+        "libre_utilizacion": _numero(_columna(df, "Libre utilización", 0)),
+    })
+    data = data.join(location_sort_columns(data["ubicacion"]))
+    data["status"] = _status_layout(data)
+    return data.to_dict("records")
+
+
+def _como_bloques(datos):
+    """
+    Acepta un DataFrame completo o un iterador de DataFrames por bloques
+    (lectura en streaming de utils.excel) y siempre devuelve bloques.
+    """
+    if isinstance(datos, pd.DataFrame):
+        return [datos]
+    return datos
+
+
+def _filas_por_bloque(datos, convertir):
+    """Genera filas convertidas bloque a bloque, sin juntar todo el archivo."""
+    for bloque in _como_bloques(datos):
+        yield from convertir(bloque)
+
+
+# =====================================================================================
+#                           INSERCIÓN MASIVA POR BLOQUES
+# =====================================================================================
+
+def _en_bloques(filas, tamano):
+    """Parte cualquier iterable de filas en listas de `tamano` elementos."""
+    it = iter(filas)
+    while True:
+        bloque = list(islice(it, tamano))
+        if not bloque:
+            return
+        yield bloque
+
+
+def bulk_insert(table, filas, chunk_size=None, constantes=None) -> dict:
+    """
+    Inserta `filas` (dicts) en `table` con INSERT Core + executemany,
+    en bloques de INGEST_CHUNK_SIZE filas.
+
+    `constantes` se aplica a todas las filas (ej. fecha de carga) sin
+    repetirlo en cada dict.
+
+    Retorna estadísticas: filas, segundos y filas_por_segundo.
+    """
+    chunk_size = chunk_size or current_app.config.get("INGEST_CHUNK_SIZE", 5000)
+
+    stmt = table.insert()
+    if constantes:
+        stmt = stmt.values(**constantes)
+
+    inicio = time.perf_counter()
+    total = 0
+
+    for bloque in _en_bloques(filas, chunk_size):
+        db.session.execute(stmt, bloque)
+        total += len(bloque)
+
+    segundos = time.perf_counter() - inicio
+
+    return {
+        "filas": total,
+        "segundos": round(segundos, 3),
+        "filas_por_segundo": int(total / segundos) if segundos > 0 else total,
+    }
+
+
+# =====================================================================================
+#                   CARGA EN TABLA STAGING + SWAP ATÓMICO
+# =====================================================================================
+#
+# La tabla real nunca queda vacía ni a medio cargar: los datos nuevos se
+# escriben en una tabla staging (sin índices), se indexa al final y en una
+# sola transacción se reemplaza la tabla real por la staging. Los lectores
+# ven el snapshot anterior hasta el COMMIT del swap.
+#
+# La staging lleva un sufijo único por carga, así los nombres de sus índices
+# (derivados del nombre de la tabla) nunca chocan con los de la tabla real.
+# El sufijo empieza con la hora de creación: al limpiar solo se borran las
+# staging viejas (huérfanas), nunca la de otra carga de la misma tabla que
+# esté en curso.
+
+def _prefijo_staging(table):
+    return f"{table.name}__stg_"
+
+
+def _limpiar_staging(conn, table):
+    """
+    Elimina staging huérfanas de cargas anteriores que fallaron: las
+    creadas hace más de INGEST_STAGING_TTL segundos.
+    """
+    prefijo = _prefijo_staging(table)
+    limite = time.time() - current_app.config.get("INGEST_STAGING_TTL", 3600)
+    quote = conn.dialect.identifier_preparer.quote
+    for nombre in inspect(conn).get_table_names():
+        if not nombre.startswith(prefijo):
+            continue
+        creada = nombre[len(prefijo):].split("_", 1)[0]
+        if creada.isdigit() and int(creada) > limite:
+            continue
+        conn.exec_driver_sql(f"DROP TABLE {quote(nombre)}")
+
+
+def _crear_staging(conn, table):
+    """
+    Crea la tabla staging (copia de `table`) sin índices.
+    Retorna la tabla y la definición de los índices a crear al final.
+    """
+    sufijo = f"{int(time.time())}_{uuid.uuid4().hex[:8]}"
+    nombre = _prefijo_staging(table) + sufijo
+    staging = table.to_metadata(MetaData(), name=nombre)
+
+    # Los índices con nombre explícito no se renombran solos: se les agrega
+    # el sufijo de la carga para no chocar con los de la tabla real
+    indices = []
+    for idx in staging.indexes:
+        idx_nombre = idx.name if nombre in idx.name else f"{idx.name}_{sufijo}"
+        indices.append((idx_nombre, [c.name for c in idx.columns], idx.unique))
+
+    staging.indexes.clear()
+    staging.create(conn)
+
+    return staging, indices
+
+
+def _iniciar_transaccion(conn):
+    """
+    pysqlite ejecuta el DDL en autocommit si no hay una transacción abierta;
+    abrimos una explícita para que DROP + RENAME sean atómicos.
+    """
+    if conn.dialect.name != "sqlite":
+        return
+    dbapi_conn = conn.connection.dbapi_connection
+    if not dbapi_conn.in_transaction:
+        conn.exec_driver_sql("BEGIN")
+
+
+def _swap(conn, table, staging):
+    quote = conn.dialect.identifier_preparer.quote
+    conn.exec_driver_sql(f"DROP TABLE {quote(table.name)}")
+    conn.exec_driver_sql(
+        f"ALTER TABLE {quote(staging.name)} RENAME TO {quote(table.name)}"
+    )
+
+
+def reload_table(model, filas, constantes=None, chunk_size=None, antes_del_swap=None) -> dict:
+    """
+    Reemplaza todo el contenido de `model` con `filas` vía staging + swap.
+
+    `antes_del_swap(conn, staging)` se ejecuta dentro de la transacción del
+    swap: lo que escriba (ej. tablas resumen) se confirma junto con el
+    reemplazo o se descarta con él.
+
+    Retorna las estadísticas de bulk_insert.
+    """
+    table = model.__table__
+
+    conn = db.session.connection()
+    _limpiar_staging(conn, table)
+    staging, indices = _crear_staging(conn, table)
+
+    try:
+        stats = bulk_insert(staging, filas, chunk_size=chunk_size, constantes=constantes)
+
+        # Indexar recién al final de la carga (mucho más rápido que
+        # mantener los índices fila por fila)
+        for idx_nombre, columnas, unico in indices:
+            Index(idx_nombre, *[staging.c[c] for c in columnas], unique=unico).create(conn)
+
+        db.session.commit()
+
+        # -------- SWAP ATÓMICO --------
+        conn = db.session.connection()
+        _iniciar_transaccion(conn)
+        if antes_del_swap is not None:
+            antes_del_swap(conn, staging)
+        _swap(conn, table, staging)
+        db.session.commit()
+
+    except Exception:
+        db.session.rollback()
+        with db.engine.begin() as limpieza:
+            staging.drop(limpieza, checkfirst=True)
+        raise
+
+    return stats
+
+
+# =====================================================================================
+#                           INGESTA DE INVENTARIO
+# =====================================================================================
+
+def ingest_inventory(datos) -> dict:
+    """
+    Reemplaza el inventario con `datos` (DataFrame o bloques de
+    iter_inventory_excel) vía staging + swap atómico.
+    """
+    stats = reload_table(
+        InventoryItem,
+        _filas_por_bloque(datos, inventory_records),
+        constantes={"creado_en": datetime.now()},
+    )
+
+    current_app.logger.info(
+        "Inventario cargado: %s filas en %ss (%s filas/s)",
+        stats["filas"], stats["segundos"], stats["filas_por_segundo"],
+    )
+    return stats
+
+
+def _en_listas(serie, tamano):
+    valores = serie.tolist()
+    for i in range(0, len(valores), tamano):
+        yield valores[i:i + tamano]
+
+
+def upsert_inventory(datos, chunk_size=None) -> dict:
+    """
+    Carga incremental del inventario: compara cada fila del Excel con la
+    guardada para la misma clave (material_code, location) mediante su
+    row_hash y ejecuta solo los INSERT / UPDATE / DELETE necesarios.
+
+    Filas repetidas con la misma clave se comparan por orden de aparición
+    (la n-ésima del Excel contra la n-ésima guardada), así ambos modos de
+    carga dejan en la tabla exactamente las mismas filas.
+
+    Retorna el resumen: insertados, actualizados, eliminados, sin_cambios.
+    """
+    chunk_size = chunk_size or current_app.config.get("INGEST_CHUNK_SIZE", 5000)
+    table = InventoryItem.__table__
+    inicio = time.perf_counter()
+
+    # ---------------- ENTRANTE ----------------
+    # Solo se juntan las columnas del modelo, ya convertidas bloque a bloque
+    bloques = [_inventory_frame(bloque) for bloque in _como_bloques(datos)]
+    entrante = (
+        pd.concat(bloques, ignore_index=True) if bloques
+        else pd.DataFrame(columns=INVENTORY_KEY + INVENTORY_PAYLOAD + INVENTORY_SORT)
+    )
+    nuevo = entrante
+    nuevo["row_hash"] = _hash_filas(nuevo, INVENTORY_PAYLOAD)
+    nuevo["status"] = _status_inventario(nuevo["libre_utilizacion"])
+    nuevo["_ocurrencia"] = nuevo.groupby(INVENTORY_KEY, sort=False).cumcount()
+
+    # ---------------- GUARDADO ----------------
+    conn = db.session.connection()
+    actual = pd.read_sql(
+        select(table.c.id, table.c.material_code, table.c.location, table.c.row_hash)
+        .order_by(table.c.id),
+        conn,
+    )
+    # Las filas se guardan en el orden del Excel: el id da la ocurrencia
+    actual["_ocurrencia"] = actual.groupby(INVENTORY_KEY, sort=False).cumcount()
+
+    merged = nuevo.merge(
+        actual, on=INVENTORY_KEY + ["_ocurrencia"], how="outer",
+        suffixes=("", "_actual"), indicator=True,
+    )
+
+    inserts = merged[merged["_merge"] == "left_only"]
+    ambos = merged[merged["_merge"] == "both"]
+    updates = ambos[ambos["row_hash"] != ambos["row_hash_actual"]]
+    deletes = merged.loc[merged["_merge"] == "right_only", "id"]
+
+    # ---------------- ESCRITURA ----------------
+    columnas = INVENTORY_KEY + INVENTORY_PAYLOAD + INVENTORY_SORT + ["row_hash", "status"]
+
+    bulk_insert(
+        table,
+        inserts[columnas].astype({"loc_main": int, "loc_last": int}).to_dict("records"),
+        chunk_size=chunk_size,
+        constantes={"creado_en": datetime.now()},
+    )
+
+    if not updates.empty:
+        stmt = (
+            update(table)
+            .where(table.c.id == bindparam("b_id"))
+            .values({c: bindparam(f"b_{c}") for c in INVENTORY_PAYLOAD + ["row_hash", "status"]})
+        )
+        filas = (
+            updates[["id"] + INVENTORY_PAYLOAD + ["row_hash", "status"]]
+            .astype({"id": int})
+            .rename(columns=lambda c: f"b_{c}")
+            .to_dict("records")
+        )
+        for bloque in _en_bloques(filas, chunk_size):
+            db.session.execute(stmt, bloque)
+
+    for bloque in _en_listas(deletes.astype(int), chunk_size):
+        db.session.execute(delete(table).where(table.c.id.in_(bloque)))
+
+    db.session.commit()
+
+    resumen = {
+        "insertados": len(inserts),
+        "actualizados": len(updates),
+        "eliminados": len(deletes),
+        "sin_cambios": len(ambos) - len(updates),
+        "segundos": round(time.perf_counter() - inicio, 3),
+    }
+
+    current_app.logger.info("Inventario incremental: %s", resumen)
+    return resumen
+
+
+# =====================================================================================
+#                           INGESTA DE LAYOUT 2D
+# =====================================================================================
+
+def resumir_layout(conn, origen=None):
+    """
+    Reconstruye warehouse_location_summary con un GROUP BY sobre `origen`
+    (la staging durante una carga; por defecto warehouse_locations).
+    """
+    origen = WarehouseLocation.__table__ if origen is None else origen
+    resumen = WarehouseLocationSummary.__table__
+    c = origen.c
+
+    peor = func.max(WarehouseLocation.status_rank_sql(c))
+
+    def contar(status):
+        return func.sum(case((c.status == status, 1), else_=0))
+
+    consulta = (
+        select(
+            c.ubicacion,
+            func.min(c.loc_main),
+            func.min(c.loc_letters),
+            func.min(c.loc_last),
+            func.coalesce(func.sum(c.libre_utilizacion), 0.0),
+            func.count(),
+            case(*[(peor == r, s) for s, r in STATUS_RANK.items()], else_="vacío"),
+            contar("vacío"),
+            contar("normal"),
+            contar("bajo"),
+            contar("crítico"),
+        )
+        .group_by(c.ubicacion)
+        # El id del resumen sigue el orden de ubicación del layout
+        .order_by(func.min(c.loc_main), func.min(c.loc_letters), func.min(c.loc_last), func.min(c.id))
+    )
+
+    conn.execute(delete(resumen))
+    conn.execute(
+        resumen.insert().from_select(
+            [
+                "ubicacion", "loc_main", "loc_letters", "loc_last",
+                "total_libre", "items", "status",
+                "vacios", "normales", "bajos", "criticos",
+            ],
+            consulta,
+        )
+    )
+
+
+def ingest_warehouse2d(datos) -> dict:
+    """
+    Reemplaza el layout 2D con `datos` (DataFrame o bloques de
+    iter_warehouse2d_excel) vía staging + swap atómico.
+    El resumen por ubicación se reconstruye en la misma transacción.
+    """
+    stats = reload_table(
+        WarehouseLocation,
+        _filas_por_bloque(datos, warehouse2d_records),
+        constantes={"created_at": datetime.utcnow()},
+        antes_del_swap=resumir_layout,
+    )
+
+    current_app.logger.info(
+        "Layout 2D cargado: %s filas en %ss (%s filas/s)",
+        stats["filas"], stats["segundos"], stats["filas_por_segundo"],
+    )
+    return stats
+
+
+# =====================================================================================
+#                       IMPORTACIÓN MASIVA DE BULTOS
+# =====================================================================================
+
+# Placas tipo ABC-123 / A1B-234 / ABC123 (letras y números, guiones internos)
+PLACA_VALIDA = r"[A-Z0-9]+(?:-[A-Z0-9]+)*"
+
+BULTOS_COLUMNAS = ["Cantidad", "Chofer", "Placa", "Fecha y Hora", "Observación"]
+
+
+def _fecha_local(valor):
+    """Una fecha del archivo como hora local sin zona horaria (NaT si no se entiende)."""
+    try:
+        # Mismo parser que la columna (el de un escalar lee 2024-05-01 como 5 de enero)
+        fecha = pd.to_datetime(pd.Series([valor]), format="mixed", dayfirst=True).iloc[0]
+    except (ValueError, TypeError, OverflowError):
+        return pd.NaT
+    if fecha.tzinfo is not None:
+        fecha = pd.Timestamp(fecha.to_pydatetime().astimezone().replace(tzinfo=None))
+    return fecha
+
+
+def _fechas(serie):
+    """
+    Columna de fechas sin zona horaria. Si alguna trae zona (ej.
+    2024-05-01T10:00:00Z) la columna se convierte valor por valor a hora
+    local, así se compara con `ahora` y las que no se entienden quedan NaT.
+    """
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", FutureWarning)
+            fecha = pd.to_datetime(serie, errors="coerce", format="mixed", dayfirst=True)
+        if fecha.dtype == "datetime64[ns]":
+            return fecha
+    except (ValueError, TypeError, OverflowError):
+        pass
+    return pd.to_datetime(serie.map(_fecha_local))
+
+
+def validar_bultos(df: pd.DataFrame, ahora=None):
+    """
+    Valida un bloque del archivo de bultos columna por columna.
+
+    Retorna (válidos, rechazados):
+      - válidos: DataFrame con las columnas de Bulto, listo para insertar.
+      - rechazados: las filas originales con la columna "Motivo".
+    """
+    ahora = ahora or datetime.now()
+    df = df.reset_index(drop=True)
+
+    cantidad = pd.to_numeric(df["Cantidad"], errors="coerce")
+    chofer = _texto(df["Chofer"])
+    placa = _texto(df["Placa"]).str.upper()
+    fecha = _fechas(df["Fecha y Hora"])
+    observacion = _texto(_columna(df, "Observación", "")).str.slice(0, 255)
+
+    errores = pd.DataFrame({
+        "Cantidad inválida": cantidad.isna() | (cantidad <= 0) | (cantidad % 1 != 0),
+        "Chofer vacío o muy largo": chofer.eq("") | (chofer.str.len() > 120),
+        "Placa inválida": ~placa.str.fullmatch(PLACA_VALIDA) | (placa.str.len() > 20),
+        "Fecha inválida": fecha.isna(),
+        "Fecha futura": fecha > ahora,
+    })
+    invalida = errores.any(axis=1)
+
+    validos = pd.DataFrame({
+        "cantidad": cantidad[~invalida].astype(int),
+        "chofer": chofer[~invalida],
+        "placa": placa[~invalida],
+        "fecha_hora": fecha[~invalida],
+        "observacion": observacion[~invalida],
+    })
+
+    rechazados = df.loc[invalida, [c for c in BULTOS_COLUMNAS if c in df.columns]].copy()
+    rechazados["Motivo"] = (
+        errores[invalida].dot(errores.columns + "; ").str.rstrip("; ")
+    )
+    return validos, rechazados
+
+
+def importar_bultos(datos, chunk_size=None) -> dict:
+    """
+    Importa bultos desde `datos` (DataFrame o bloques de iter_bultos_archivo).
+
+    Cada bloque se valida en una pasada vectorizada; las filas válidas se
+    insertan con bulk_insert y las rechazadas se juntan con su fila de
+    origen y motivo. El INSERT Core no dispara los eventos de rollups, así
+    que se suman a rollup_hora / rollup_dia agrupadas por hora.
+
+    Todo se confirma en un solo COMMIT. Retorna: insertados, rechazados
+    (DataFrame), segundos y filas_por_segundo.
+    """
+    ahora = datetime.now()
+    inicio = time.perf_counter()
+
+    insertados = 0
+    leidas = 0
+    rechazos = []
+    por_hora = {}
+
+    for bloque in _como_bloques(datos):
+        validos, rechazados = validar_bultos(bloque, ahora)
+
+        # Fila del archivo: la que trae el lector (cuenta las filas vacías
+        # que se saltó); sin ella, la posición dentro de los datos
+        if COLUMNA_FILA in bloque.columns:
+            fila = bloque[COLUMNA_FILA].to_numpy()[rechazados.index]
+        else:
+            fila = rechazados.index + leidas + 2
+        rechazados.insert(0, "Fila", fila)
+        leidas += len(bloque)
+
+        if not rechazados.empty:
+            rechazos.append(rechazados)
+
+        if validos.empty:
+            continue
+
+        bulk_insert(
+            Bulto.__table__,
+            validos.to_dict("records"),
+            chunk_size=chunk_size,
+            constantes={"creado_en": ahora},
+        )
+        insertados += len(validos)
+
+        horas = (
+            validos.groupby(validos["fecha_hora"].dt.floor("h"))["cantidad"]
+            .agg(["size", "sum"])
+        )
+        for hora, registros, total in horas.itertuples():
+            acumulado = por_hora.setdefault(hora.to_pydatetime(), [0, 0])
+            acumulado[0] += int(registros)
+            acumulado[1] += int(total)
+
+    conn = db.session.connection()
+    for hora, (registros, total) in sorted(por_hora.items()):
+        sumar_a_rollups(conn, "bultos", hora, "", registros, total)
+
+    db.session.commit()
+
+    segundos = time.perf_counter() - inicio
+    resumen = {
+        "insertados": insertados,
+        "rechazados": (
+            pd.concat(rechazos, ignore_index=True) if rechazos
+            else pd.DataFrame(columns=["Fila"] + BULTOS_COLUMNAS + ["Motivo"])
+        ),
+        "segundos": round(segundos, 3),
+        "filas_por_segundo": int(leidas / segundos) if segundos > 0 else leidas,
+    }
+
+    current_app.logger.info(
+        "Bultos importados: %s insertados, %s rechazados en %ss",
+        insertados, len(resumen["rechazados"]), resumen["segundos"],
+    )
+    return resumen
@@ -0,0 +1,175 @@
+from sqlalchemy import bindparam, inspect, select, update
+from sqlalchemy.schema import CreateColumn
+
+from models import db
+from models.inventory import InventoryItem
+from models.warehouse2d import WarehouseLocation, WarehouseLocationSummary
+from utils.excel import location_sort_key
+from utils.ingest import resumir_layout
+from utils.rollups import METRICAS, reconstruir_rollups
+from models.rollups import RollupDia
+
+
+# =====================================================================================
+#                   MIGRACIONES LIGERAS (BASES DE DATOS EXISTENTES)
+# =====================================================================================
+#
+# db.create_all() crea tablas nuevas pero no toca las que ya existen.
+# Aquí se agregan a esas tablas las columnas e índices nuevos de los modelos
+# y se rellenan las columnas derivadas que las cargas antiguas no tenían.
+
+def _agregar_columnas_faltantes(conn):
+    inspector = inspect(conn)
+    tablas_existentes = set(inspector.get_table_names())
+    quote = conn.dialect.identifier_preparer.quote
+
+    agregadas = []
+
+    for table in db.metadata.sorted_tables:
+        if table.name not in tablas_existentes:
+            continue
+
+        columnas_db = {c["name"] for c in inspector.get_columns(table.name)}
+
+        for col in table.columns:
+            if col.name in columnas_db:
+                continue
+
+            ddl = CreateColumn(col).compile(dialect=conn.dialect)
+            conn.exec_driver_sql(f"ALTER TABLE {quote(table.name)} ADD COLUMN {ddl}")
+            agregadas.append(f"{table.name}.{col.name}")
+
+    return agregadas
+
+
+def _crear_indices_faltantes(conn):
+    """
+    Crea los índices del modelo que no existen en la BD.
+    Se comparan por columnas y no por nombre: las tablas recargadas vía
+    staging + swap (utils.ingest) traen sus índices con otro sufijo.
+    """
+    inspector = inspect(conn)
+    tablas_existentes = set(inspector.get_table_names())
+
+    creados = []
+
+    for table in db.metadata.sorted_tables:
+        if table.name not in tablas_existentes:
+            continue
+
+        existentes = {
+            tuple(idx["column_names"]) for idx in inspector.get_indexes(table.name)
+        }
+
+        for idx in table.indexes:
+            columnas = tuple(c.name for c in idx.columns)
+            if columnas in existentes:
+                continue
+
+            idx.create(conn)
+            creados.append(idx.name)
+
+    return creados
+
+
+def _rellenar_orden_ubicacion(conn):
+    """Calcula loc_main / loc_letters / loc_last donde aún están vacíos."""
+    rellenadas = 0
+
+    for model, columna in ((InventoryItem, "location"), (WarehouseLocation, "ubicacion")):
+        table = model.__table__
+        col = table.c[columna]
+
+        pendientes = conn.execute(
+            select(col).where(table.c.loc_main.is_(None)).distinct()
+        ).scalars().all()
+
+        if not pendientes:
+            continue
+
+        stmt = (
+            update(table)
+            .where(col == bindparam("b_loc"), table.c.loc_main.is_(None))
+            .values(
+                loc_main=bindparam("b_main"),
+                loc_letters=bindparam("b_letters"),
+                loc_last=bindparam("b_last"),
+            )
+        )
+        filas = []
+        for loc in pendientes:
+            main, letters, last = location_sort_key(loc)
+            filas.append({"b_loc": loc, "b_main": main, "b_letters": letters, "b_last": last})
+
+        conn.execute(stmt, filas)
+        rellenadas += len(filas)
+
+    return rellenadas
+
+
+def _rellenar_status(conn):
+    """Calcula la columna status en SQL donde aún está vacía."""
+    rellenadas = 0
+
+    for model in (InventoryItem, WarehouseLocation):
+        table = model.__table__
+        resultado = conn.execute(
+            update(table)
+            .where(table.c.status.is_(None))
+            .values(status=model.status_sql(table.c))
+        )
+        rellenadas += resultado.rowcount or 0
+
+    return rellenadas
+
+
+def _rellenar_resumen_layout(conn):
+    """Genera warehouse_location_summary si hay layout cargado pero no resumen."""
+    hay_resumen = conn.execute(select(WarehouseLocationSummary.id).limit(1)).first()
+    hay_layout = conn.execute(select(WarehouseLocation.id).limit(1)).first()
+
+    if hay_resumen or not hay_layout:
+        return False
+
+    resumir_layout(conn)
+    return True
+
+
+def _rellenar_rollups(conn):
+    """Construye los rollups si están vacíos pero ya hay historial."""
+    if conn.execute(select(RollupDia.id).limit(1)).first():
+        return False
+
+    hay_historial = any(
+        conn.execute(select(modelo.id).limit(1)).first()
+        for modelo, *_ in METRICAS.values()
+    )
+    if not hay_historial:
+        return False
+
+    reconstruir_rollups(conn)
+    return True
+
+
+def aplicar_migraciones():
+    """Actualiza el esquema de una BD existente. Llamar después de create_all()."""
+    with db.engine.begin() as conn:
+        agregadas = _agregar_columnas_faltantes(conn)
+        ubicaciones = _rellenar_orden_ubicacion(conn)
+        status = _rellenar_status(conn)
+        indices = _crear_indices_faltantes(conn)
+        resumen = _rellenar_resumen_layout(conn)
+        rollups = _rellenar_rollups(conn)
+
+    for nombre in agregadas:
+        print(f">>> Columna agregada: {nombre}")
+    for nombre in indices:
+        print(f">>> Índice creado: {nombre}")
+    if ubicaciones:
+        print(f">>> Orden de ubicación calculado para {ubicaciones} ubicaciones")
+    if status:
+        print(f">>> Status calculado para {status} filas")
+    if resumen:
+        print(">>> Resumen por ubicación del layout 2D generado")
+    if rollups:
+        print(">>> Rollups de bultos, alertas y errores generados")
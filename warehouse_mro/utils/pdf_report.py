@@ -1,9 +1,10 @@
 import os
 import io
 from datetime import datetime
+from functools import lru_cache
 from reportlab.lib.pagesizes import letter
 from reportlab.pdfgen import canvas
-from reportlab.graphics.shapes import Drawing
+from reportlab.graphics.shapes import Drawing, Group, Rect, String
 from reportlab.graphics.charts.barcharts import VerticalBarChart
 from reportlab.graphics.charts.piecharts import Pie
 from reportlab.graphics import renderPDF
@@ -17,6 +18,105 @@ from models.inventory import InventoryItem
 from models.bultos import Bulto
 from models.alerts import Alert
 from models.actividad import ActividadUsuario
+from utils.cache import limpiar_imagenes, obtener_imagen
+from utils.pdf_tabular import Columna, dibujar_tabla
+
+
+# =====================================================================================
+#                  ASSETS PRECARGADOS (UNA VEZ POR PROCESO)
+# =====================================================================================
+#
+# En un lote de cientos de reportes lo único que cambia entre uno y otro son
+# los datos del usuario. Logo y fotos salen de la caché de imágenes (se
+# releen solo si cambia el archivo); QR, gráficos, marca de agua, encabezado
+# y pie se arman una vez y se dibujan ya construidos.
+
+AZUL = colors.Color(0 / 255, 59 / 255, 113 / 255)
+LOGO = os.path.join("static", "images", "gerdau_logo.jpg")
+
+
+@lru_cache(maxsize=1024)
+def _qr_usuario(user_id):
+    """QR del usuario (su contenido solo depende del id)."""
+    qr_buf = io.BytesIO()
+    # Máscara fija: evita probar las 8 máscaras (la mayor parte del tiempo del QR)
+    qr = qrcode.QRCode(box_size=3, border=2, mask_pattern=0)
+    qr.add_data(f"Reporte generado para usuario {user_id}")
+    qr.make(fit=True)
+    qr.make_image().save(qr_buf, format="PNG")
+    qr_buf.seek(0)
+
+    lector = ImageReader(qr_buf)
+    lector.getRGBData()
+    return lector
+
+
+@lru_cache(maxsize=8)
+def _graficos(kpi_inventarios, kpi_bultos, kpi_alertas):
+    """(barras, torta) de los KPIs globales: iguales para todos los usuarios del lote."""
+    chart = Drawing(400, 200)
+    bar = VerticalBarChart()
+
+    bar.x = 50
+    bar.y = 30
+    bar.width = 300
+    bar.height = 150
+    bar.data = [[kpi_inventarios, kpi_bultos, kpi_alertas]]
+
+    bar.categoryAxis.categoryNames = ["Inventarios", "Bultos", "Alertas"]
+    bar.bars[0].fillColor = AZUL
+
+    chart.add(bar)
+
+    pie_draw = None
+    if kpi_inventarios + kpi_bultos + kpi_alertas > 0:
+        pie_draw = Drawing(200, 160)
+        pie = Pie()
+        pie.x = 40
+        pie.y = 15
+        pie.width = 120
+        pie.height = 120
+        pie.data = [kpi_inventarios, kpi_bultos, kpi_alertas]
+        pie.labels = ["Inv", "Bultos", "Alertas"]
+        pie_draw.add(pie)
+        pie_draw = pie_draw.expandUserNodes()
+
+    # Solo formas primitivas: el layout de los gráficos no se recalcula al dibujar
+    return chart.expandUserNodes(), pie_draw
+
+
+@lru_cache(maxsize=4)
+def _fijos(width, height):
+    """(marca de agua, encabezado, pie) ya construidos para el tamaño de página."""
+    texto = String(0, 0, "GERDAU - CONFIDENCIAL", fontName="Helvetica-Bold", fontSize=60,
+                   fillColor=colors.Color(0.93, 0.93, 0.93))
+    grupo = Group(texto)
+    grupo.translate(width / 4, height / 3)
+    grupo.rotate(45)
+    marca = Drawing(width, height)
+    marca.add(grupo)
+
+    encabezado = Drawing(width, 90)
+    encabezado.add(Rect(0, 0, width, 90, fillColor=AZUL, strokeColor=colors.black))
+    encabezado.add(String(30, 35, "Reporte Corporativo del Usuario",
+                          fontName="Helvetica-Bold", fontSize=22, fillColor=colors.white))
+    encabezado.add(String(30, 20, "Sistema Warehouse MRO - SIDERPERU / GERDAU",
+                          fontName="Helvetica", fontSize=11, fillColor=colors.white))
+
+    pie = Drawing(width, 40)
+    pie.add(Rect(0, 0, width, 40, fillColor=AZUL, strokeColor=colors.black))
+    pie.add(String(30, 20, "Sistema Warehouse MRO — GERDAU / SIDERPERU",
+                   fontName="Helvetica", fontSize=8, fillColor=colors.white))
+
+    return marca, encabezado, pie
+
+
+def limpiar_assets():
+    """Descarta todos los assets precargados (ej. para medir en frío)."""
+    _qr_usuario.cache_clear()
+    _graficos.cache_clear()
+    _fijos.cache_clear()
+    limpiar_imagenes()
 
 
 def create_pdf_reporte(user_id):
@@ -47,7 +147,9 @@ def create_pdf_reporte(user_id):
     security_code = f"SEC-{user.id}-{datetime.utcnow().strftime('%Y%m%d%H%M%S')}"
 
     # ========= RUTA PDF ============
-    reports_folder = os.path.join(current_app.root_path, "static", "reports")
+    reports_folder = current_app.config.get(
+        "REPORT_FOLDER", os.path.join(current_app.root_path, "static", "reports")
+    )
     os.makedirs(reports_folder, exist_ok=True)
 
     pdf_path = os.path.join(
@@ -59,43 +161,26 @@ def create_pdf_reporte(user_id):
     c = canvas.Canvas(pdf_path, pagesize=letter)
     width, height = letter
 
+    marca, encabezado, pie_pagina = _fijos(width, height)
+
     # ========= MARCA DE AGUA =========
-    c.saveState()
-    c.setFont("Helvetica-Bold", 60)
-    c.setFillColorRGB(0.93, 0.93, 0.93)
-    c.translate(width / 4, height / 3)
-    c.rotate(45)
-    c.drawString(0, 0, "GERDAU - CONFIDENCIAL")
-    c.restoreState()
+    renderPDF.draw(marca, c, 0, 0)
 
     # ========= ENCABEZADO ==========
-
-    c.setFillColorRGB(0, 59/255, 113/255)
-    c.rect(0, height - 90, width, 90, fill=1)
-
-    c.setFont("Helvetica-Bold", 22)
-    c.setFillColor(colors.white)
-    c.drawString(30, height - 55, "Reporte Corporativo del Usuario")
-
-    c.setFont("Helvetica", 11)
-    c.drawString(30, height - 70, "Sistema Warehouse MRO - SIDERPERU / GERDAU")
+    renderPDF.draw(encabezado, c, 0, height - 90)
 
     # LOGO SIDERPERU EXACTO
-    try:
-        logo_path = os.path.join(current_app.root_path, "static", "img", "gerdau_logo.jpg")
-        c.drawImage(logo_path, width - 150, height - 82, width=120, height=50, mask="auto")
-    except Exception as e:
-        print("No se pudo cargar logo:", e)
+    logo = obtener_imagen(os.path.join(current_app.root_path, LOGO))
+    if logo is not None:
+        c.drawImage(logo, width - 150, height - 82, width=120, height=50, mask="auto")
 
     # ========= FOTO + DATOS ==========
     top = height - 130
 
     if hasattr(user, "photo") and user.photo:
-        try:
-            photo_path = os.path.join(current_app.root_path, "static", user.photo)
-            c.drawImage(photo_path, 30, top - 130, width=120, height=120, mask="auto")
-        except:
-            pass
+        foto = obtener_imagen(os.path.join(current_app.root_path, "static", user.photo))
+        if foto is not None:
+            c.drawImage(foto, 30, top - 130, width=120, height=120, mask="auto")
 
     c.setFillColor(colors.black)
     c.setFont("Helvetica-Bold", 14)
@@ -113,73 +198,40 @@ def create_pdf_reporte(user_id):
 
     c.drawString(170, top - 140, f"Perfil completado: {perfil_completado}%")
 
-    # ========= GRÁFICO DE BARRAS ==========
-    chart = Drawing(400, 200)
-    bar = VerticalBarChart()
-
-    bar.x = 50
-    bar.y = 30
-    bar.width = 300
-    bar.height = 150
-    bar.data = [[kpi_inventarios, kpi_bultos, kpi_alertas]]
-
-    bar.categoryAxis.categoryNames = ["Inventarios", "Bultos", "Alertas"]
-    bar.bars[0].fillColor = colors.Color(0/255, 59/255, 113/255)
-
-    chart.add(bar)
+    # ========= GRÁFICOS (BARRAS + PIE) ==========
+    chart, pie_draw = _graficos(kpi_inventarios, kpi_bultos, kpi_alertas)
     renderPDF.draw(chart, c, 30, top - 350)
-
-    # ========= GRÁFICO PIE ==========
-    total = kpi_inventarios + kpi_bultos + kpi_alertas
-    if total > 0:
-        pie_draw = Drawing(200, 160)
-        pie = Pie()
-        pie.x = 40
-        pie.y = 15
-        pie.width = 120
-        pie.height = 120
-        pie.data = [kpi_inventarios, kpi_bultos, kpi_alertas]
-        pie.labels = ["Inv", "Bultos", "Alertas"]
-        pie_draw.add(pie)
+    if pie_draw is not None:
         renderPDF.draw(pie_draw, c, width - 240, top - 330)
 
     # ========= QR ==========
-    qr_buf = io.BytesIO()
-    qr = qrcode.QRCode(box_size=3, border=2)
-    qr.add_data(f"Reporte generado para usuario {user.id}")
-    qr.make(fit=True)
-    img = qr.make_image()
-    img.save(qr_buf, format="PNG")
-    qr_buf.seek(0)
-    c.drawImage(ImageReader(qr_buf), width - 120, top - 200, width=70, height=70)
+    c.drawImage(_qr_usuario(user.id), width - 120, top - 200, width=70, height=70)
 
     # ========= ACTIVIDAD ===========
     y = top - 380
     c.setFont("Helvetica-Bold", 14)
     c.drawString(30, y, "Actividad reciente:")
 
-    y -= 20
-    c.setFont("Helvetica", 10)
+    y -= 10
 
     if actividad:
-        for log in actividad:
-            if y < 70:
-                c.showPage()
-                y = height - 50
-
-            fecha = log.fecha.strftime("%d/%m/%Y %H:%M")
-            c.drawString(30, y, f"{fecha} — {log.descripcion}")
-            y -= 18
+        # Tabla del motor tabular: parte de página con encabezado repetido
+        dibujar_tabla(
+            c, 30, y, width - 60,
+            [Columna("Fecha", 1), Columna("Descripción", 4)],
+            [(log.fecha, log.descripcion) for log in actividad],
+            y_nueva_pagina=height - 50,
+            y_min=50,
+        )
     else:
-        c.drawString(30, y, "No hay actividad registrada.")
+        c.setFont("Helvetica", 10)
+        c.drawString(30, y - 10, "No hay actividad registrada.")
 
     # ========= FOOTER ===========
-    c.setFillColorRGB(0, 59/255, 113/255)
-    c.rect(0, 0, width, 40, fill=1)
+    renderPDF.draw(pie_pagina, c, 0, 0)
 
     c.setFont("Helvetica", 8)
     c.setFillColor(colors.white)
-    c.drawString(30, 20, "Sistema Warehouse MRO — GERDAU / SIDERPERU")
     c.drawRightString(width - 30, 20, f"Código de seguridad: {security_code}")
 
     c.save()
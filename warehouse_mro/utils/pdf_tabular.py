@@ -0,0 +1,286 @@
+import io
+import os
+from collections import namedtuple
+from datetime import date, datetime
+from itertools import islice
+
+from flask import current_app, has_app_context
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import landscape, letter
+from reportlab.lib.units import inch
+from reportlab.pdfbase.pdfmetrics import stringWidth
+from reportlab.platypus import Flowable, SimpleDocTemplate, Table, TableStyle
+
+from utils.cache import obtener_imagen
+
+
+# =====================================================================================
+#                    MOTOR DE REPORTES TABULARES (PLATYPUS)
+# =====================================================================================
+#
+# Un solo motor para los PDF de tablas grandes (errores, bultos, inventario,
+# discrepancias):
+#   - Las filas se consumen de un iterable (ej. consulta con yield_per) y se
+#     parten en tablas de exactamente una página: cada página lleva su
+#     encabezado de columnas y Platypus nunca tiene que partir una tabla.
+#     Las tablas se arman a medida que Platypus las pide (_TablasPorPagina):
+#     en memoria solo hay una página de filas, no todo el reporte.
+#   - Un solo TableStyle para todo el documento (sin estilos por celda).
+#   - Fuentes base de PDF (Helvetica): no se incrustan en el archivo.
+#   - El logo sale de la caché de imágenes del proceso; la banda superior
+#     (con el logo) es un form del PDF: se escribe una vez y cada página lo
+#     reutiliza.
+
+AZUL = colors.Color(0, 59 / 255, 113 / 255)
+GRIS_FILA = colors.Color(0.95, 0.96, 0.98)
+
+FUENTE = "Helvetica"
+FUENTE_NEGRITA = "Helvetica-Bold"
+TAMANO = 8
+ALTO_FILA = 12
+
+MARGEN = 0.5 * inch
+ALTO_BANDA = 60        # banda azul superior (título + logo)
+ALTO_PIE = 24
+
+LOGO_RELATIVO = os.path.join("static", "images", "gerdau_logo.jpg")
+
+# titulo: encabezado; ancho: peso relativo; alinear: LEFT / RIGHT / CENTER;
+# formato: callable valor → texto (por defecto _texto)
+Columna = namedtuple("Columna", "titulo ancho alinear formato", defaults=(1, "LEFT", None))
+
+
+def _texto(valor):
+    if valor is None:
+        return ""
+    if isinstance(valor, datetime):
+        return valor.strftime("%d/%m/%Y %H:%M")
+    if isinstance(valor, date):
+        return valor.strftime("%d/%m/%Y")
+    if isinstance(valor, float):
+        return "" if valor != valor else f"{valor:,.2f}"  # NaN de pandas → vacío
+    return str(valor)
+
+
+def _recortar(texto, maximo):
+    """Una línea por celda: el texto que no entra en la columna se corta."""
+    return texto if len(texto) <= maximo else texto[:max(maximo - 1, 1)] + "…"
+
+
+def _logo_por_defecto():
+    if not has_app_context():
+        return None
+    ruta = os.path.join(current_app.root_path, LOGO_RELATIVO)
+    return ruta if os.path.exists(ruta) else None
+
+
+def _estilo(columnas):
+    comandos = [
+        ("FONTNAME", (0, 0), (-1, 0), FUENTE_NEGRITA),
+        ("FONTNAME", (0, 1), (-1, -1), FUENTE),
+        ("FONTSIZE", (0, 0), (-1, -1), TAMANO),
+        ("LEADING", (0, 0), (-1, -1), TAMANO + 1),
+        ("BACKGROUND", (0, 0), (-1, 0), AZUL),
+        ("TEXTCOLOR", (0, 0), (-1, 0), colors.white),
+        ("ROWBACKGROUNDS", (0, 1), (-1, -1), [colors.white, GRIS_FILA]),
+        ("LINEBELOW", (0, -1), (-1, -1), 0.5, AZUL),
+        ("VALIGN", (0, 0), (-1, -1), "MIDDLE"),
+        ("TOPPADDING", (0, 0), (-1, -1), 1),
+        ("BOTTOMPADDING", (0, 0), (-1, -1), 2),
+    ]
+    for i, col in enumerate(columnas):
+        if col.alinear != "LEFT":
+            comandos.append(("ALIGN", (i, 0), (i, -1), col.alinear))
+    return TableStyle(comandos)
+
+
+def preparar_columnas(columnas, ancho_total):
+    """Anchos en puntos, máximo de caracteres por celda y formateadores."""
+    pesos = sum(c.ancho for c in columnas)
+    anchos = [ancho_total * c.ancho / pesos for c in columnas]
+
+    # Caracteres que entran por columna (ancho medio de un dígito en Helvetica)
+    ancho_caracter = stringWidth("0", FUENTE, TAMANO)
+    maximos = [max(int((a - 6) / ancho_caracter), 1) for a in anchos]
+
+    formatos = [c.formato or _texto for c in columnas]
+    return anchos, maximos, formatos
+
+
+def tabla(columnas, filas, anchos, maximos, formatos, estilo=None):
+    """Table de Platypus con encabezado repetido en cada página."""
+    encabezado = [c.titulo for c in columnas]
+    datos = [encabezado] + [
+        [_recortar(f(v), m) for f, v, m in zip(formatos, fila, maximos)]
+        for fila in filas
+    ]
+    return Table(
+        datos,
+        colWidths=anchos,
+        rowHeights=ALTO_FILA,
+        repeatRows=1,
+        style=estilo or _estilo(columnas),
+    )
+
+
+def _tablas_por_pagina(columnas, filas, anchos, filas_por_pagina):
+    maximos, formatos = preparar_columnas(columnas, sum(anchos))[1:]
+    estilo = _estilo(columnas)
+
+    filas = iter(filas)
+    primera = True
+    while True:
+        bloque = list(islice(filas, filas_por_pagina))
+        if not bloque and not primera:
+            return
+        primera = False
+        yield tabla(columnas, bloque, anchos, maximos, formatos, estilo)
+        if len(bloque) < filas_por_pagina:
+            return
+
+
+class _TablasPorPagina(Flowable):
+    """
+    Entrega de a una las tablas de página de un generador con el protocolo
+    wrap / split de Platypus: nunca "entra" entero, así Platypus lo parte y
+    split devuelve la tabla de la página más otro _TablasPorPagina con el
+    resto. La tabla siguiente, y sus filas, recién se arman cuando la
+    anterior ya se ubicó.
+    """
+
+    def __init__(self, paginas):
+        super().__init__()
+        self._paginas = paginas
+        self._actual = None
+
+    def _tabla(self):
+        if self._actual is None and self._paginas is not None:
+            self._actual = next(self._paginas, None)
+            if self._actual is None:
+                self._paginas = None
+        return self._actual
+
+    def wrap(self, availWidth, availHeight):
+        if self._tabla() is None:
+            return 0, 0
+        return availWidth, availHeight + 1
+
+    def split(self, availWidth, availHeight):
+        tabla = self._tabla()
+        if tabla is None or tabla.wrap(availWidth, availHeight)[1] > availHeight:
+            # No entra en lo que queda: Platypus lo pasa a la página siguiente
+            return []
+        return [tabla, _TablasPorPagina(self._paginas)]
+
+    def draw(self):
+        pass
+
+
+def generar_pdf_tabular(titulo, columnas, filas, subtitulo=None, horizontal=False, logo=None,
+                        pie=None):
+    """
+    Genera un PDF con una tabla paginada y retorna sus bytes.
+
+    `columnas`: lista de Columna. `filas`: iterable de tuplas en el mismo
+    orden (puede ser una consulta en streaming). `subtitulo` va bajo el
+    título en cada página. `logo`: ruta de imagen (por defecto el logo de
+    static/images). `pie`: texto del pie de página (por defecto la hora de
+    generación; los PDF que se cachean pasan uno que no dependa del reloj).
+    """
+    pagesize = landscape(letter) if horizontal else letter
+    ancho_pagina, alto_pagina = pagesize
+
+    buffer = io.BytesIO()
+    doc = SimpleDocTemplate(
+        buffer,
+        pagesize=pagesize,
+        leftMargin=MARGEN,
+        rightMargin=MARGEN,
+        topMargin=ALTO_BANDA + 12,
+        bottomMargin=ALTO_PIE + 8,
+        title=titulo,
+        author="Warehouse MRO",
+    )
+
+    ancho_util = ancho_pagina - 2 * MARGEN
+    anchos = preparar_columnas(columnas, ancho_util)[0]
+
+    # Filas que entran bajo el encabezado de columnas (el frame tiene 6 pt de relleno por lado)
+    alto_util = alto_pagina - doc.topMargin - doc.bottomMargin - 12
+    filas_por_pagina = max(int(alto_util // ALTO_FILA) - 1, 1)
+
+    logo = logo or _logo_por_defecto()
+    lector_logo = obtener_imagen(logo) if logo else None
+    pie = pie or f"Sistema Warehouse MRO — Generado: {datetime.now().strftime('%d/%m/%Y %H:%M')}"
+
+    def banda_superior(c):
+        """Banda, título y logo: iguales en todas las páginas."""
+        c.setFillColor(AZUL)
+        c.rect(0, alto_pagina - ALTO_BANDA, ancho_pagina, ALTO_BANDA, stroke=0, fill=1)
+
+        c.setFillColor(colors.white)
+        c.setFont(FUENTE_NEGRITA, 16)
+        c.drawString(MARGEN, alto_pagina - 28, titulo)
+        c.setFont(FUENTE, 9)
+        c.drawString(MARGEN, alto_pagina - 44, subtitulo or "Sistema Warehouse MRO - SIDERPERU / GERDAU")
+
+        if lector_logo is not None:
+            c.drawImage(
+                lector_logo, ancho_pagina - MARGEN - 100, alto_pagina - ALTO_BANDA + 8,
+                width=100, height=ALTO_BANDA - 16, preserveAspectRatio=True, mask="auto",
+            )
+
+    def encabezado_y_pie(c, documento):
+        c.saveState()
+
+        # La banda se dibuja una vez en un form del documento y cada página
+        # solo lo referencia
+        if documento.page == 1:
+            c.beginForm("banda_superior")
+            banda_superior(c)
+            c.endForm()
+        c.doForm("banda_superior")
+
+        c.setFillColor(colors.grey)
+        c.setFont(FUENTE, 7)
+        c.drawString(MARGEN, ALTO_PIE / 2, pie)
+        c.drawRightString(ancho_pagina - MARGEN, ALTO_PIE / 2, f"Página {documento.page}")
+
+        c.restoreState()
+
+    doc.build(
+        [_TablasPorPagina(_tablas_por_pagina(columnas, filas, anchos, filas_por_pagina))],
+        onFirstPage=encabezado_y_pie,
+        onLaterPages=encabezado_y_pie,
+    )
+    return buffer.getvalue()
+
+
+def dibujar_tabla(c, x, y, ancho, columnas, filas, y_nueva_pagina, y_min=50):
+    """
+    Dibuja una tabla sobre un canvas ya abierto (reportes con diseño propio,
+    ej. create_pdf_reporte), desde `y` hacia abajo. Si no entra, continúa en
+    páginas nuevas desde `y_nueva_pagina` repitiendo el encabezado.
+    Retorna la y donde terminó la tabla.
+    """
+    anchos, maximos, formatos = preparar_columnas(columnas, ancho)
+    pendiente = tabla(columnas, list(filas), anchos, maximos, formatos)
+
+    while True:
+        _, alto = pendiente.wrapOn(c, ancho, y - y_min)
+        if alto <= y - y_min:
+            pendiente.drawOn(c, x, y - alto)
+            return y - alto
+
+        partes = pendiente.split(ancho, y - y_min)
+        if len(partes) < 2:
+            # Ni una fila entra en lo que queda de la página
+            c.showPage()
+            y = y_nueva_pagina
+            continue
+
+        _, alto = partes[0].wrapOn(c, ancho, y - y_min)
+        partes[0].drawOn(c, x, y - alto)
+        pendiente = partes[1]
+        c.showPage()
+        y = y_nueva_pagina
@@ -0,0 +1,197 @@
+from datetime import datetime
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import delete, func, literal, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from models import db
+from models.alerts import Alert
+from models.bultos import Bulto
+from models.rollups import RollupDia, RollupHora
+from models.technician_error import TechnicianError
+
+
+# =====================================================================================
+#                    MANTENIMIENTO DE ROLLUPS (HORA / DÍA)
+# =====================================================================================
+#
+# Cada INSERT ORM de Bulto, Alert o TechnicianError suma su fila a los
+# rollups dentro del mismo flush (evento after_insert). Las inserciones
+# masivas por Core llaman a sumar_a_rollups() directamente.
+#
+# bucket_start se guarda con el mismo texto que usa SQLAlchemy para DateTime
+# en SQLite ("YYYY-MM-DD HH:MM:SS.ffffff"), así el incremental y la
+# reconstrucción por SQL caen en la misma clave única.
+
+# metrica → (modelo, columna de fecha, dimensión, valor sumado en `total`)
+METRICAS = {
+    "bultos": (Bulto, "fecha_hora", None, "cantidad"),
+    "alertas": (Alert, "fecha", "alert_type", None),
+    "errores": (TechnicianError, "fecha_hora", "tecnico", "dinero_perdido"),
+}
+
+# granularidad → (modelo rollup, formato strftime del bucket)
+GRANULARIDADES = {
+    "hora": (RollupHora, "%Y-%m-%d %H:00:00.000000"),
+    "dia": (RollupDia, "%Y-%m-%d 00:00:00.000000"),
+}
+
+
+def _bucket(fecha: datetime, granularidad: str) -> datetime:
+    if granularidad == "hora":
+        return fecha.replace(minute=0, second=0, microsecond=0)
+    return fecha.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def sumar_a_rollups(conn, metrica, fecha, dimension="", registros=1, total=None):
+    """
+    Suma `registros` filas (y `total`) al bucket de `fecha` en los rollups
+    por hora y por día (INSERT ... ON CONFLICT DO UPDATE).
+    Si `total` es None se usa `registros` (métricas de solo conteo).
+    """
+    if fecha is None:
+        return
+
+    total = float(registros if total is None else total)
+
+    for granularidad, (modelo, _) in GRANULARIDADES.items():
+        table = modelo.__table__
+        stmt = sqlite_insert(table).values(
+            metrica=metrica,
+            bucket_start=_bucket(fecha, granularidad),
+            dimension=dimension or "",
+            registros=registros,
+            total=total,
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["metrica", "bucket_start", "dimension"],
+            set_={
+                "registros": table.c.registros + stmt.excluded.registros,
+                "total": table.c.total + stmt.excluded.total,
+            },
+        )
+        conn.execute(stmt)
+
+
+def _escuchar_inserciones(metrica):
+    modelo, col_fecha, col_dimension, col_valor = METRICAS[metrica]
+
+    def after_insert(mapper, connection, target):
+        if metrica == "alertas":
+            dimension = target.alert_type or target.tipo or ""
+        else:
+            dimension = getattr(target, col_dimension) if col_dimension else ""
+        total = (getattr(target, col_valor) or 0) if col_valor else None
+        sumar_a_rollups(connection, metrica, getattr(target, col_fecha), dimension, 1, total)
+
+    db.event.listen(modelo, "after_insert", after_insert)
+
+
+for _metrica in METRICAS:
+    _escuchar_inserciones(_metrica)
+
+
+# =====================================================================================
+#                          RECONSTRUCCIÓN COMPLETA (SQL)
+# =====================================================================================
+
+def reconstruir_rollups(conn):
+    """Recalcula todos los rollups desde las tablas originales."""
+    filas = {}
+
+    for granularidad, (modelo, formato) in GRANULARIDADES.items():
+        rollup = modelo.__table__
+        conn.execute(delete(rollup))
+
+        for metrica, (origen, col_fecha, col_dimension, col_valor) in METRICAS.items():
+            t = origen.__table__
+            fecha = t.c[col_fecha]
+
+            bucket = func.strftime(formato, fecha)
+            if metrica == "alertas":
+                dimension = func.coalesce(t.c.alert_type, t.c.tipo, "")
+            elif col_dimension:
+                dimension = func.coalesce(t.c[col_dimension], "")
+            else:
+                dimension = literal("")
+            total = (
+                func.coalesce(func.sum(t.c[col_valor]), 0.0) if col_valor
+                else func.count()
+            )
+
+            consulta = (
+                select(literal(metrica), bucket, dimension, func.count(), total)
+                .where(fecha.isnot(None))
+                .group_by(bucket, dimension)
+            )
+            resultado = conn.execute(
+                rollup.insert().from_select(
+                    ["metrica", "bucket_start", "dimension", "registros", "total"],
+                    consulta,
+                )
+            )
+            filas[(granularidad, metrica)] = resultado.rowcount or 0
+
+    return filas
+
+
+@click.command("reconstruir-rollups")
+@with_appcontext
+def reconstruir_rollups_command():
+    """Reconstruye rollup_hora y rollup_dia desde bultos, alertas y errores."""
+    with db.engine.begin() as conn:
+        filas = reconstruir_rollups(conn)
+
+    for (granularidad, metrica), cantidad in filas.items():
+        click.echo(f">>> Rollup {granularidad} / {metrica}: {cantidad} buckets")
+
+
+# =====================================================================================
+#                              CONSULTAS PARA GRÁFICOS
+# =====================================================================================
+
+def serie_diaria(metrica, desde=None, hasta=None):
+    """[(día, registros, total)] sumando todas las dimensiones, en orden."""
+    consulta = (
+        db.session.query(
+            RollupDia.bucket_start,
+            func.sum(RollupDia.registros),
+            func.sum(RollupDia.total),
+        )
+        .filter(RollupDia.metrica == metrica)
+    )
+    if desde is not None:
+        consulta = consulta.filter(RollupDia.bucket_start >= desde)
+    if hasta is not None:
+        consulta = consulta.filter(RollupDia.bucket_start < hasta)
+
+    return (
+        consulta.group_by(RollupDia.bucket_start)
+        .order_by(RollupDia.bucket_start)
+        .all()
+    )
+
+
+def registros_por_hora_del_dia(metrica):
+    """{"HH": registros} de todo el historial (desde el rollup por hora)."""
+    hora = func.strftime("%H", RollupHora.bucket_start)
+    filas = (
+        db.session.query(hora, func.sum(RollupHora.registros))
+        .filter(RollupHora.metrica == metrica)
+        .group_by(hora)
+        .all()
+    )
+    return {h: int(cantidad) for h, cantidad in filas}
+
+
+def registros_por_dia_semana(metrica):
+    """{0..6 (domingo = 0): registros} de todo el historial (rollup por día)."""
+    dia = func.strftime("%w", RollupDia.bucket_start)
+    filas = (
+        db.session.query(dia, func.sum(RollupDia.registros))
+        .filter(RollupDia.metrica == metrica)
+        .group_by(dia)
+        .all()
+    )
+    return {int(d): int(cantidad) for d, cantidad in filas}
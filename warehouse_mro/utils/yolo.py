@@ -1,40 +1,336 @@
+import hashlib
+import json
 import os
+import shutil
+import threading
+import uuid
 from typing import Tuple, List, Dict
 from flask import current_app
 
 try:
-    from ultralytics import YOLO
     import cv2
-except Exception:  # ultralytics no instalado / sin opencv
-    YOLO = None
+    import numpy as np
+except Exception:  # sin opencv
     cv2 = None
+    np = None
+
+from utils.yolo_backends import crear_backend
 
 
 _model_cache = {
     "loaded": False,
-    "model": None,
+    "model": None,    # backend de utils.yolo_backends
+    "huella": None,   # SHA-256 del modelo + backend (parte de la clave de caché)
 }
 
+# Carga única del modelo aunque varios hilos lo pidan a la vez
+_load_lock = threading.Lock()
+
+# Los backends (predictor de ultralytics, sesión ONNX) se usan de a una inferencia
+_infer_lock = threading.Lock()
+
+
+def _crear_backend(model_path):
+    config = current_app.config
+    nombre = config.get("YOLO_BACKEND", "ultralytics")
+    try:
+        return crear_backend(
+            nombre,
+            model_path,
+            imgsz=config.get("YOLO_IMGSZ", 640),
+            conf=config.get("YOLO_CONF", 0.25),
+            iou=config.get("YOLO_IOU", 0.7),
+            device=config.get("YOLO_DEVICE", "cpu"),
+            hilos=config.get("YOLO_THREADS"),
+        )
+    except ImportError:
+        # ultralytics / onnxruntime no instalado
+        current_app.logger.warning("Backend de inferencia %s no disponible", nombre)
+        return None
+
 
 def _load_model():
     if _model_cache["loaded"]:
         return _model_cache["model"]
 
-    model_path = current_app.config.get("YOLO_MODEL_PATH")
-    if not model_path or not os.path.exists(model_path):
+    with _load_lock:
+        # Otro hilo pudo cargarlo mientras se esperaba el lock
+        if _model_cache["loaded"]:
+            return _model_cache["model"]
+
+        model = None
+        model_path = current_app.config.get("YOLO_MODEL_PATH")
+
+        if model_path and os.path.exists(model_path) and cv2 is not None:
+            model = _crear_backend(model_path)
+
+        if model is not None:
+            # Una inferencia sobre una imagen negra: inicializa pesos y sesión
+            with _infer_lock:
+                model.calentar()
+            _model_cache["huella"] = f"{_sha256_archivo(model_path)}:{model.nombre}"
+
+        _model_cache["model"] = model
         _model_cache["loaded"] = True
-        _model_cache["model"] = None
+        return model
+
+
+def opencv_disponible():
+    return cv2 is not None
+
+
+def precargar_modelo():
+    """
+    Carga y calienta el modelo al iniciar el proceso de detección
+    (tasks.deteccion.run_pipeline), así el primer lote no paga la carga.
+    La web no lo carga: solo encola trabajos. Requiere contexto de aplicación.
+    """
+    model = _load_model()
+    if model is not None:
+        current_app.logger.info("Modelo YOLO precargado: %s", current_app.config.get("YOLO_MODEL_PATH"))
+    return model is not None
+
+
+# =====================================================================================
+#                    CACHÉ DE RESULTADOS EN DISCO (POR CONTENIDO)
+# =====================================================================================
+#
+# Clave = SHA-256(huella del modelo + bytes de la imagen): la misma foto
+# subida otra vez (reintento, auditoría) no vuelve a pasar por el modelo, y
+# cambiar el modelo invalida todo. Cada entrada son dos archivos en
+# CACHE_FOLDER/deteccion: <clave>.json (conteo y cajas) y <clave>.jpg
+# (imagen anotada). El mtime del .json marca el último uso (LRU): al pasar
+# de YOLO_CACHE_MAX_ENTRIES se borran las entradas menos usadas.
+
+def _sha256_archivo(ruta):
+    h = hashlib.sha256()
+    with open(ruta, "rb") as f:
+        for bloque in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(bloque)
+    return h.hexdigest()
+
+
+def _clave(contenido, variante=""):
+    """
+    Clave de la caché para los bytes de una imagen (requiere el modelo
+    cargado). `variante` distingue preprocesados distintos de la misma
+    imagen (ej. el pipeline reduce las imágenes antes de inferir).
+    """
+    base = _model_cache["huella"].encode() + variante.encode()
+    return hashlib.sha256(base + contenido).hexdigest()
+
+
+def _carpeta_deteccion():
+    carpeta = os.path.join(current_app.config["CACHE_FOLDER"], "deteccion")
+    os.makedirs(carpeta, exist_ok=True)
+    return carpeta
+
+
+def _ruta_anotada(image_path):
+    return os.path.splitext(image_path)[0] + "_yolo.jpg"
+
+
+def _leer_deteccion(carpeta, clave, image_path):
+    """Resultado guardado para `clave` o None. Un acierto renueva su uso."""
+    ruta_json = os.path.join(carpeta, f"{clave}.json")
+    ruta_jpg = os.path.join(carpeta, f"{clave}.jpg")
+
+    try:
+        with open(ruta_json) as f:
+            datos = json.load(f)
+        os.utime(ruta_json)
+
+        # La anotación se reemplaza siempre: la ruta puede ser la misma con
+        # otro contenido (ej. una cámara que sobrescribe cam1.jpg)
+        annotated_path = _ruta_anotada(image_path)
+        temporal = f"{annotated_path}.{uuid.uuid4().hex}.tmp"
+        try:
+            shutil.copyfile(ruta_jpg, temporal)
+            os.replace(temporal, annotated_path)
+        except OSError:
+            if os.path.exists(temporal):
+                os.remove(temporal)
+            raise
+    except (OSError, ValueError):
         return None
 
-    if YOLO is None:
-        _model_cache["loaded"] = True
-        _model_cache["model"] = None
+    return datos["count"], datos["detections"], annotated_path
+
+
+def _guardar_deteccion(carpeta, clave, resultado):
+    """Guarda la entrada de forma atómica (temporal + replace); primero el .jpg."""
+    count, detections, annotated_path = resultado
+    sufijo = uuid.uuid4().hex
+
+    temporal = os.path.join(carpeta, f"{clave}.{sufijo}.tmp")
+    try:
+        shutil.copyfile(annotated_path, temporal)
+    except OSError:
+        # Sin imagen anotada no se guarda la entrada
+        return
+    os.replace(temporal, os.path.join(carpeta, f"{clave}.jpg"))
+
+    temporal = os.path.join(carpeta, f"{clave}.{sufijo}.tmp")
+    with open(temporal, "w") as f:
+        json.dump({"count": count, "detections": detections}, f)
+    os.replace(temporal, os.path.join(carpeta, f"{clave}.json"))
+
+
+def _podar_deteccion(carpeta, maximo):
+    """Borra las entradas menos usadas hasta dejar `maximo`."""
+    entradas = []
+    for nombre in os.listdir(carpeta):
+        if nombre.endswith(".json"):
+            try:
+                entradas.append((os.path.getmtime(os.path.join(carpeta, nombre)), nombre[:-5]))
+            except OSError:
+                pass
+
+    if len(entradas) <= maximo:
+        return
+
+    entradas.sort()
+    for _, clave in entradas[:len(entradas) - maximo]:
+        for ext in (".json", ".jpg"):
+            try:
+                os.remove(os.path.join(carpeta, clave + ext))
+            except OSError:
+                pass
+
+
+# =====================================================================================
+#                               INFERENCIA POR LOTES
+# =====================================================================================
+
+def dibujar_detecciones(img, detections):
+    """Dibuja las cajas sobre `img` (BGR, se modifica en el lugar)."""
+    for d in detections:
+        cv2.rectangle(img, (int(d["x1"]), int(d["y1"])), (int(d["x2"]), int(d["y2"])), (0, 255, 0), 2)
+    return img
+
+
+def inferir_lote(imagenes, batch_size: int = None):
+    """
+    Corre el modelo sobre imágenes ya decodificadas (arrays BGR), de a
+    `batch_size` por inferencia. Retorna una lista de detecciones por
+    imagen, o None si el modelo no está disponible.
+    """
+    model = _load_model()
+    if model is None:
+        return None
+
+    batch_size = batch_size or current_app.config.get("YOLO_BATCH_SIZE", 8)
+
+    salida = []
+    for inicio in range(0, len(imagenes), batch_size):
+        with _infer_lock:
+            salida.extend(model.detectar(imagenes[inicio:inicio + batch_size]))
+
+    return salida
+
+
+def _anotar(image_path, img, detections):
+    annotated_path = _ruta_anotada(image_path)
+    cv2.imwrite(annotated_path, dibujar_detecciones(img, detections))
+
+    return len(detections), detections, annotated_path
+
+
+def _reducir(img, max_lado):
+    """Reduce la imagen para que su lado mayor no pase de `max_lado`."""
+    alto, ancho = img.shape[:2]
+    escala = max_lado / max(alto, ancho)
+    if escala < 1:
+        img = cv2.resize(img, (int(ancho * escala), int(alto * escala)), interpolation=cv2.INTER_AREA)
+    return img
+
+
+def _preparar(image_path, max_lado, carpeta):
+    """
+    Lee la imagen una sola vez (sirve para la clave, la inferencia y la
+    anotación). Retorna (clave, guardado, img): si el resultado está en la
+    caché viene en `guardado` y la imagen no se decodifica; si no, `img`
+    es la imagen lista para inferir. (None, None, None) si no se puede leer.
+    """
+    try:
+        with open(image_path, "rb") as f:
+            contenido = f.read()
+    except OSError:
+        return None, None, None
+
+    clave = _clave(contenido, f"max{max_lado}" if max_lado else "")
+    guardado = _leer_deteccion(carpeta, clave, image_path)
+    if guardado is not None:
+        return clave, guardado, None
+
+    img = cv2.imdecode(np.frombuffer(contenido, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if img is None:
+        return None, None, None
+    if max_lado:
+        img = _reducir(img, max_lado)
+    return clave, None, img
+
+
+def _anotar_y_guardar(carpeta, image_path, clave, img, detections):
+    resultado = _anotar(image_path, img, detections)
+    _guardar_deteccion(carpeta, clave, resultado)
+    return resultado
+
+
+def detectar_con_cache(image_paths: List[str], max_lado: int = None, batch_size: int = None, pool=None):
+    """
+    Detección por lotes con caché de resultados: las imágenes ya vistas (por
+    contenido) salen de la caché y solo las demás pasan por el modelo, de a
+    `batch_size` (YOLO_BATCH_SIZE) por inferencia.
+
+    `max_lado` reduce las imágenes antes de inferir (forma parte de la
+    clave). `pool` (ThreadPoolExecutor) reparte la lectura y la anotación
+    entre hilos.
+
+    Retorna una tupla (count, detections, annotated_path) por imagen, en
+    orden, con None para las que no se pudieron leer; o None si el modelo
+    no está disponible.
+    """
+    if _load_model() is None or cv2 is None:
+        return None
+
+    mapear = pool.map if pool is not None else map
+    carpeta = _carpeta_deteccion()
+
+    preparadas = list(mapear(lambda path: _preparar(path, max_lado, carpeta), image_paths))
+    salida = [guardado for _, guardado, _ in preparadas]
+
+    faltantes = [i for i, (_, _, img) in enumerate(preparadas) if img is not None]
+    if not faltantes:
+        return salida
+
+    detecciones = inferir_lote([preparadas[i][2] for i in faltantes], batch_size)
+    if detecciones is None:
         return None
 
-    model = YOLO(model_path)
-    _model_cache["loaded"] = True
-    _model_cache["model"] = model
-    return model
+    anotadas = mapear(
+        lambda par: _anotar_y_guardar(carpeta, image_paths[par[0]], preparadas[par[0]][0], preparadas[par[0]][2], par[1]),
+        zip(faltantes, detecciones),
+    )
+    for i, resultado in zip(faltantes, anotadas):
+        salida[i] = resultado
+
+    _podar_deteccion(carpeta, current_app.config.get("YOLO_CACHE_MAX_ENTRIES", 2000))
+    return salida
+
+
+def detect_bultos_batch(image_paths: List[str], batch_size: int = None) -> List[Tuple[int, List[Dict], str]]:
+    """
+    Igual que detect_bultos para varias imágenes (ver detectar_con_cache).
+    Retorna una tupla (count, detections, annotated_path) por imagen, en orden.
+    """
+    vacio = (0, [], None)
+
+    resultados = detectar_con_cache(image_paths, batch_size=batch_size)
+    if resultados is None:
+        return [vacio for _ in image_paths]
+
+    return [resultado or vacio for resultado in resultados]
 
 
 def detect_bultos(image_path: str) -> Tuple[int, List[Dict], str]:
@@ -44,31 +340,4 @@ def detect_bultos(image_path: str) -> Tuple[int, List[Dict], str]:
       detections: lista de dicts con bbox y score
       annotated_path: ruta de la imagen anotada (o None)
     """
-    model = _load_model()
-    if model is None or cv2 is None:
-        return 0, [], None
-
-    results = model(image_path)
-    detections = []
-    count = 0
-
-    img = cv2.imread(image_path)
-    if img is None:
-        return 0, [], None
-
-    for r in results:
-        boxes = r.boxes
-        for b in boxes:
-            x1, y1, x2, y2 = b.xyxy[0].tolist()
-            conf = float(b.conf[0])
-            cls = int(b.cls[0])
-            detections.append(
-                {"x1": x1, "y1": y1, "x2": x2, "y2": y2, "conf": conf, "cls": cls}
-            )
-            count += 1
-            cv2.rectangle(img, (int(x1), int(y1)), (int(x2), int(y2)), (0, 255, 0), 2)
-
-    annotated_path = os.path.splitext(image_path)[0] + "_yolo.jpg"
-    cv2.imwrite(annotated_path, img)
-
-    return count, detections, annotated_path
+    return detect_bultos_batch([image_path])[0]
@@ -0,0 +1,194 @@
+"""
+Backends de inferencia para el conteo de bultos.
+
+Todos reciben imágenes BGR (arrays de opencv) y devuelven, por imagen, la
+misma lista de dicts {"x1", "y1", "x2", "y2", "conf", "cls"} en píxeles de
+la imagen original:
+
+  - "ultralytics": el modelo .pt con el wrapper YOLO (se importa solo si se usa).
+  - "onnx": el modelo exportado a ONNX con onnxruntime en CPU, tamaño de
+    entrada fijo e hilos configurables. Exportar con:
+        yolo export model=bultos.pt format=onnx imgsz=640 dynamic=True
+
+Para agregar otro backend: una clase con detectar(imagenes) y calentar(),
+registrada en BACKENDS.
+"""
+import numpy as np
+
+try:
+    import cv2
+except Exception:  # sin opencv
+    cv2 = None
+
+
+# Valores por defecto de ultralytics, así ambos backends filtran igual
+CONF_DEFECTO = 0.25
+IOU_DEFECTO = 0.7
+MAX_DET = 300
+
+
+class BackendUltralytics:
+    nombre = "ultralytics"
+
+    def __init__(self, model_path, imgsz=640, conf=CONF_DEFECTO, iou=IOU_DEFECTO,
+                 device="cpu", hilos=None):
+        from ultralytics import YOLO
+
+        if hilos:
+            import torch
+            torch.set_num_threads(hilos)
+
+        self.model = YOLO(model_path)
+        self.opciones = {"imgsz": imgsz, "conf": conf, "iou": iou, "device": device, "verbose": False}
+        self.imgsz = imgsz
+
+    def detectar(self, imagenes):
+        salida = []
+        for r in self.model(list(imagenes), **self.opciones):
+            detections = []
+            for b in r.boxes:
+                x1, y1, x2, y2 = b.xyxy[0].tolist()
+                detections.append({
+                    "x1": x1, "y1": y1, "x2": x2, "y2": y2,
+                    "conf": float(b.conf[0]), "cls": int(b.cls[0]),
+                })
+            salida.append(detections)
+        return salida
+
+    def calentar(self):
+        self.detectar([np.zeros((self.imgsz, self.imgsz, 3), dtype=np.uint8)])
+
+
+class BackendOnnx:
+    nombre = "onnx"
+
+    def __init__(self, model_path, imgsz=640, conf=CONF_DEFECTO, iou=IOU_DEFECTO,
+                 device="cpu", hilos=None):
+        import onnxruntime as ort
+
+        opciones = ort.SessionOptions()
+        opciones.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if hilos:
+            opciones.intra_op_num_threads = hilos
+            opciones.inter_op_num_threads = 1
+
+        self.sesion = ort.InferenceSession(
+            model_path, sess_options=opciones, providers=["CPUExecutionProvider"]
+        )
+        entrada = self.sesion.get_inputs()[0]
+        self.entrada = entrada.name
+
+        # Modelo exportado sin dynamic=True: lote fijo de 1
+        self.lote_fijo = isinstance(entrada.shape[0], int)
+
+        self.imgsz = imgsz
+        self.conf = conf
+        self.iou = iou
+
+    # ---------------- PRE-PROCESO ----------------
+    def _letterbox(self, img):
+        """Redimensiona conservando proporción y rellena a imgsz x imgsz (gris 114)."""
+        alto, ancho = img.shape[:2]
+        gain = min(self.imgsz / alto, self.imgsz / ancho)
+        nuevo_ancho, nuevo_alto = round(ancho * gain), round(alto * gain)
+
+        dw = (self.imgsz - nuevo_ancho) / 2
+        dh = (self.imgsz - nuevo_alto) / 2
+
+        if (ancho, alto) != (nuevo_ancho, nuevo_alto):
+            img = cv2.resize(img, (nuevo_ancho, nuevo_alto), interpolation=cv2.INTER_LINEAR)
+
+        top, bottom = round(dh - 0.1), round(dh + 0.1)
+        left, right = round(dw - 0.1), round(dw + 0.1)
+        img = cv2.copyMakeBorder(img, top, bottom, left, right, cv2.BORDER_CONSTANT, value=(114, 114, 114))
+        return img, gain, (left, top)
+
+    def _tensor(self, imagenes):
+        preparadas = [self._letterbox(img) for img in imagenes]
+        lote = np.stack([p[0] for p in preparadas])[..., ::-1]          # BGR → RGB
+        lote = np.ascontiguousarray(lote.transpose(0, 3, 1, 2), dtype=np.float32) / 255.0
+        return lote, preparadas
+
+    # ---------------- POST-PROCESO ----------------
+    def _nms(self, cajas, scores, clases):
+        """NMS por clase (desplazando las cajas por clase, como ultralytics)."""
+        desplazadas = cajas + clases[:, None] * 7680.0
+        x1, y1, x2, y2 = desplazadas.T
+        areas = (x2 - x1) * (y2 - y1)
+
+        orden = scores.argsort()[::-1]
+        quedan = []
+        while orden.size and len(quedan) < MAX_DET:
+            i = orden[0]
+            quedan.append(i)
+            resto = orden[1:]
+
+            ix1 = np.maximum(x1[i], x1[resto])
+            iy1 = np.maximum(y1[i], y1[resto])
+            ix2 = np.minimum(x2[i], x2[resto])
+            iy2 = np.minimum(y2[i], y2[resto])
+            inter = np.clip(ix2 - ix1, 0, None) * np.clip(iy2 - iy1, 0, None)
+            iou = inter / (areas[i] + areas[resto] - inter + 1e-9)
+
+            orden = resto[iou <= self.iou]
+        return np.array(quedan, dtype=int)
+
+    def _detecciones(self, salida, forma, gain, pad):
+        # salida: (4 + clases, candidatos) → cx, cy, w, h, score por clase
+        pred = salida.T
+        puntajes = pred[:, 4:]
+        clases = puntajes.argmax(axis=1)
+        scores = puntajes[np.arange(len(pred)), clases]
+
+        filtro = scores > self.conf
+        pred, clases, scores = pred[filtro], clases[filtro], scores[filtro]
+        if not len(pred):
+            return []
+
+        cx, cy, w, h = pred[:, 0], pred[:, 1], pred[:, 2], pred[:, 3]
+        cajas = np.stack([cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2], axis=1)
+
+        quedan = self._nms(cajas, scores, clases)
+        cajas, scores, clases = cajas[quedan], scores[quedan], clases[quedan]
+
+        # Volver a coordenadas de la imagen original
+        cajas[:, [0, 2]] = ((cajas[:, [0, 2]] - pad[0]) / gain).clip(0, forma[1])
+        cajas[:, [1, 3]] = ((cajas[:, [1, 3]] - pad[1]) / gain).clip(0, forma[0])
+
+        return [
+            {
+                "x1": float(x1), "y1": float(y1), "x2": float(x2), "y2": float(y2),
+                "conf": float(conf), "cls": int(cls),
+            }
+            for (x1, y1, x2, y2), conf, cls in zip(cajas, scores, clases)
+        ]
+
+    def detectar(self, imagenes):
+        imagenes = list(imagenes)
+        grupos = [[img] for img in imagenes] if self.lote_fijo else [imagenes]
+
+        salida = []
+        for grupo in grupos:
+            if not grupo:
+                continue
+            lote, preparadas = self._tensor(grupo)
+            resultado = self.sesion.run(None, {self.entrada: lote})[0]
+            for img, pred, (_, gain, pad) in zip(grupo, resultado, preparadas):
+                salida.append(self._detecciones(pred, img.shape[:2], gain, pad))
+        return salida
+
+    def calentar(self):
+        self.detectar([np.zeros((self.imgsz, self.imgsz, 3), dtype=np.uint8)])
+
+
+BACKENDS = {
+    BackendUltralytics.nombre: BackendUltralytics,
+    BackendOnnx.nombre: BackendOnnx,
+}
+
+
+def crear_backend(nombre, model_path, **opciones):
+    """Instancia el backend `nombre`. ValueError si no existe."""
+    if nombre not in BACKENDS:
+        raise ValueError(f"Backend de inferencia desconocido: {nombre}")
+    return BACKENDS[nombre](model_path, **opciones)